@@ -0,0 +1,264 @@
+# api/archive.py
+"""
+Архівування старих візитів і єдиний шар читання "гарячих" та архівних даних.
+
+Візити місяців, старших за горизонт (settings.VISIT_ARCHIVE_AFTER_DAYS),
+переносяться з таблиці Visit у стиснуті файли (gzip NDJSON, по файлу на
+місяць; пізні візити за вже архівований місяць — новою частиною), опис
+файлу — у VisitArchive. Таблиця Visit тримає лише робочий період, а історія
+лишається доступною:
+
+* денні агрегати (DailyVisitRollup) під час архівування не змінюються —
+  статистика, SIR-калібрування і звіти бачать усю історію, а rollups.rebuild
+  додає внески архівних візитів (read_archives);
+* iter_visit_rows віддає рядки експорту з таблиці й архівів одним потоком
+  у порядку (visit_date, id) за спаданням.
+
+Рядок архіву містить знімок візиту на момент архівування: ідентифікатори,
+код пацієнта, ім'я лікаря, назву закладу, симптоми та їхні категорії. Тому
+файли лежать у приватному сховищі (api/storage.py), а не в публічному MEDIA_ROOT.
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from . import data_version, exports
+from .models import Visit, VisitArchive
+
+BATCH_SIZE = 2000
+
+_state = threading.local()
+
+
+@contextmanager
+def archiving():
+    """Позначає, що візити в поточному потоці переносяться в архів: сигнали не чіпають агрегати."""
+    _state.active = True
+    try:
+        yield
+    finally:
+        _state.active = False
+
+
+def is_archiving():
+    return getattr(_state, 'active', False)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _bounds(first_day, last_day):
+    """Межі днів [first_day, last_day] як aware datetime у поточному часовому поясі."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(first_day, time.min), tz),
+        timezone.make_aware(datetime.combine(last_day, time.max), tz),
+    )
+
+
+def archivable_months(today=None, horizon_days=None):
+    """Місяці з візитами, що повністю старші за горизонт (від найстарішого)."""
+    today = today or timezone.localdate()
+    if horizon_days is None:
+        horizon_days = settings.VISIT_ARCHIVE_AFTER_DAYS
+    limit = month_start(today - timedelta(days=horizon_days))
+    first = Visit.objects.order_by('visit_date').values_list('visit_date', flat=True).first()
+    if first is None:
+        return []
+    months = []
+    month = month_start(timezone.localtime(first).date())
+    while month < limit:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def _archive_rows(visits):
+    """Рядки архіву для пакета візитів (значень з values_list)."""
+    symptoms = {}
+    links = (
+        Visit.symptoms.through.objects
+        .filter(visit_id__in=[visit[0] for visit in visits])
+        .values_list('visit_id', 'symptom_id', 'symptom__category')
+        .order_by('visit_id', 'symptom_id')
+    )
+    for visit_id, symptom_id, category in links:
+        ids, categories = symptoms.setdefault(visit_id, ([], set()))
+        ids.append(symptom_id)
+        categories.add(category)
+    for visit_id, visit_date, patient_id, patient_code, doctor_id, doctor, institution_id, institution in visits:
+        ids, categories = symptoms.get(visit_id, ([], set()))
+        yield {
+            'id': visit_id,
+            'visit_date': visit_date.isoformat(),
+            'patient_id': patient_id,
+            'patient_code': patient_code,
+            'doctor_id': doctor_id,
+            'doctor': doctor,
+            'institution_id': institution_id,
+            'institution': institution,
+            'symptoms': ids,
+            'categories': sorted(categories),
+        }
+
+
+def archive_month(month, batch_size=BATCH_SIZE):
+    """
+    Переносить візити місяця в новий файл архіву. Повертає VisitArchive або None, якщо візитів немає.
+
+    Видаляються саме записані у файл візити (за id), тож візити, додані під час
+    архівування, лишаються в таблиці й потраплять у наступну частину.
+    """
+    start, end = _bounds(month, next_month(month) - timedelta(days=1))
+    visits = (
+        Visit.objects.filter(visit_date__gte=start, visit_date__lte=end)
+        .order_by('-visit_date', '-id')
+        .values_list('id', 'visit_date', 'patient_id', 'patient__patient_code', 'doctor_id',
+                     'doctor__username', 'institution_id', 'institution__name')
+    )
+    archived_ids = []
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile() as output:
+        with gzip.GzipFile(fileobj=output, mode='wb') as compressed:
+            cursor = None
+            while True:
+                page = visits
+                if cursor:
+                    page = page.filter(Q(visit_date__lt=cursor[0]) | Q(visit_date=cursor[0], id__lt=cursor[1]),
+                                       visit_date__lte=cursor[0])
+                batch = list(page[:batch_size])
+                if not batch:
+                    break
+                for row in _archive_rows(batch):
+                    compressed.write((json.dumps(row, ensure_ascii=False) + '\n').encode())
+                archived_ids += [visit[0] for visit in batch]
+                cursor = (batch[-1][1], batch[-1][0])
+        if not archived_ids:
+            return None
+
+        output.seek(0)
+        for chunk in iter(lambda: output.read(1 << 20), b''):
+            digest.update(chunk)
+        output.seek(0)
+        part = (VisitArchive.objects.filter(month=month).aggregate(last=Max('part'))['last'] or 0) + 1
+        archive = VisitArchive(month=month, part=part, rows=len(archived_ids), sha256=digest.hexdigest())
+        archive.file.save(f'{month:%Y-%m}.part{part}.ndjson.gz', File(output), save=False)
+
+    try:
+        with transaction.atomic(), archiving():
+            archive.save()
+            for offset in range(0, len(archived_ids), batch_size):
+                ids = archived_ids[offset:offset + batch_size]
+                Visit.symptoms.through.objects.filter(visit_id__in=ids).delete()
+                Visit.objects.filter(id__in=ids).delete()
+            # Агрегати не змінюються, але таблиця Visit (і звіти, що її читають) — так
+            data_version.bump()
+    except Exception:
+        archive.file.storage.delete(archive.file.name)
+        raise
+    return archive
+
+
+def read_archive(archive):
+    """Рядки одного файлу архіву (у порядку запису: visit_date, id за спаданням)."""
+    with archive.file.open('rb') as raw, gzip.GzipFile(fileobj=raw, mode='rb') as compressed:
+        for line in compressed:
+            yield json.loads(line)
+
+
+def archived_count():
+    return VisitArchive.objects.aggregate(total=Sum('rows'))['total'] or 0
+
+
+def _archived_rows(archive, start, end, institution_ids, category):
+    for row in read_archive(archive):
+        visit_date = datetime.fromisoformat(row['visit_date'])
+        if start and visit_date < start or end and visit_date > end:
+            continue
+        if institution_ids is not None and row['institution_id'] not in institution_ids:
+            continue
+        if category and category not in row['categories']:
+            continue
+        yield row
+
+
+def _export_row(row):
+    return {key: row[key] for key in exports.EXPORT_COLUMNS}
+
+
+def _sort_key(row):
+    return datetime.fromisoformat(row['visit_date'])
+
+
+def iter_visit_rows(queryset, date_from=None, date_to=None, institution_id=None, category=None, scope=None):
+    """
+    Рядки експорту (як exports.iter_visit_rows) з таблиці Visit і архівів за період.
+
+    queryset — видимі користувачу візити; scope — ID закладу, яким обмежена видимість
+    (None — усі заклади), застосовується й до архівів. Місяці без архівів читаються
+    лише з таблиці; для архівованих місяців "гарячі" (пізні) візити зливаються
+    з файлами за датою.
+    """
+    if scope is not None and (not scope or institution_id and institution_id != scope):
+        return
+    institution_ids = None
+    if scope is not None or institution_id:
+        institution_ids = {scope or institution_id}
+    archives = VisitArchive.objects.order_by('-month', 'part')
+    if date_from:
+        archives = archives.filter(month__gte=month_start(date_from))
+    if date_to:
+        archives = archives.filter(month__lte=date_to)
+    months = {}
+    for archive in archives:
+        months.setdefault(archive.month, []).append(archive)
+
+    def hot(first_day, last_day):
+        return exports.iter_visit_rows(
+            exports.filter_visits(queryset, first_day, last_day, institution_id, category)
+        )
+
+    upper = date_to
+    for month, parts in months.items():
+        last_day = next_month(month) - timedelta(days=1)
+        if upper is None or upper > last_day:
+            # Новіший за архів проміжок — лише таблиця
+            yield from hot(last_day + timedelta(days=1), upper)
+        first_day = max(month, date_from) if date_from else month
+        month_last = min(last_day, upper) if upper else last_day
+        start, end = _bounds(first_day, month_last)
+        cold = [
+            map(_export_row, _archived_rows(archive, start, end, institution_ids, category))
+            for archive in parts
+        ]
+        yield from heapq.merge(hot(first_day, month_last), *cold, key=_sort_key, reverse=True)
+        upper = month - timedelta(days=1)
+    if date_from is None or upper is None or upper >= date_from:
+        yield from hot(date_from, upper)
+
+
+def read_archives(date_from=None, date_to=None):
+    """Усі рядки архівів, місяці яких перетинаються з [date_from, date_to]."""
+    archives = VisitArchive.objects.order_by('month', 'part')
+    if date_from:
+        archives = archives.filter(month__gte=month_start(date_from))
+    if date_to:
+        archives = archives.filter(month__lte=date_to)
+    for archive in archives:
+        yield from read_archive(archive)
@@ -0,0 +1,422 @@
+# api/benchmarks.py
+"""
+Набір бенчмарків HTTP-ендпоінтів (команда run_benchmarks).
+
+Кожен маршрут з api/urls.py має сценарій (Case) або явну причину пропуску
+(SKIPPED_ROUTES). Запити виконуються тестовим клієнтом у процесі: для кожного
+сценарію міряються затримки (p50/p95), пропускна здатність одного потоку і
+кількість SQL-запитів. Запити, що змінюють дані, виконуються в транзакції з
+відкатом, тож база між прогонами не змінюється.
+
+Результати порівнюються з базовими (benchmarks/baseline.json): регресією
+вважається p50, гірший за базовий у threshold разів, або більша кількість
+SQL-запитів. Для базової лінії з іншої машини затримки можна нормувати на
+калібрувальне навантаження (normalize=True) — на одній машині це лише додає шуму.
+"""
+import platform
+import sqlite3
+import statistics
+import time
+from contextlib import nullcontext
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlparse
+
+import django
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.urls import URLResolver, reverse
+from rest_framework.test import APIClient
+
+from . import detection, metrics, reports, uploads, urls
+from .models import (
+    ChatRoom, Institution, Message, OutbreakAlert, Patient, Report, ReportJob, Symptom, UploadSession, User, Visit,
+)
+
+SCALES = {
+    '10k': {
+        'visits': 10_000, 'patients': 2_000, 'institutions': 10, 'doctors_per_institution': 3,
+        'days': 365, 'chat_rooms': 3, 'messages': 2_000, 'outbreaks': 4,
+    },
+    '1m': {
+        'visits': 1_000_000, 'patients': 50_000, 'institutions': 20, 'doctors_per_institution': 5,
+        'days': 730, 'chat_rooms': 5, 'messages': 10_000, 'outbreaks': 8,
+    },
+}
+SEED_CONFIG = {'seed': 2024, 'prefix': 'benchmark', 'start': '2024-01-01'}
+
+BENCHMARK_USERNAME = 'benchmark_analyst'
+# Зміни затримки менші за це (мс) не вважаються регресією — це шум вимірювання
+MIN_REGRESSION_MS = 2.0
+# Розкид p50 між прогонами на одній машині — до ~1.6×; поріг нижчий за 2×,
+# щоб дворазове сповільнення виявлялося навіть при "щасливому" прогоні
+DEFAULT_THRESHOLD = 1.75
+# Скільки разів перевимірювати сценарій, що виглядає як регресія, перш ніж її зафіксувати
+CONFIRM_ATTEMPTS = 2
+
+AUTH_REASON = "автентифікація: час визначає хешування паролів і пошта, а не дані"
+SKIPPED_ROUTES = {
+    'rest_login': AUTH_REASON,
+    'rest_logout': AUTH_REASON,
+    'rest_password_change': AUTH_REASON,
+    'rest_password_reset': AUTH_REASON,
+    'rest_password_reset_confirm': AUTH_REASON,
+    'rest_register': AUTH_REASON,
+    'rest_verify_email': AUTH_REASON,
+    'rest_resend_email': AUTH_REASON,
+    'account_confirm_email': AUTH_REASON,
+    'account_email_verification_sent': AUTH_REASON,
+}
+
+
+class Case:
+    """
+    Один вимірюваний запит. kwargs, params і data — значення або функції від
+    словника фікстур (ID об'єктів тестової бази), що обчислюються перед прогоном.
+    """
+
+    def __init__(self, name, route, method='get', kwargs=None, params=None, data=None,
+                 expect=(200,), rollback=False):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.kwargs = kwargs
+        self.params = params
+        self.data = data
+        self.expect = expect
+        self.rollback = rollback
+
+    @staticmethod
+    def _resolve(value, fixtures):
+        return value(fixtures) if callable(value) else value
+
+    def request(self, fixtures):
+        path = reverse(self.route, kwargs=self._resolve(self.kwargs, fixtures))
+        if self.method == 'get':
+            return path, self._resolve(self.params, fixtures)
+        return path, self._resolve(self.data, fixtures)
+
+
+def _window(days):
+    return lambda f: {'date_from': f['date_from'], 'date_to': (date.fromisoformat(f['date_from'])
+                                                             + timedelta(days=days - 1)).isoformat()}
+
+
+def _bulk_visits(fixtures):
+    return [
+        {'patient': fixtures['patients'][i % len(fixtures['patients'])], 'symptoms': fixtures['symptoms'][:2]}
+        for i in range(100)
+    ]
+
+
+CASES = [
+    Case('api-root', 'api-root'),
+    Case('statistics', 'statistics'),
+    Case('timeseries:rollup', 'statistics-timeseries',
+         params={'granularity': 'week', 'group_by': ['institution', 'category']}),
+    Case('timeseries:symptom', 'statistics-timeseries',
+         params=lambda f: dict(_window(90)(f), granularity='week', symptom=f['symptoms'][:2])),
+    Case('rt', 'rt', params={'category': 'Грип'}),
+    Case('sir_modeling', 'sir_modeling', 'post', data={'days': 365, 'integrator': 'rk4', 'population': 100_000}),
+    Case('sir_modeling-sweep', 'sir_modeling-sweep', 'post', data={
+        'beta': {'start': 0.1, 'stop': 0.5, 'num': 20}, 'gamma': [0.05, 0.1, 0.2], 'days': 200,
+    }),
+    Case('sir_modeling-cache', 'sir_modeling-cache'),
+    Case('sir_modeling-fit', 'sir_modeling-fit', 'post',
+         data=lambda f: dict(_window(90)(f), category='Грип', population=1_000_000)),
+    Case('sir_modeling-stochastic', 'sir_modeling-stochastic', 'post',
+         data={'population': 10_000, 'initial_infected': 5, 'days': 160, 'runs': 200, 'seed': 1}),
+    Case('quick-report', 'quick-report'),
+    Case('period-report', 'period-report', params=_window(90)),
+    Case('metrics', 'metrics'),
+    Case('metrics-slow', 'metrics-slow'),
+    Case('search:patient', 'search', params=lambda f: {'q': f['patient_code']}),
+    Case('search:institution', 'search', params={'q': 'Київ'}),
+    Case('institution-list', 'institution-list'),
+    Case('institution-detail', 'institution-detail', kwargs=lambda f: {'pk': f['institution']}),
+    Case('patient-list', 'patient-list'),
+    Case('patient-detail', 'patient-detail', kwargs=lambda f: {'pk': f['patients'][0]}),
+    Case('visit-list', 'visit-list', params={'page_size': 50}),
+    Case('visit-list:page', 'visit-list', params=lambda f: {'page_size': 50, 'cursor': f['visit_cursor']}),
+    Case('visit-detail', 'visit-detail', kwargs=lambda f: {'pk': f['visit']}),
+    Case('visit-export', 'visit-export', params=lambda f: dict(_window(30)(f), format='csv')),
+    Case('visit-bulk', 'visit-bulk', 'post', data=_bulk_visits, expect=(201,), rollback=True),
+    Case('symptom-list', 'symptom-list'),
+    Case('symptom-detail', 'symptom-detail', kwargs=lambda f: {'pk': f['symptoms'][0]}),
+    Case('chatroom-list', 'chatroom-list'),
+    Case('chatroom-detail', 'chatroom-detail', kwargs=lambda f: {'pk': f['room']}),
+    Case('message-list', 'message-list', params=lambda f: {'room': f['room']}),
+    Case('message-list:sync', 'message-list', params=lambda f: {'room': f['room'], 'after_id': f['message_after']}),
+    Case('message-create', 'message-list', 'post', data=lambda f: {'room': f['room'], 'content': "Бенчмарк"},
+         expect=(201,), rollback=True),
+    Case('message-detail', 'message-detail', kwargs=lambda f: {'pk': f['message']},
+         params=lambda f: {'room': f['room']}),
+    Case('report-list', 'report-list'),
+    Case('report-detail', 'report-detail', kwargs=lambda f: {'pk': f['report']}),
+    Case('report-download', 'report-download', kwargs=lambda f: {'pk': f['report']}),
+    Case('upload-list', 'upload-list', 'post', expect=(201,), rollback=True,
+         data=lambda f: {'name': 'benchmark.csv', 'size': f['upload_size'], 'sha256': f['upload_sha256']}),
+    Case('upload-detail', 'upload-detail', kwargs=lambda f: {'pk': f['upload']}),
+    Case('upload-finalize', 'upload-finalize', 'post', kwargs=lambda f: {'pk': f['upload']}),
+    Case('report-job-list', 'report-job-list'),
+    Case('report-job-detail', 'report-job-detail', kwargs=lambda f: {'pk': f['report_job']}),
+    Case('report-job-download', 'report-job-download', kwargs=lambda f: {'pk': f['report_job']}),
+    Case('outbreak-alert-list', 'outbreak-alert-list', params=_window(90)),
+    Case('outbreak-alert-detail', 'outbreak-alert-detail', kwargs=lambda f: {'pk': f['alert']}),
+    Case('rest_user_details', 'rest_user_details'),
+]
+
+
+def route_names(patterns=None):
+    """Імена всіх маршрутів api/urls.py (разом із підключеними через include)."""
+    names = set()
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def uncovered_routes(cases=CASES):
+    return sorted(route_names() - {case.route for case in cases} - set(SKIPPED_ROUTES))
+
+
+def seed_config(scale, **overrides):
+    return {**SEED_CONFIG, **SCALES[scale], **overrides}
+
+
+def prepare(seed):
+    """
+    Створює користувача бенчмарку й допоміжні об'єкти, прогріває кешовані звіти.
+    Повертає (користувач, фікстури). Викликається на вже заповненій базі; повторний виклик безпечний.
+    """
+    room = ChatRoom.objects.order_by('id').first()
+    institution = room.participants.order_by('id').first() if room else Institution.objects.order_by('id').first()
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME, defaults={
+        'role': 'Аналітик', 'is_staff': True, 'password': '!', 'institution': institution,
+    })
+    report = user.reports.filter(source=Report.UPLOADED).first()
+    if report is None:
+        report = Report(user=user)
+        report.file.save('benchmark.csv', ContentFile("patient,symptom\n".encode()), save=True)
+
+    messages = list(Message.objects.filter(room=room).order_by('-id').values_list('id', flat=True)[:50])
+    fixtures = {
+        'date_from': seed['start'],
+        'institution': institution.id,
+        'patients': list(Patient.objects.order_by('id').values_list('id', flat=True)[:100]),
+        'symptoms': list(Symptom.objects.order_by('id').values_list('id', flat=True)),
+        'visit': Visit.objects.order_by('-visit_date', '-id').values_list('id', flat=True).first(),
+        'room': room.id if room else None,
+        'message': messages[0] if messages else None,
+        'message_after': messages[-1] if messages else 0,
+        'report': report.id,
+    }
+    upload = user.upload_sessions.filter(status=UploadSession.COMPLETE).first()
+    if upload is None:
+        content = "patient,symptom\n".encode() * 1000
+        upload, _ = uploads.start(user, 'benchmark.csv', len(content))
+        uploads.write_chunk(upload, 0, ContentFile(content), len(content))
+        upload = uploads.finalize(upload)
+    fixtures.update(upload=upload.id, upload_size=upload.size, upload_sha256=upload.report.blob.sha256)
+    fixtures['patient_code'] = Patient.objects.get(pk=fixtures['patients'][0]).patient_code
+
+    client = APIClient()
+    client.force_authenticate(user)
+    fixtures['visit_cursor'] = _cursor(client.get(reverse('visit-list'), {'page_size': 50}).data['next'])
+    # Звіти міряються у сталому стані — коли готовий PDF уже є для поточної версії даних
+    for case in CASES:
+        if case.route in ('quick-report', 'period-report'):
+            path, params = case.request(fixtures)
+            client.get(path, params)
+    while (job := reports.claim_next()) is not None:
+        reports.run(job)
+    fixtures['report_job'] = ReportJob.objects.order_by('-id').values_list('id', flat=True).first()
+    if not OutbreakAlert.objects.exists():
+        detection.detect(until=date.fromisoformat(seed['start']) + timedelta(days=seed['days'] - 1))
+    fixtures['alert'] = OutbreakAlert.objects.order_by('-day', 'id').values_list('id', flat=True).first()
+    return user, fixtures
+
+
+def _cursor(next_url):
+    return parse_qs(urlparse(next_url).query)['cursor'][0] if next_url else None
+
+
+def _call(client, case, path, payload):
+    if case.method == 'get':
+        response = client.get(path, payload)
+    else:
+        response = getattr(client, case.method)(path, payload, format='json')
+    if response.streaming:
+        # Потокові відповіді (експорт, PDF) міряються разом із передачею тіла
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+    else:
+        size = len(response.content)
+    return response.status_code, size
+
+
+def measure(client, case, fixtures, repeat=20, warmup=2, max_seconds=10.0):
+    """Вимірює один сценарій; щонайменше 3 повтори, далі — поки не вичерпано max_seconds."""
+    path, payload = case.request(fixtures)
+    timings, query_counts, statuses = [], [], set()
+    size = 0
+    budget_started = time.perf_counter()
+    for iteration in range(warmup + repeat):
+        tracker = metrics.QueryTracker()
+        with transaction.atomic() if case.rollback else nullcontext():
+            started = time.perf_counter()
+            with connection.execute_wrapper(tracker):
+                status_code, size = _call(client, case, path, payload)
+            elapsed = time.perf_counter() - started
+            if case.rollback:
+                transaction.set_rollback(True)
+        statuses.add(status_code)
+        if iteration >= warmup:
+            timings.append(elapsed)
+            query_counts.append(tracker.count)
+            if len(timings) >= 3 and time.perf_counter() - budget_started > max_seconds:
+                break
+
+    ms = np.array(timings) * 1000
+    return {
+        'route': case.route,
+        'method': case.method.upper(),
+        'status': sorted(statuses),
+        'ok': statuses <= set(case.expect),
+        'repeat': len(timings),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+        'min_ms': round(float(ms.min()), 3),
+        'requests_per_second': round(len(ms) / (ms.sum() / 1000), 2),
+        'queries': int(statistics.median(query_counts)),
+        'response_bytes': size,
+    }
+
+
+def calibrate(rounds=7):
+    """
+    Час (мс) фіксованого навантаження на Python і SQLite — мінімум з кількох прогонів.
+    Відношення калібрувань двох машин переносить базові затримки з однієї на іншу.
+    """
+    def workload():
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE t (a INTEGER, b TEXT)')
+        db.executemany('INSERT INTO t VALUES (?, ?)', ((i, str(i * 7919 % 10007)) for i in range(20_000)))
+        db.execute('CREATE INDEX t_b ON t (b)')
+        db.execute('SELECT a % 97, COUNT(*), MAX(b) FROM t GROUP BY a % 97').fetchall()
+        db.close()
+        rows = [{'id': i, 'name': f'row-{i}', 'value': i * 0.5} for i in range(20_000)]
+        sorted(rows, key=lambda row: row['name'])
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        workload()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 3)
+
+
+class Suite:
+    """Заповнена база, користувач і фікстури; вимірює сценарії одним або кількома раундами."""
+
+    def __init__(self, scale, seed=None, repeat=20, warmup=2, max_seconds=10.0):
+        self.scale = scale
+        self.seed = seed or seed_config(scale)
+        self.repeat, self.warmup, self.max_seconds = repeat, warmup, max_seconds
+        user, self.fixtures = prepare(self.seed)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def measure(self, case):
+        return measure(self.client, case, self.fixtures, self.repeat, self.warmup, self.max_seconds)
+
+    def run(self, cases=CASES, rounds=1, log=print):
+        """
+        Повертає словник результатів для JSON. При rounds > 1 сценарії проходять
+        кілька разів по черзі, і для кожного береться раунд з медіанним p50 —
+        так тимчасове уповільнення машини не потрапляє в базову лінію.
+        """
+        per_round = [{case.name: self.measure(case) for case in cases} for _ in range(rounds)]
+        results = {}
+        for case in cases:
+            runs = sorted((measured[case.name] for measured in per_round), key=lambda item: item['p50_ms'])
+            results[case.name] = result = runs[(len(runs) - 1) // 2]
+            log(f"{case.name:<26} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+                f"{result['requests_per_second']:>10.1f} {result['queries']:>6} {','.join(map(str, result['status']))}")
+        return {
+            'scale': self.scale,
+            'seed': self.seed,
+            'rounds': rounds,
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'machine': platform.machine(),
+                'processor': platform.processor(),
+            },
+            'calibration_ms': calibrate(),
+            'visits': Visit.objects.count(),
+            'cases': results,
+        }
+
+    def confirm(self, result, baseline, threshold=DEFAULT_THRESHOLD, attempts=CONFIRM_ATTEMPTS, normalize=False):
+        """
+        Повторно вимірює сценарії з підозрою на регресію затримки (до attempts разів),
+        залишаючи найкращий p50, і повертає остаточний список регресій.
+        """
+        by_name = {case.name: case for case in CASES}
+        for _ in range(attempts):
+            suspects = {
+                item['case'] for item in compare(result, baseline, threshold, normalize=normalize)
+                if item['metric'] == 'p50_ms'
+            }
+            if not suspects:
+                break
+            for name in suspects:
+                again = self.measure(by_name[name])
+                if again['p50_ms'] < result['cases'][name]['p50_ms']:
+                    result['cases'][name] = again
+        return compare(result, baseline, threshold, normalize=normalize)
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_REGRESSION_MS, normalize=False):
+    """
+    Порівнює результати з базовими для того самого масштабу.
+    Повертає список регресій: p50 повільніший у threshold разів (з допуском
+    min_delta_ms) або більше SQL-запитів.
+    """
+    factor = 1.0
+    if normalize and baseline.get('calibration_ms') and current.get('calibration_ms'):
+        factor = current['calibration_ms'] / baseline['calibration_ms']
+    regressions = []
+    for name, result in current['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        expected = base['p50_ms'] * factor
+        if result['p50_ms'] > expected * threshold and result['p50_ms'] - expected > min_delta_ms:
+            regressions.append({
+                'case': name, 'metric': 'p50_ms', 'baseline': round(expected, 3),
+                'current': result['p50_ms'], 'ratio': round(result['p50_ms'] / expected, 2),
+            })
+        if result['queries'] > base['queries']:
+            regressions.append({
+                'case': name, 'metric': 'queries', 'baseline': base['queries'],
+                'current': result['queries'], 'ratio': round(result['queries'] / max(base['queries'], 1), 2),
+            })
+    return regressions
+
+
+def baseline_entry(result):
+    """Частина результатів, що зберігається як базова лінія."""
+    return {
+        'calibration_ms': result['calibration_ms'],
+        'visits': result['visits'],
+        'cases': {
+            name: {'p50_ms': case['p50_ms'], 'queries': case['queries']}
+            for name, case in result['cases'].items()
+        },
+    }
@@ -0,0 +1,177 @@
+# api/bulk.py
+"""
+Пакетний запис візитів: перевірка рядків за попередньо завантаженими наборами
+ID пацієнтів і симптомів, bulk_create для Visit та проміжної таблиці
+Visit.symptoms.through у транзакціях фіксованого розміру.
+
+Сигнали моделей при bulk_create не надсилаються, тому денні агрегати
+оновлюються одним викликом rollups.apply на пакет.
+"""
+import json
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Patient, Symptom, Visit
+
+SymptomLink = Visit.symptoms.through
+
+# Скільки помилок по рядках повертати клієнту (загальна кількість рахується завжди)
+MAX_REPORTED_ERRORS = 1000
+
+
+def _as_id(value):
+    if isinstance(value, bool):
+        raise ValueError
+    return int(value)
+
+
+def parse_visit_date(value):
+    """Дата візиту з ISO-рядка, date або datetime (без часового поясу — поточний); порожнє значення — None."""
+    if not value:
+        return None
+    if not isinstance(value, (date, datetime)):
+        if not isinstance(value, str):
+            raise ValueError(value)
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
+
+
+def iter_ndjson(stream):
+    """Потокове читання NDJSON: по одному об'єкту на рядок, порожні рядки пропускаються."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Некоректний рядок — writer зарахує його як помилку
+            yield None
+
+
+class VisitBulkWriter:
+    def __init__(self, doctor, institution, batch_size=1000):
+        self.doctor = doctor
+        self.institution = institution
+        self.batch_size = batch_size
+        self.symptom_categories = dict(Symptom.objects.values_list('id', 'category'))
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def write(self, rows):
+        """Записує рядки (словники з ключами patient, symptoms і необов'язково visit_date) та повертає підсумок."""
+        batch = []
+        for index, row in enumerate(rows):
+            batch.append((index, row))
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        return self.summary()
+
+    def summary(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+    def _error(self, index, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': index, 'error': message})
+
+    def _validate(self, batch):
+        """Повертає список (patient_id, ID симптомів, дата візиту або None — зараз) для коректних рядків."""
+        patient_refs = set()
+        for _, row in batch:
+            if isinstance(row, dict):
+                try:
+                    patient_refs.add(_as_id(row.get('patient')))
+                except (TypeError, ValueError):
+                    pass
+        known_patients = set(Patient.objects.filter(id__in=patient_refs).values_list('id', flat=True))
+
+        valid = []
+        # Дати в пакеті здебільшого повторюються — розбір і переведення в часовий пояс раз на значення
+        dates = {}
+        for index, row in batch:
+            if not isinstance(row, dict):
+                self._error(index, "Очікується JSON-об'єкт візиту.")
+                continue
+            try:
+                if not isinstance(row.get('symptoms', []), list):
+                    raise TypeError
+                patient_id = _as_id(row.get('patient'))
+                symptom_ids = sorted({_as_id(value) for value in row.get('symptoms', [])})
+            except (TypeError, ValueError):
+                self._error(index, "Поля patient і symptoms мають містити цілі ID.")
+                continue
+            if patient_id not in known_patients:
+                self._error(index, f"Пацієнта з ID {patient_id} не існує.")
+                continue
+            unknown = [value for value in symptom_ids if value not in self.symptom_categories]
+            if unknown:
+                self._error(index, f"Невідомі симптоми: {unknown}.")
+                continue
+            value = row.get('visit_date')
+            try:
+                if value not in dates:
+                    dates[value] = parse_visit_date(value)
+            except (TypeError, ValueError):
+                self._error(index, f"Некоректна дата візиту: {value}.")
+                continue
+            valid.append((patient_id, symptom_ids, dates[value]))
+        return valid
+
+    def _write_batch(self, batch):
+        valid = self._validate(batch)
+        if not valid:
+            return
+        now = timezone.now()
+        visits = [
+            Visit(patient_id=patient_id, doctor=self.doctor, institution=self.institution,
+                  visit_date=visit_date or now)
+            for patient_id, _, visit_date in valid
+        ]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Visit.objects.bulk_create(visits, batch_size=self.batch_size)
+                # visit_date має auto_now_add, тож bulk_create записує поточний час;
+                # дати з рядків відновлюємо одним UPDATE на кожну різну дату пакета
+                dated = defaultdict(list)
+                for visit, (_, _, visit_date) in zip(visits, valid):
+                    if visit_date is not None:
+                        visit.visit_date = visit_date
+                        dated[visit_date].append(visit.pk)
+                for visit_date, visit_ids in dated.items():
+                    Visit.objects.filter(pk__in=visit_ids).update(visit_date=visit_date)
+            else:
+                # MySQL не повертає ключі з bulk_create: вставляємо візити по одному
+                # (raw=True, як loaddata, — без сигналів агрегатів), зв'язки — одним запитом
+                for visit in visits:
+                    visit.save_base(raw=True)
+            SymptomLink.objects.bulk_create([
+                SymptomLink(visit_id=visit.pk, symptom_id=symptom_id)
+                for visit, (_, symptom_ids, _) in zip(visits, valid)
+                for symptom_id in symptom_ids
+            ], batch_size=self.batch_size)
+
+            # Внески в агрегати рахуються по різних (день, набір категорій), а не по кожному візиту
+            days = {}
+            combinations = Counter()
+            for visit, (_, symptom_ids, _) in zip(visits, valid):
+                visit_date = visit.visit_date
+                if visit_date not in days:
+                    days[visit_date] = rollups.visit_day(visit_date)
+                categories = frozenset(self.symptom_categories[symptom_id] for symptom_id in symptom_ids)
+                combinations[(days[visit_date], categories)] += 1
+            delta = Counter()
+            for (day, categories), n in combinations.items():
+                for key, value in rollups.contribution(day, self.institution.id, categories).items():
+                    delta[key] += value * n
+            rollups.apply(delta)
+        self.created += len(valid)
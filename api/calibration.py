@@ -0,0 +1,181 @@
+# api/calibration.py
+"""
+Калібрування beta/gamma (та за бажанням початкової кількості інфікованих)
+SIR-моделі за спостережуваною денною кількістю випадків методом найменших квадратів.
+
+Спершу всі кандидати грубої сітки інтегруються одним пакетом NumPy. Мінімум
+лежить у вузькій вигнутій долині (beta і gamma сильно корельовані), тож від
+найкращого вузла сітки йде метод Левенберга–Марквардта: якобіан за скінченними
+різницями й кілька пробних кроків рахуються одним пакетом на ітерацію. Далі
+сітка кілька разів звужується навколо знайденого мінімуму — ці точки дають
+профіль суми квадратів для довірчих інтервалів.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Sum
+
+from . import epidemic
+from .models import DailyVisitRollup
+
+BETA_RANGE = (0.01, 2.0)
+GAMMA_RANGE = (0.01, 1.0)
+COARSE_POINTS = 32
+REFINE_POINTS = 9
+REFINE_ROUNDS = 6
+LM_ITERATIONS = 50
+# Крок скінченних різниць (у логарифмічних координатах) і пробні коефіцієнти загасання
+LM_DIFF_STEP = 1e-6
+LM_DAMPING = (1e-3, 1e-1, 10.0)
+# Зупинка, коли ітерація зменшує суму квадратів менше ніж на цю частку
+LM_TOLERANCE = 1e-6
+# ...або зсуває точку менше ніж на цю величину (у логарифмах — відносна зміна параметрів)
+LM_MIN_MOVE = 1e-4
+# Критичне значення хі-квадрат з 1 ступенем свободи для 95% інтервалу
+CHI2_95 = 3.841
+
+
+def observed_series(category, date_from, date_to, institution_id=None):
+    """Денна кількість візитів категорії за [date_from, date_to] з денних агрегатів (нулі для днів без візитів)."""
+    rows = DailyVisitRollup.objects.filter(category=category, day__gte=date_from, day__lte=date_to)
+    if institution_id:
+        rows = rows.filter(institution_id=institution_id)
+    series = np.zeros((date_to - date_from).days + 1)
+    for day, count in rows.values_list('day').annotate(total=Sum('count')).order_by():
+        series[(day - date_from).days] = count
+    return series
+
+
+def model_incidence(beta, gamma, initial_infected, population, days):
+    """Нові інфікування за кожен із `days` днів (S[t] - S[t+1]) для пакета параметрів."""
+    trajectory = epidemic.simulate(
+        'sir',
+        initial={'infected': initial_infected},
+        params={'beta': beta, 'gamma': gamma, 'population': population},
+        days=days + 1,
+    )
+    return -np.diff(trajectory['susceptible'], axis=0)
+
+
+def _evaluate(observed, population, log_beta, log_gamma, initial):
+    incidence = model_incidence(np.exp(log_beta), np.exp(log_gamma), initial, population, observed.size)
+    return ((incidence - observed[:, None]) ** 2).sum(axis=0)
+
+
+def _grid(*axes):
+    return [grid.ravel() for grid in np.meshgrid(*axes, indexing='ij')]
+
+
+def _least_squares(observed, population, start, fit_initial):
+    """
+    Левенберг–Марквардт у координатах (log beta, log gamma[, log initial]) від точки start.
+    Повертає (log_beta, log_gamma, initial) найкращої знайденої точки.
+    """
+    lower = [np.log(BETA_RANGE[0]), np.log(GAMMA_RANGE[0])] + ([0.0] if fit_initial else [])
+    upper = [np.log(BETA_RANGE[1]), np.log(GAMMA_RANGE[1])] + ([np.log(population)] if fit_initial else [])
+    fixed_initial = start[2]
+
+    def residuals(points):
+        initial = np.exp(points[:, 2]) if fit_initial else np.full(len(points), fixed_initial)
+        incidence = model_incidence(np.exp(points[:, 0]), np.exp(points[:, 1]), initial, population, observed.size)
+        return incidence - observed[:, None]
+
+    x = np.array([start[0], start[1]] + ([np.log(start[2])] if fit_initial else []))
+    n = x.size
+    r = residuals(x[None])[:, 0]
+    sse = r @ r
+    for _ in range(LM_ITERATIONS):
+        # Якобіан: поточна точка і n зсунутих — один пакет
+        shifted = residuals(x + LM_DIFF_STEP * np.eye(n))
+        jacobian = (shifted - r[:, None]) / LM_DIFF_STEP
+        normal = jacobian.T @ jacobian
+        gradient = jacobian.T @ r
+        steps = [
+            np.linalg.lstsq(normal + damping * np.diag(np.diag(normal) + 1e-12), -gradient, rcond=None)[0]
+            for damping in LM_DAMPING
+        ]
+        trials = np.clip(x + np.array(steps), lower, upper)
+        trial_residuals = residuals(trials)
+        trial_sse = (trial_residuals ** 2).sum(axis=0)
+        best = trial_sse.argmin()
+        if not trial_sse[best] < sse:
+            break
+        improvement = sse - trial_sse[best]
+        # Біля межі обрізаний крок майже не зсуває точку — далі лише повзання вздовж межі
+        moved = np.abs(trials[best] - x).max()
+        x, r, sse = trials[best], trial_residuals[:, best], trial_sse[best]
+        if improvement <= LM_TOLERANCE * max(sse, 1.0) or moved < LM_MIN_MOVE:
+            break
+    return x[0], x[1], np.exp(x[2]) if fit_initial else fixed_initial
+
+
+def fit(observed, population, fit_initial=False):
+    """
+    Повертає найкращі параметри, 95% діапазони за профілем суми квадратів
+    та значення SSE. observed — масив денної кількості випадків.
+    """
+    observed = np.asarray(observed, dtype=float)
+    default_initial = max(observed[0], 1.0)
+    upper_initial = max(observed.max(), 1.0) * 10
+
+    log_beta_axis = np.linspace(*np.log(BETA_RANGE), COARSE_POINTS)
+    log_gamma_axis = np.linspace(*np.log(GAMMA_RANGE), COARSE_POINTS)
+    initial_axis = np.geomspace(1.0, upper_initial, 6) if fit_initial else np.array([default_initial])
+    log_beta, log_gamma, initial = _grid(log_beta_axis, log_gamma_axis, initial_axis)
+    initial = np.clip(initial, 1.0, population)
+
+    candidates = [(log_beta, log_gamma, initial, _evaluate(observed, population, log_beta, log_gamma, initial))]
+    best = candidates[0][3].argmin()
+    center = _least_squares(observed, population, (log_beta[best], log_gamma[best], initial[best]), fit_initial)
+    step = np.array([
+        log_beta_axis[1] - log_beta_axis[0],
+        log_gamma_axis[1] - log_gamma_axis[0],
+        np.log(initial_axis[1] / initial_axis[0]) if fit_initial else 0.0,
+    ])
+
+    # Звужувана сітка навколо мінімуму: уточнення і точки профілю для інтервалів
+    for _ in range(REFINE_ROUNDS):
+        offsets = np.linspace(-1, 1, REFINE_POINTS)
+        axes = [center[0] + offsets * step[0], center[1] + offsets * step[1]]
+        axes.append(center[2] * np.exp(offsets * step[2]) if fit_initial else np.array([center[2]]))
+        lb, lg, ini = _grid(*axes)
+        ini = np.clip(ini, 1.0, population)
+        sse = _evaluate(observed, population, lb, lg, ini)
+        candidates.append((lb, lg, ini, sse))
+        best = sse.argmin()
+        center = (lb[best], lg[best], ini[best])
+        step = step * 2 / (REFINE_POINTS - 1)
+
+    log_beta, log_gamma, initial, sse = (np.concatenate(parts) for parts in zip(*candidates))
+    best = sse.argmin()
+    n_params = 3 if fit_initial else 2
+    sigma2 = sse[best] / max(observed.size - n_params, 1)
+    inside = sse <= sse[best] + CHI2_95 * sigma2
+    beta, gamma = np.exp(log_beta), np.exp(log_gamma)
+
+    result = {
+        'beta': float(beta[best]),
+        'gamma': float(gamma[best]),
+        'initial_infected': float(initial[best]),
+        'r0': float(beta[best] / gamma[best]),
+        'sse': float(sse[best]),
+        'confidence': {
+            'level': 0.95,
+            'beta': [float(beta[inside].min()), float(beta[inside].max())],
+            'gamma': [float(gamma[inside].min()), float(gamma[inside].max())],
+            'r0': [float((beta / gamma)[inside].min()), float((beta / gamma)[inside].max())],
+        },
+        'evaluated_candidates': int(sse.size),
+    }
+    if fit_initial:
+        result['confidence']['initial_infected'] = [float(initial[inside].min()), float(initial[inside].max())]
+    return result
+
+
+def project(fitted, population, date_from, days):
+    """Проєкція денної кількості нових випадків від date_from на `days` днів за підібраними параметрами."""
+    incidence = model_incidence(fitted['beta'], fitted['gamma'], fitted['initial_infected'], population, days)
+    return [
+        {'day': date_from + timedelta(days=i), 'cases': float(value)}
+        for i, value in enumerate(incidence)
+    ]
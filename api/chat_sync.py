@@ -0,0 +1,40 @@
+# api/chat_sync.py
+"""
+Очікування нових повідомлень для long-poll запитів MessageViewSet.
+
+Повідомлення, створені в цьому процесі, будять очікувачів одразу (notify
+викликається після коміту з api/signals.py); повідомлення з інших процесів
+помічаються періодичною перевіркою БД раз на POLL_INTERVAL секунд.
+"""
+import threading
+import time
+
+from .models import Message
+
+POLL_INTERVAL = 1.0
+
+_condition = threading.Condition()
+_latest = {}
+
+
+def notify(room_id, message_id):
+    with _condition:
+        if message_id > _latest.get(room_id, 0):
+            _latest[room_id] = message_id
+        _condition.notify_all()
+
+
+def wait_for_message(room_id, after_id, timeout):
+    """Чекає появи повідомлення з id > after_id у кімнаті. Повертає True, якщо воно є."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if Message.objects.filter(room_id=room_id, id__gt=after_id).exists():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _condition:
+            _condition.wait_for(
+                lambda: _latest.get(room_id, 0) > after_id,
+                timeout=min(POLL_INTERVAL, remaining),
+            )
@@ -0,0 +1,45 @@
+# api/consumers.py
+"""
+WebSocket-доставка нових повідомлень чату (Django Channels).
+
+Клієнт підключається до ws/chat/<room_id>/ з тією ж сесією, що й до REST API;
+підписка дозволена лише учасникам кімнати (через заклад користувача).
+Нові Message розсилаються групі кімнати з обробника post_save (api/signals.py).
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import membership
+
+# Код закриття з'єднання, якщо користувач не має доступу до кімнати
+CLOSE_FORBIDDEN = 4403
+
+
+def room_group(room_id):
+    return f'chat_{room_id}'
+
+
+@database_sync_to_async
+def is_room_member(user, room_id):
+    if not user.is_authenticated:
+        return False
+    return membership.is_member(getattr(user, 'institution_id', None), room_id)
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        self.group = None
+        if not await is_room_member(self.scope['user'], self.room_id):
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+        self.group = room_group(self.room_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def chat_message(self, event):
+        await self.send_json(event['message'])
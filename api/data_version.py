@@ -0,0 +1,74 @@
+# api/data_version.py
+"""
+Лічильники версій у БД для кешів, спільних між процесами.
+
+Основний лічильник (NAME) — версія даних для кешування згенерованих звітів:
+збільшується після фіксації кожної транзакції, що змінює денні агрегати
+візитів (rollups.apply), архівує візити (archive_month) або змінює пацієнтів
+(сигнали). Кеші в пам'яті процесу (членство в чат-кімнатах, довідники) мають
+власні іменовані лічильники (LocalVersion): кожен запис кешу позначається
+версією, прочитаною до завантаження даних, і відкидається, щойно версія
+змінилась. Версія з БД перечитується не частіше ніж раз на REFRESH_SECONDS,
+тож звернення до кешу зазвичай не коштують жодного запиту, а зміни з інших
+процесів стають видимими із затримкою не більше за цей інтервал (у власному
+процесі — одразу після коміту).
+
+Оновлення виконується в on_commit, тож рядок лічильника не блокується на час
+транзакцій, що пишуть дані, а інші процеси не перечитують дані до коміту.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+NAME = 'data'
+# Як часто (с) кеші в пам'яті процесу перечитують свою версію з БД
+REFRESH_SECONDS = 1.0
+
+
+def current(name=NAME):
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def _increment(name=NAME):
+    if DataVersion.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        DataVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def bump(name=NAME):
+    transaction.on_commit(lambda: _increment(name))
+
+
+class LocalVersion:
+    """Версія іменованого лічильника, яку бачить процес: БД читається не частіше ніж раз на refresh_seconds."""
+
+    def __init__(self, name, refresh_seconds=REFRESH_SECONDS):
+        self.name = name
+        self.refresh_seconds = refresh_seconds
+        self._value = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is None or now - self._checked_at > self.refresh_seconds:
+            self._value = current(self.name)
+            self._checked_at = now
+        return self._value
+
+    def expire(self):
+        """Наступний get() перечитає версію з БД."""
+        self._value = None
+
+    def bump(self):
+        """Після коміту збільшує лічильник; цей процес бачить нову версію одразу."""
+        def increment():
+            _increment(self.name)
+            self.expire()
+        transaction.on_commit(increment)
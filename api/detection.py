@@ -0,0 +1,356 @@
+# api/detection.py
+"""
+Виявлення аномалій (можливих спалахів) у денних рядах візитів.
+
+Ряд — кількість візитів одного закладу з симптомами однієї категорії за день
+(DailyVisitRollup). Усі ряди складаються в матрицю ряди × дні, і кожен метод
+рахується для всієї матриці векторними операціями NumPy (ковзні базові рівні —
+через суми зсунутих зрізів, без циклу по рядах):
+
+* EARS C1 — відхилення від середнього за попередні 7 днів у стандартних відхиленнях;
+* EARS C2 — те саме з базою t-9..t-3 (пропуск 2 дні, щоб початок спалаху не
+  потрапив у базу);
+* EARS C3 — сума перевищень C2 над 1 за останні 3 дні;
+* CUSUM — накопичена сума стандартизованих (як у C2) відхилень понад K;
+* Farrington (спрощений) — тижнева сума проти тих самих тижнів (±3) попередніх
+  років з квазі-пуассонівською дисперсією і порогом після перетворення 2/3.
+
+Обчислення інкрементальне: стан (останній оброблений день і накопичені CUSUM)
+зберігається в DetectionState, тож новий запуск обробляє лише нові дні,
+читаючи з історії тільки потрібне вікно (LOOKBACK_DAYS).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import ChatRoom, DailyVisitRollup, DetectionState, Institution, Message, OutbreakAlert, User
+
+STATE_NAME = 'outbreaks'
+METHODS = (OutbreakAlert.C1, OutbreakAlert.C2, OutbreakAlert.C3, OutbreakAlert.CUSUM, OutbreakAlert.FARRINGTON)
+
+EARS_WINDOW = 7
+EARS_THRESHOLD = 3.0
+C3_THRESHOLD = 2.0
+# Нижня межа стандартного відхилення бази: ряди з нульовою базою не дають
+# нескінченних C1/C2 на першому ж випадку
+MIN_SD = 1.0
+CUSUM_K = 1.0
+CUSUM_H = 4.0
+FARRINGTON_YEARS = 3
+FARRINGTON_HALF_WINDOW = 3
+FARRINGTON_Z = 2.326
+FARRINGTON_MIN_MEAN = 0.5
+# 52 тижні: порівнюються ті самі дні тижня
+YEAR_DAYS = 364
+LOOKBACK_DAYS = YEAR_DAYS * FARRINGTON_YEARS + 7 * FARRINGTON_HALF_WINDOW + 6
+# Ряди обробляються блоками, щоб пам'ять не росла з кількістю рядів
+BLOCK_SIZE = 2000
+
+
+def _window_sums(values, width, step=1, out=None):
+    """
+    Суми width значень з кроком step: result[:, t] = values[:, t] + values[:, t + step] + ...
+    Лише додавання зрізів у float32 — суми цілих лічильників точні (до 2^24), без
+    кумулятивних сум у float64. Спершу складаються сусідні пари, тож 7 доданків — це 4 додавання, а не 6.
+    """
+    size = values.shape[1] - step * (width - 1)
+    terms = []
+    if width > 1:
+        pairs = values[:, :-step] + values[:, step:]
+        terms += [pairs[:, offset:offset + size] for offset in range(0, step * (width - 1), 2 * step)]
+    if width % 2:
+        terms.append(values[:, step * (width - 1):step * (width - 1) + size])
+    if out is None:
+        out = np.empty((values.shape[0], size), dtype=values.dtype)
+    if len(terms) == 1:
+        np.copyto(out, terms[0])
+    else:
+        np.add(terms[0], terms[1], out=out)
+    for term in terms[2:]:
+        out += term
+    return out
+
+
+def _baseline(x, sums, lo):
+    """
+    Середнє і 1/стандартне відхилення бази EARS — 7 днів t-7 .. t-1 — для днів lo..days-1
+    (lo може бути від'ємним; дні без повної бази мають нулі). sums — 7-денні суми x.
+    Повертає також індекс першого дня з повною базою (відносно lo).
+    """
+    days = x.shape[1]
+    mean = np.zeros((x.shape[0], days - lo), dtype=np.float32)
+    inv_sd = np.zeros_like(mean)
+    start = max(lo, EARS_WINDOW)
+    if start < days:
+        window_mean, window_sd = mean[:, start - lo:], inv_sd[:, start - lo:]
+        total = sums[:, start - EARS_WINDOW:days - EARS_WINDOW]
+        window = x[:, start - EARS_WINDOW:days - 1]
+        _window_sums(window * window, EARS_WINDOW, out=window_sd)
+        np.multiply(total, 1 / EARS_WINDOW, out=window_mean)
+        # Дисперсія (сума квадратів - сума * середнє) / (n - 1), без зайвих проміжних масивів
+        window_sd -= total * window_mean
+        np.maximum(window_sd, 0, out=window_sd)
+        window_sd *= 1 / (EARS_WINDOW - 1)
+        np.sqrt(window_sd, out=window_sd)
+        np.maximum(window_sd, MIN_SD, out=window_sd)
+        np.divide(1, window_sd, out=window_sd)
+    return mean, inv_sd, max(start - lo, 0)
+
+
+def _farrington(sums, first):
+    """
+    Тижневі суми (7 днів до дня включно), очікуване й верхня межа для днів, що мають
+    хоча б рік бази. sums — 7-денні суми ряду. Повертає (перший такий день, observed,
+    expected, upper) або None.
+    """
+    days = sums.shape[1] + 6
+    span = FARRINGTON_HALF_WINDOW
+    # Скільки днів до центру вікна бази має бути в історії
+    history = 7 * span + 6
+    start = max(first, YEAR_DAYS + history)
+    if start >= days:
+        return None
+    firsts = {year: max(start, YEAR_DAYS * year + history) for year in range(1, FARRINGTON_YEARS + 1)}
+    firsts = {year: day for year, day in firsts.items() if day < days}
+
+    # Тижневі суми на проміжку, що покриває бази всіх років; weekly[:, i] закінчується днем lo + i
+    lo = min(day - YEAR_DAYS * year for year, day in firsts.items()) - 7 * span
+    hi = days - YEAR_DAYS + 7 * span
+    weekly = sums[:, lo - 6:hi - 6]
+    # Суми 2*span+1 тижнів (тих самих днів тижня) з центром у стовпці p + 7*span
+    around = _window_sums(weekly, 2 * span + 1, step=7)
+    around_sq = _window_sums(weekly * weekly, 2 * span + 1, step=7)
+
+    # Центри баз — ті самі дні тижня рік тому; база попереднього року є для всіх днів від start
+    offset = lo + 7 * span
+    total = around[:, start - YEAR_DAYS - offset:].copy()
+    total_sq = around_sq[:, start - YEAR_DAYS - offset:].copy()
+    years = np.ones(days - start, dtype=np.float32)
+    for year, day in firsts.items():
+        if year > 1:
+            k, center, end = day - start, day - YEAR_DAYS * year - offset, days - YEAR_DAYS * year - offset
+            total[:, k:] += around[:, center:end]
+            total_sq[:, k:] += around_sq[:, center:end]
+            years[k:] += 1
+
+    # Далі на місці: total_sq стає дисперсією, потім phi / base і scale, total — верхньою межею
+    count = years * (2 * span + 1)
+    mean = total / count
+    total *= mean
+    total_sq -= total
+    np.maximum(total_sq, 0, out=total_sq)
+    total_sq /= count - 1
+    base = np.maximum(mean, FARRINGTON_MIN_MEAN)
+    total_sq /= base
+    np.maximum(total_sq, 1.0, out=total_sq)
+    total_sq /= base
+    # Межа після перетворення y^(2/3): base * (1 + 2/3 * z * sqrt(phi / base))^(3/2)
+    scale = np.sqrt(total_sq, out=total_sq)
+    scale *= 2 / 3 * FARRINGTON_Z
+    scale += 1
+    upper = np.sqrt(scale, out=total)
+    upper *= scale
+    upper *= base
+    observed = sums[:, start - 6:]
+    return start, observed, mean, upper
+
+
+def _evaluate_block(x, first, cusum):
+    # Статистики — у float32: удвічі менше пам'яті, а суми цілих лічильників точні
+    x = x.astype(np.float32)
+    # 7-денні суми: sums[:, t] — дні t .. t+6; з них і бази EARS, і тижневі суми Farrington
+    sums = _window_sums(x, EARS_WINDOW)
+    # База C2 дня t — це база C1 дня t-2, тож ковзні статистики рахуються один раз;
+    # C2 потрібен і за 2 дні до first — для C3
+    head = min(first, 2)
+    lo = first - head - 2
+    # Дні без повної бази мають нульові середнє й 1/sd, тож їхні C1/C2 — нулі й не дають тривог
+    mean, inv_sd, ready = _baseline(x, sums, lo)
+    observed = x[:, first:]
+
+    c1_mean = mean[:, head + 2:]
+    c1 = observed - c1_mean
+    c1 *= inv_sd[:, head + 2:]
+    c2_ext = x[:, first - head:] - mean[:, :-2]
+    c2_ext *= inv_sd[:, :-2]
+    exceed = np.zeros((len(x), c2_ext.shape[1] + 2 - head), dtype=np.float32)
+    np.subtract(c2_ext, 1, out=exceed[:, 2 - head:])
+    np.maximum(exceed, 0, out=exceed)
+    c3 = exceed[:, 2:] + exceed[:, 1:-1]
+    c3 += exceed[:, :-2]
+    # C3 — лише коли всі три дні мають повну базу C2, тобто з дня (lo + ready) + 4
+    c3[:, :max(ready - head + 2, 0)] = 0
+    c2, c2_mean = c2_ext[:, head:], mean[:, head:-2]
+
+    # CUSUM послідовний у часі, але векторний по всіх рядах блоку; дні йдуть
+    # рядками суцільної пам'яті, а не стовпцями з кроком у весь ряд. Після тривоги
+    # (значення понад H) сума для наступного дня скидається в нуль
+    cusum_by_day = np.subtract(c2.T, CUSUM_K, order='C')
+    cusum = np.array(cusum, dtype=np.float32)
+    below = np.empty(len(cusum), dtype=bool)
+    for values in cusum_by_day:
+        values += cusum
+        np.maximum(values, 0, out=values)
+        np.less_equal(values, CUSUM_H, out=below)
+        np.multiply(values, below, out=cusum)
+    cusum_values = cusum_by_day.T
+
+    # (тривога, спостережено, очікувано, статистика, поріг, зсув від first)
+    results = [
+        (c1 > EARS_THRESHOLD, observed, c1_mean, c1, EARS_THRESHOLD, 0),
+        (c2 > EARS_THRESHOLD, observed, c2_mean, c2, EARS_THRESHOLD, 0),
+        (c3 > C3_THRESHOLD, observed, c2_mean, c3, C3_THRESHOLD, 0),
+        (cusum_values > CUSUM_H, observed, c2_mean, cusum_values, CUSUM_H, 0),
+    ]
+    farrington = _farrington(sums, first)
+    if farrington:
+        start, weekly, expected, upper = farrington
+        results.append((weekly > upper, weekly, expected, None, upper, start - first))
+
+    alarms = []
+    for (alarm, obs, exp, score, threshold, offset), method in zip(results, range(len(METHODS))):
+        # flatnonzero і ділення в кілька разів швидші за np.nonzero по двовимірному масиву
+        index = np.flatnonzero(alarm)
+        rows = index // alarm.shape[1]
+        columns = index - rows * alarm.shape[1]
+        exp = exp[rows, columns]
+        obs = obs[rows, columns]
+        if np.isscalar(threshold):
+            threshold = np.full(len(rows), threshold, dtype=np.float32)
+        else:
+            threshold = threshold[rows, columns]
+        score = (obs - exp) / (threshold - exp) if score is None else score[rows, columns]
+        alarms.append((rows, columns + (first + offset), np.full(len(rows), method), obs, exp, score, threshold))
+    return alarms, cusum.astype(float)
+
+
+def evaluate(counts, first=0, cusum=None, block_size=BLOCK_SIZE):
+    """
+    Рахує всі методи для матриці counts (ряди × дні) на днях first.. і повертає
+    (alarms, cusum): alarms — словник масивів однакової довжини series, day
+    (індекс стовпця), method (індекс у METHODS), observed, expected, score,
+    threshold; cusum — накопичені значення CUSUM після останнього дня
+    (для наступного інкрементального запуску).
+    """
+    counts = np.asarray(counts, dtype=float)
+    cusum = np.zeros(len(counts)) if cusum is None else np.asarray(cusum, dtype=float)
+    parts = []
+    state = np.zeros(len(counts))
+    for start in range(0, len(counts), block_size):
+        block, state[start:start + block_size] = _evaluate_block(
+            counts[start:start + block_size], first, cusum[start:start + block_size]
+        )
+        for rows, *rest in block:
+            parts.append((rows + start, *rest))
+    names = ('series', 'day', 'method', 'observed', 'expected', 'score', 'threshold')
+    if not parts:
+        return {name: np.array([]) for name in names}, state
+    return {name: np.concatenate([part[i] for part in parts]) for i, name in enumerate(names)}, state
+
+
+def load_counts(date_from, date_to):
+    """Ряди заклад × категорія з DailyVisitRollup: (ключі (institution_id, категорія), матриця)."""
+    rows = (
+        DailyVisitRollup.objects
+        .filter(day__gte=date_from, day__lte=date_to, count__gt=0)
+        .exclude(category=rollups.TOTAL)
+        .order_by('institution_id', 'category')
+        .values_list('institution_id', 'category', 'day', 'count')
+    )
+    index, series, days, values = {}, [], [], []
+    for institution_id, category, day, n in rows.iterator(chunk_size=10_000):
+        series.append(index.setdefault((institution_id, category), len(index)))
+        days.append((day - date_from).days)
+        values.append(n)
+    counts = np.zeros((len(index), (date_to - date_from).days + 1))
+    counts[series, days] = values
+    return list(index), counts
+
+
+def _state_key(institution_id, category):
+    return f'{institution_id}:{category}'
+
+
+def detect(until=None, rebuild=False, post=False):
+    """
+    Обробляє дні від останнього обробленого до until (за замовчуванням — учора,
+    бо сьогоднішній день ще не завершений) і зберігає нові сигнали.
+    rebuild — перерахувати всю історію заново. post — надіслати сигнали останніх
+    днів у чат-кімнати закладу. Повертає список створених OutbreakAlert.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    with transaction.atomic():
+        state, _ = DetectionState.objects.select_for_update().get_or_create(name=STATE_NAME)
+        if rebuild:
+            OutbreakAlert.objects.all().delete()
+            state.last_day, state.cusum = None, {}
+        first_day = DailyVisitRollup.objects.order_by('day').values_list('day', flat=True).first()
+        if first_day is None:
+            return []
+        evaluate_from = state.last_day + timedelta(days=1) if state.last_day else first_day
+        if evaluate_from > until:
+            return []
+        date_from = max(evaluate_from - timedelta(days=LOOKBACK_DAYS), first_day)
+        keys, counts = load_counts(date_from, until)
+        cusum = [state.cusum.get(_state_key(*key), 0.0) for key in keys]
+        alarms, cusum = evaluate(counts, first=(evaluate_from - date_from).days, cusum=cusum)
+
+        alerts = [
+            OutbreakAlert(
+                day=date_from + timedelta(days=int(day)),
+                institution_id=keys[series][0], category=keys[series][1], method=METHODS[method],
+                observed=int(observed), expected=float(expected), score=float(score), threshold=float(threshold),
+            )
+            for series, day, method, observed, expected, score, threshold in zip(*alarms.values())
+        ]
+        OutbreakAlert.objects.bulk_create(alerts, batch_size=1000, ignore_conflicts=True)
+        # Ряди без візитів за все вікно сюди не потрапляють: їхній CUSUM уже згас до нуля
+        state.cusum = {_state_key(*key): round(float(value), 6) for key, value in zip(keys, cusum) if value}
+        state.last_day = until
+        state.save()
+
+    if post:
+        post_alerts(day_from=max(evaluate_from, until - timedelta(days=settings.OUTBREAK_ALERT_POST_DAYS - 1)))
+    return alerts
+
+
+def post_alerts(day_from):
+    """
+    Надсилає неопубліковані сигнали з day_from у чат-кімнати, учасником яких є заклад:
+    одне повідомлення на заклад, категорію й день. Відправник — settings.OUTBREAK_ALERT_SENDER.
+    """
+    sender = User.objects.filter(username=settings.OUTBREAK_ALERT_SENDER).first()
+    if sender is None:
+        return 0
+    alerts = OutbreakAlert.objects.filter(day__gte=day_from, posted_at__isnull=True).order_by('day', 'method')
+    grouped = defaultdict(list)
+    for alert in alerts:
+        grouped[alert.institution_id, alert.category, alert.day].append(alert)
+    if not grouped:
+        return 0
+    names = dict(Institution.objects.filter(id__in={key[0] for key in grouped}).values_list('id', 'name'))
+    rooms = defaultdict(list)
+    for room_id, institution_id in ChatRoom.participants.through.objects.filter(
+        institution_id__in=names
+    ).values_list('chatroom_id', 'institution_id'):
+        rooms[institution_id].append(room_id)
+
+    posted = 0
+    with transaction.atomic():
+        for (institution_id, category, day), items in grouped.items():
+            daily = next((alert for alert in items if alert.method != OutbreakAlert.FARRINGTON), items[0])
+            methods = ', '.join(alert.get_method_display() for alert in items)
+            content = (
+                f"Можливий спалах: {category} у закладі {names.get(institution_id, institution_id)}, {day:%d.%m.%Y}. "
+                f"Випадків: {daily.observed} (очікувано ~{daily.expected:.1f}). Методи: {methods}."
+            )
+            for room_id in rooms[institution_id]:
+                Message.objects.create(room_id=room_id, sender=sender, content=content)
+                posted += 1
+            OutbreakAlert.objects.filter(id__in=[alert.id for alert in items]).update(posted_at=timezone.now())
+    return posted
@@ -0,0 +1,307 @@
+# api/epidemic.py
+"""
+Рушій компартментних епідемічних моделей (SIR, SEIR, SIRS, SIRD) на NumPy.
+
+Стан зберігається як масив форми (кількість_компартментів, *batch): batch-вимір
+дозволяє інтегрувати одразу багато сценаріїв (див. перебір параметрів).
+Результат — масиви форми (days, *batch) для кожного компартменту, значення
+записуються на початку кожного дня (t = 0, 1, ..., days - 1).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+EpidemicModel = namedtuple('EpidemicModel', ['compartments', 'params', 'rhs'])
+
+
+# --- Праві частини ОДР (заповнюють dy на місці) ---
+
+def _sir(y, p, dy):
+    S, I, R = y
+    infections = p['beta'] * S * I / p['population']
+    recoveries = p['gamma'] * I
+    dy[0] = -infections
+    dy[1] = infections - recoveries
+    dy[2] = recoveries
+
+
+def _seir(y, p, dy):
+    S, E, I, R = y
+    infections = p['beta'] * S * I / p['population']
+    onsets = p['sigma'] * E
+    recoveries = p['gamma'] * I
+    dy[0] = -infections
+    dy[1] = infections - onsets
+    dy[2] = onsets - recoveries
+    dy[3] = recoveries
+
+
+def _sirs(y, p, dy):
+    S, I, R = y
+    infections = p['beta'] * S * I / p['population']
+    recoveries = p['gamma'] * I
+    waning = p['xi'] * R
+    dy[0] = waning - infections
+    dy[1] = infections - recoveries
+    dy[2] = recoveries - waning
+
+
+def _sird(y, p, dy):
+    S, I, R, D = y
+    infections = p['beta'] * S * I / p['population']
+    recoveries = p['gamma'] * I
+    deaths = p['mu'] * I
+    dy[0] = -infections
+    dy[1] = infections - recoveries - deaths
+    dy[2] = recoveries
+    dy[3] = deaths
+
+
+# Параметри кожної моделі разом зі значеннями за замовчуванням
+MODELS = {
+    'sir': EpidemicModel(
+        ('susceptible', 'infected', 'recovered'),
+        {'beta': 0.2, 'gamma': 0.1},
+        _sir,
+    ),
+    'seir': EpidemicModel(
+        ('susceptible', 'exposed', 'infected', 'recovered'),
+        {'beta': 0.2, 'sigma': 0.2, 'gamma': 0.1},
+        _seir,
+    ),
+    'sirs': EpidemicModel(
+        ('susceptible', 'infected', 'recovered'),
+        {'beta': 0.2, 'gamma': 0.1, 'xi': 0.01},
+        _sirs,
+    ),
+    'sird': EpidemicModel(
+        ('susceptible', 'infected', 'recovered', 'deceased'),
+        {'beta': 0.2, 'gamma': 0.1, 'mu': 0.01},
+        _sird,
+    ),
+}
+
+INTEGRATORS = ('euler', 'rk4', 'rk45')
+
+
+# --- Інтегратори ---
+
+# Як часто (у днях) перевіряти, чи система вийшла на стаціонарний стан
+STEADY_CHECK_DAYS = 16
+
+
+def _is_steady(rhs, y, p, dy, remaining_days, tolerance):
+    """
+    Стан вважається стаціонарним, якщо навіть за решту горизонту жоден
+    компартмент не зміниться більше ніж на tolerance (частка від population).
+    """
+    rhs(y, p, dy)
+    return np.max(np.abs(dy)) * remaining_days <= tolerance * np.max(p['population'])
+
+
+def _steps_per_day(dt):
+    steps_per_day = int(round(1.0 / dt))
+    if steps_per_day < 1 or abs(steps_per_day * dt - 1.0) > 1e-9:
+        raise ValueError("Крок dt має ділити добу на цілу кількість кроків (наприклад 1, 0.5, 0.1).")
+    return steps_per_day
+
+
+def _spend(steps, budget):
+    """Віднімає виконані кроки від бюджету; коли він вичерпано — перериває інтегрування."""
+    budget -= steps
+    if budget < 0:
+        raise ValueError("Перевищено бюджет кроків інтегрування: зменште кількість днів або збільште dt.")
+    return budget
+
+
+def _fixed_step(rhs, y, p, out, dt, method, max_steps, steady_tol):
+    steps_per_day = _steps_per_day(dt)
+    k1, k2, k3, k4 = (np.empty_like(y) for _ in range(4))
+    tmp = np.empty_like(y)
+    for day in range(1, out.shape[0]):
+        max_steps = _spend(steps_per_day, max_steps)
+        for _ in range(steps_per_day):
+            rhs(y, p, k1)
+            if method == 'euler':
+                k1 *= dt
+                y += k1
+            else:
+                np.multiply(k1, dt / 2, out=tmp)
+                tmp += y
+                rhs(tmp, p, k2)
+                np.multiply(k2, dt / 2, out=tmp)
+                tmp += y
+                rhs(tmp, p, k3)
+                np.multiply(k3, dt, out=tmp)
+                tmp += y
+                rhs(tmp, p, k4)
+                k2 += k3
+                k2 *= 2
+                k1 += k2
+                k1 += k4
+                k1 *= dt / 6
+                y += k1
+            np.maximum(y, 0, out=y)
+        out[day] = y
+        if day % STEADY_CHECK_DAYS == 0 and _is_steady(rhs, y, p, k1, out.shape[0] - day, steady_tol):
+            out[day + 1:] = y
+            return
+
+
+def _fixed_step_scalar(rhs, y, p, out, dt, method, max_steps, steady_tol):
+    """
+    Той самий розрахунок для одного сценарію на списках float: для стану з кількох
+    чисел накладні витрати NumPy на кожну операцію переважають саму арифметику.
+    Дні збираються у список і переносяться в out одним присвоєнням.
+    """
+    steps_per_day = _steps_per_day(dt)
+    p = {name: float(value) for name, value in p.items()}
+    y = [float(value) for value in y]
+    k1, k2, k3, k4 = ([0.0] * len(y) for _ in range(4))
+    half, sixth = dt / 2, dt / 6
+    days = out.shape[0]
+    rows = [y]
+    for day in range(1, days):
+        max_steps = _spend(steps_per_day, max_steps)
+        for _ in range(steps_per_day):
+            rhs(y, p, k1)
+            if method == 'euler':
+                y = [x if (x := value + slope * dt) > 0.0 else 0.0 for value, slope in zip(y, k1)]
+            else:
+                rhs([slope * half + value for value, slope in zip(y, k1)], p, k2)
+                rhs([slope * half + value for value, slope in zip(y, k2)], p, k3)
+                rhs([slope * dt + value for value, slope in zip(y, k3)], p, k4)
+                y = [x if (x := value + (a + (b + c) * 2 + d) * sixth) > 0.0 else 0.0
+                     for value, a, b, c, d in zip(y, k1, k2, k3, k4)]
+        rows.append(y)
+        if day % STEADY_CHECK_DAYS == 0:
+            # Те саме, що _is_steady, без перетворення списків на масиви
+            rhs(y, p, k1)
+            if max(map(abs, k1)) * (days - day) <= steady_tol * p['population']:
+                break
+    out[:len(rows)] = rows
+    out[len(rows):] = y
+
+
+# Коефіцієнти Дорманда–Прінса 5(4)
+_DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_DP_E = np.array([
+    71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40,
+])
+
+
+def _rk45(rhs, y, p, out, dt, rtol, atol, max_steps, steady_tol):
+    """
+    Адаптивний метод Дорманда–Прінса. Крок обрізається на межах діб, тому
+    траєкторія до дня d не залежить від загального горизонту.
+    """
+    k = np.empty((7,) + y.shape)
+    stage = np.empty_like(y)
+    h = dt
+    t = 0.0
+    rhs(y, p, k[0])
+    for day in range(1, out.shape[0]):
+        while t < day:
+            max_steps = _spend(1, max_steps)
+            h_step = min(h, day - t)
+            for i in range(1, 7):
+                stage[...] = y
+                for j, a in enumerate(_DP_A[i]):
+                    if a:
+                        stage += (h_step * a) * k[j]
+                rhs(stage, p, k[i])
+            # stage — це розв'язок 5-го порядку (FSAL: k[6] = f(stage))
+            error = np.tensordot(_DP_E, k, axes=1) * h_step
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(stage))
+            error_norm = np.sqrt(np.mean((error / scale) ** 2))
+            if error_norm <= 1.0:
+                t += h_step
+                y[...] = stage
+                np.maximum(y, 0, out=y)
+                rhs(y, p, k[0])
+            factor = 5.0 if error_norm == 0 else min(5.0, max(0.2, 0.9 * error_norm ** -0.2))
+            h = h_step * factor
+        out[day] = y
+        if day % STEADY_CHECK_DAYS == 0 and _is_steady(rhs, y, p, stage, out.shape[0] - day, steady_tol):
+            out[day + 1:] = y
+            return
+
+
+def simulate(model='sir', initial=None, params=None, days=160, integrator='euler',
+             dt=1.0, rtol=1e-6, atol=1e-6, max_steps=10_000_000, steady_tol=1e-9):
+    """
+    Інтегрує модель `model` на `days` днів.
+
+    initial — {компартмент: значення або масив}; susceptible за замовчуванням
+    дорівнює population мінус решта компартментів.
+    params — параметри моделі та population (скаляри або масиви однакової форми batch).
+    steady_tol — після виходу на стаціонарний стан (похибка не більша за
+    steady_tol * population) решта горизонту заповнюється без інтегрування.
+    max_steps — бюджет фактично виконаних кроків інтегратора (для rk45 — разом
+    із відхиленими); коли він вичерпано, піднімається ValueError.
+    Повертає {'t': масив днів, компартмент: масив (days, *batch)}.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Невідома модель '{model}'. Доступні: {', '.join(MODELS)}.")
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"Невідомий інтегратор '{integrator}'. Доступні: {', '.join(INTEGRATORS)}.")
+    if days < 1:
+        raise ValueError("Кількість днів має бути додатною.")
+    if dt <= 0:
+        raise ValueError("Крок dt має бути додатним.")
+
+    spec = MODELS[model]
+    initial = initial or {}
+    p = {name: np.asarray((params or {}).get(name, default), dtype=float)
+         for name, default in spec.params.items()}
+    p['population'] = np.asarray((params or {})['population'], dtype=float)
+
+    values = [np.asarray(initial.get(name, 0), dtype=float) for name in spec.compartments[1:]]
+    batch = np.broadcast_shapes(p['population'].shape, *(v.shape for v in values), *(v.shape for v in p.values()))
+    susceptible = initial.get('susceptible')
+    if susceptible is None:
+        susceptible = p['population'] - sum(values)
+    y = np.empty((len(spec.compartments),) + batch)
+    for i, value in enumerate([susceptible] + values):
+        y[i] = value
+    np.maximum(y, 0, out=y)
+
+    out = np.empty((days,) + y.shape)
+    out[0] = y
+    if integrator == 'rk45':
+        _rk45(spec.rhs, y, p, out, dt, rtol, atol, max_steps, steady_tol)
+    elif batch:
+        _fixed_step(spec.rhs, y, p, out, dt, integrator, max_steps, steady_tol)
+    else:
+        _fixed_step_scalar(spec.rhs, y, p, out, dt, integrator, max_steps, steady_tol)
+
+    result = {'t': np.arange(days)}
+    for i, name in enumerate(spec.compartments):
+        result[name] = out[:, i]
+    return result
+
+
+def summarize(trajectory, params):
+    """
+    Підсумкові метрики кожного сценарію: день і висота піку інфікованих,
+    фінальна частка тих, хто перехворів (1 - S_кінц / N), та базове R0.
+    """
+    infected = trajectory['infected']
+    population = np.asarray(params['population'], dtype=float)
+    removal = np.asarray(params['gamma'], dtype=float) + np.asarray(params.get('mu', 0.0), dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r0 = np.where(removal > 0, np.asarray(params['beta'], dtype=float) / removal, np.inf)
+    return {
+        'peak_day': infected.argmax(axis=0),
+        'peak_infected': infected.max(axis=0),
+        'final_attack_rate': 1.0 - trajectory['susceptible'][-1] / population,
+        'r0': r0,
+    }
@@ -0,0 +1,109 @@
+# api/exports.py
+"""
+Потоковий експорт візитів у CSV або NDJSON.
+
+Візити читаються пакетами за ключем (visit_date, id), а не одним курсором:
+драйвер MySQL завантажує весь результат запиту в пам'ять, тож лише обмежені
+за розміром запити гарантують сталу пам'ять незалежно від обсягу експорту.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .models import Visit
+
+EXPORT_COLUMNS = ['visit_date', 'patient_code', 'institution', 'doctor', 'categories']
+
+
+class CSVExportRenderer(BaseRenderer):
+    # Рендерери потрібні лише для узгодження формату (?format=csv / Accept: text/csv);
+    # тіло відповіді експорту формується StreamingHttpResponse
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False, default=str).encode()
+
+
+class NDJSONExportRenderer(CSVExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+def filter_visits(queryset, date_from=None, date_to=None, institution_id=None, category=None):
+    # Межі днів як діапазон visit_date, щоб запит міг використати індекс
+    tz = timezone.get_current_timezone()
+    if date_from:
+        queryset = queryset.filter(visit_date__gte=timezone.make_aware(datetime.combine(date_from, time.min), tz))
+    if date_to:
+        queryset = queryset.filter(visit_date__lte=timezone.make_aware(datetime.combine(date_to, time.max), tz))
+    if institution_id:
+        queryset = queryset.filter(institution_id=institution_id)
+    if category:
+        links = Visit.symptoms.through.objects.filter(visit_id=OuterRef('pk'), symptom__category=category)
+        queryset = queryset.filter(Exists(links))
+    return queryset
+
+
+def iter_visit_rows(queryset, chunk_size=2000):
+    """
+    Плоскі рядки експорту. Кожен пакет — два запити з LIMIT chunk_size:
+    поля візитів через values_list і категорії симптомів для цих візитів.
+    """
+    queryset = queryset.order_by('-visit_date', '-id').values_list(
+        'id', 'visit_date', 'patient__patient_code', 'institution__name', 'doctor__username'
+    )
+    cursor = None
+    while True:
+        page = queryset
+        if cursor:
+            # Зайва умова visit_date <= курсор дозволяє БД почати з пошуку по індексу
+            page = page.filter(Q(visit_date__lt=cursor[0]) | Q(visit_date=cursor[0], id__lt=cursor[1]),
+                               visit_date__lte=cursor[0])
+        visits = list(page[:chunk_size])
+        if not visits:
+            return
+        categories = {}
+        links = (
+            Visit.symptoms.through.objects
+            .filter(visit_id__in=[visit[0] for visit in visits])
+            .values_list('visit_id', 'symptom__category')
+        )
+        for visit_id, category in links:
+            categories.setdefault(visit_id, set()).add(category)
+        for visit_id, visit_date, patient_code, institution, doctor in visits:
+            yield {
+                'visit_date': visit_date.isoformat(),
+                'patient_code': patient_code,
+                'institution': institution,
+                'doctor': doctor,
+                'categories': sorted(categories.get(visit_id, ())),
+            }
+        if len(visits) < chunk_size:
+            return
+        cursor = (visits[-1][1], visits[-1][0])
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: повертає рядок замість запису."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([
+            row['visit_date'], row['patient_code'], row['institution'], row['doctor'], ';'.join(row['categories']),
+        ])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
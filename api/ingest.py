@@ -0,0 +1,235 @@
+# api/ingest.py
+"""
+Імпорт завантажених звітів лабораторій (CSV/XLSX) у візити.
+
+Завантажений звіт з табличним розширенням отримує статус "очікує імпорту";
+воркер (run_report_worker) забирає такі звіти й читає файл генератором рядок
+за рядком. Рядки йдуть пакетами через VisitBulkWriter (api/bulk.py):
+
+* коди пацієнтів пакета розв'язуються одним запитом, відсутні пацієнти
+  створюються одним bulk_create (get-or-create пакетом);
+* назви симптомів (без урахування регістру) зіставляються з ID за словником,
+  завантаженим один раз на файл;
+* візити і зв'язки з симптомами вставляються пакетним bulk_create,
+  агрегати оновлюються раз на пакет.
+
+Перший рядок — заголовок: patient_code (обов'язковий), symptoms (назви через ";"),
+visit_date (ISO-дата або дата-час; без неї — час імпорту). Лікар і заклад візитів —
+користувач, що завантажив звіт, і його заклад.
+
+Прогрес фіксується в тій самій транзакції, що й пакет візитів, тож після збою
+воркера імпорт продовжується з першого необробленого рядка без дублікатів.
+Пам'ять не залежить від розміру файлу: у пам'яті лише поточний пакет
+і не більше bulk.MAX_REPORTED_ERRORS помилок.
+"""
+import csv
+import io
+import os
+import traceback
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import search_index
+from .bulk import VisitBulkWriter, parse_visit_date
+from .models import Patient, Report, Symptom
+
+try:
+    import openpyxl
+except ImportError:  # XLSX необов'язковий: без openpyxl імпортуються лише CSV
+    openpyxl = None
+
+BATCH_SIZE = 5000
+SYMPTOM_SEPARATOR = ';'
+# Завдання, що "імпортується" без прогресу довше за це, вважається покинутим (воркер упав)
+STALE_AFTER = timedelta(minutes=15)
+
+# Допустимі назви стовпців заголовка (без урахування регістру)
+COLUMNS = {
+    'patient_code': ('patient_code', 'patient', 'код пацієнта'),
+    'symptoms': ('symptoms', 'symptom', 'симптоми'),
+    'visit_date': ('visit_date', 'date', 'дата візиту'),
+}
+
+
+def _iter_csv(fileobj):
+    yield from csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+
+
+def _iter_xlsx(fileobj):
+    if openpyxl is None:
+        raise ValueError("Для імпорту XLSX потрібен пакет openpyxl.")
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+READERS = {'.csv': _iter_csv, '.xlsx': _iter_xlsx}
+
+
+def file_format(name):
+    """Розширення табличного файлу, що імпортується, або None."""
+    extension = os.path.splitext(name)[1].lower()
+    return extension if extension in READERS else None
+
+
+def initial_status(name):
+    """Статус імпорту для щойно завантаженого файлу: табличні файли стають у чергу."""
+    return Report.INGEST_PENDING if file_format(name) else ''
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    return value if isinstance(value, (date, datetime)) else str(value).strip()
+
+
+def iter_rows(fileobj, extension):
+    """Рядки даних файлу як словники {patient_code, symptoms, visit_date}; порожні рядки пропускаються."""
+    rows = READERS[extension](fileobj)
+    header = [str(value or '').strip().casefold() for value in next(rows, ())]
+    positions = {}
+    for field, names in COLUMNS.items():
+        for position, name in enumerate(header):
+            if name in names:
+                positions[field] = position
+                break
+    if 'patient_code' not in positions:
+        raise ValueError(f"У заголовку немає стовпця коду пацієнта ({', '.join(COLUMNS['patient_code'])}).")
+    for values in rows:
+        values = [_cell(value) for value in values]
+        if not any(values):
+            continue
+        yield {
+            field: values[position] if position < len(values) else ''
+            for field, position in positions.items()
+        }
+
+
+class ReportIngestor(VisitBulkWriter):
+    """VisitBulkWriter для рядків звіту: коди пацієнтів і назви симптомів замість ID, прогрес у Report."""
+
+    def __init__(self, report, batch_size=BATCH_SIZE):
+        super().__init__(report.user, report.user.institution, batch_size)
+        self.report = report
+        self.symptom_ids = {name.casefold(): symptom_id for symptom_id, name in Symptom.objects.values_list('id', 'name')}
+        # Продовження після збою: лічильники й помилки вже оброблених пакетів
+        self.offset = report.ingest_rows
+        self.created = report.ingest_created
+        self.failed = report.ingest_failed
+        self.errors = list(report.ingest_errors)
+
+    def write(self, rows):
+        """Записує рядки, пропускаючи вже оброблені (report.ingest_rows)."""
+        rows = islice(rows, self.offset, None)
+        batch = []
+        for index, row in enumerate(rows, start=self.offset):
+            batch.append((index, row))
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        return self.summary()
+
+    def _patients(self, codes):
+        """{код: ID} для кодів пакета; відсутні пацієнти створюються одним запитом."""
+        patients = dict(Patient.objects.filter(patient_code__in=codes).values_list('patient_code', 'id'))
+        missing = codes - patients.keys()
+        if missing:
+            Patient.objects.bulk_create([Patient(patient_code=code) for code in missing], ignore_conflicts=True)
+            # bulk_create з ignore_conflicts не повертає ключі — дочитуємо їх одним запитом
+            created = dict(Patient.objects.filter(patient_code__in=missing).values_list('patient_code', 'id'))
+            search_index.index_queryset('patient', Patient.objects.filter(id__in=created.values()))
+            patients.update(created)
+        return patients
+
+    def _validate(self, batch):
+        parsed = []
+        # Дати у звіті здебільшого повторюються — розбір і переведення в часовий пояс раз на пакет
+        dates = {}
+        for index, row in batch:
+            code = row['patient_code']
+            if not code:
+                self._error(index, "Порожній код пацієнта.")
+                continue
+            names = [name.strip() for name in row.get('symptoms', '').split(SYMPTOM_SEPARATOR) if name.strip()]
+            unknown = [name for name in names if name.casefold() not in self.symptom_ids]
+            if unknown:
+                self._error(index, f"Невідомі симптоми: {unknown}.")
+                continue
+            try:
+                value = row.get('visit_date')
+                if value not in dates:
+                    dates[value] = parse_visit_date(value)
+                visit_date = dates[value]
+            except ValueError:
+                self._error(index, f"Некоректна дата візиту: {row['visit_date']}.")
+                continue
+            parsed.append((code, sorted({self.symptom_ids[name.casefold()] for name in names}), visit_date))
+        if not parsed:
+            return []
+        patients = self._patients({code for code, _, _ in parsed})
+        return [(patients[code], symptom_ids, visit_date) for code, symptom_ids, visit_date in parsed]
+
+    def _write_batch(self, batch):
+        # Пакет візитів і прогрес фіксуються разом: після збою пакет не повториться
+        with transaction.atomic():
+            super()._write_batch(batch)
+            self.offset = batch[-1][0] + 1
+            Report.objects.filter(pk=self.report.pk).update(
+                ingest_rows=self.offset, ingest_created=self.created, ingest_failed=self.failed,
+                ingest_errors=self.errors, ingest_updated_at=timezone.now(),
+            )
+
+
+def requeue_stale():
+    Report.objects.filter(
+        ingest_status=Report.INGEST_RUNNING, ingest_updated_at__lt=timezone.now() - STALE_AFTER,
+    ).update(ingest_status=Report.INGEST_PENDING)
+
+
+def claim_next():
+    """Забирає найстаріший звіт, що очікує імпорту; умовний UPDATE гарантує, що його отримає лише один воркер."""
+    for report_id in Report.objects.filter(ingest_status=Report.INGEST_PENDING).order_by('uploaded_at', 'id') \
+                                   .values_list('id', flat=True)[:10]:
+        claimed = Report.objects.filter(pk=report_id, ingest_status=Report.INGEST_PENDING).update(
+            ingest_status=Report.INGEST_RUNNING, ingest_updated_at=timezone.now(),
+        )
+        if claimed:
+            return Report.objects.select_related('user__institution', 'blob').get(pk=report_id)
+    return None
+
+
+def run(report):
+    """Імпортує звіт; повторний імпорт того самого вмісту (спільний FileBlob) пропускається."""
+    try:
+        imported = report.blob_id and Report.objects.filter(
+            blob_id=report.blob_id, ingest_status=Report.INGEST_DONE,
+        ).exclude(pk=report.pk).values_list('id', flat=True).first()
+        if imported:
+            report.ingest_status = Report.INGEST_DUPLICATE
+            report.ingest_errors = [{'row': None, 'error': f"Цей вміст уже імпортовано зі звіту #{imported}."}]
+        elif report.user.institution is None:
+            raise ValueError("Користувач, що завантажив звіт, не прив'язаний до закладу.")
+        else:
+            ingestor = ReportIngestor(report)
+            with report.file.open('rb') as fileobj:
+                ingestor.write(iter_rows(fileobj, file_format(report.name or report.file.name)))
+            report.ingest_rows, report.ingest_created = ingestor.offset, ingestor.created
+            report.ingest_failed, report.ingest_errors = ingestor.failed, ingestor.errors
+            report.ingest_status = Report.INGEST_DONE
+    except Exception as exc:
+        # Уже зафіксовані пакети лишаються; лічильники в БД відповідають їм
+        report.refresh_from_db(fields=['ingest_rows', 'ingest_created', 'ingest_failed', 'ingest_errors'])
+        report.ingest_status = Report.INGEST_FAILED
+        message = str(exc) if isinstance(exc, ValueError) else traceback.format_exc()[-2000:]
+        report.ingest_errors = report.ingest_errors + [{'row': None, 'error': message}]
+    report.ingest_updated_at = timezone.now()
+    report.save(update_fields=['ingest_status', 'ingest_rows', 'ingest_created', 'ingest_failed',
+                               'ingest_errors', 'ingest_updated_at'])
+    return report
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = ("Переносить візити місяців, старших за горизонт, з таблиці Visit у стиснуті "
+            "файли архіву (VisitArchive). Денні агрегати при цьому не змінюються.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, dest='days',
+                            help="Горизонт у днях (за замовчуванням settings.VISIT_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Лише показати місяці для архівування")
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.VISIT_ARCHIVE_AFTER_DAYS
+        if days < 0:
+            raise CommandError("--older-than не може бути від'ємним")
+        months = archive.archivable_months(horizon_days=days)
+        if not months:
+            self.stdout.write("Немає місяців для архівування.")
+            return
+        total = 0
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f"{month:%Y-%m}")
+                continue
+            item = archive.archive_month(month, batch_size=options['batch_size'])
+            if item is None:
+                continue
+            total += item.rows
+            self.stdout.write(f"{month:%Y-%m}: {item.rows} візитів -> {item.file.name}")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Заархівовано візитів: {total}"))
@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api import search_index
+from api.models import SearchEntry
+
+BENCH_DOMAIN = '@bench.example'
+SYLLABLES = ['ко', 'ва', 'лен', 'ко', 'шев', 'чен', 'пет', 'рен', 'бон', 'дар', 'мель', 'ник', 'ткач', 'ук',
+             'ли', 'сен', 'ко', 'олек', 'сан', 'дра', 'іван', 'ов', 'ґа', 'лин', 'ма', 'рія', 'юр', 'ій']
+DEFAULT_QUERIES = ['шевчен', 'коваленко', 'петрнко', 'юрій', 'мельник', 'ґалин', 'немаєтакого']
+
+
+def legacy_search(query):
+    # Попередня реалізація SearchView: LIKE '%...%' по username та email
+    User = get_user_model()
+    return list(User.objects.filter(Q(username__icontains=query) | Q(email__icontains=query))
+                .distinct().values_list('id', flat=True)[:10])
+
+
+class Command(BaseCommand):
+    help = ("Порівнює пошук по триграмному індексу з icontains-пошуком. "
+            "--populate N створює N синтетичних користувачів (*@bench.example) і індексує їх.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--populate', type=int, default=0, help="Скільки синтетичних користувачів створити")
+        parser.add_argument('--cleanup', action='store_true', help="Видалити синтетичних користувачів після замірів")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--query', action='append', dest='queries', help="Запит (можна вказати кілька разів)")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['populate']:
+            self._populate(User, options['populate'], options['seed'])
+
+        self.stdout.write(f"Користувачів: {User.objects.count()}, у пошуковому індексі: "
+                          f"{SearchEntry.objects.filter(kind='user').count()}")
+        self.stdout.write(f"{'запит':<16}{'icontains, мс':>16}{'індекс, мс':>14}{'збіги icontains':>18}{'збіги індексу':>16}")
+        for query in options['queries'] or DEFAULT_QUERIES:
+            legacy_ms, legacy_ids = self._measure(lambda: legacy_search(query), options['repeat'])
+            index_ms, index_ids = self._measure(lambda: search_index.search(query, 'user'), options['repeat'])
+            self.stdout.write(f"{query:<16}{legacy_ms:>16.2f}{index_ms:>14.2f}{len(legacy_ids):>18}{len(index_ids):>16}")
+
+        if options['cleanup']:
+            self._cleanup(User)
+
+    @staticmethod
+    def _measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), result
+
+    def _populate(self, User, count, seed):
+        rng = random.Random(seed)
+        start = User.objects.filter(email__endswith=BENCH_DOMAIN).count()
+        batch = []
+        for number in range(start, start + count):
+            surname = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            batch.append(User(
+                username=f'{surname}{number}', email=f'user{number}{BENCH_DOMAIN}',
+                last_name=surname.capitalize(), first_name=rng.choice(SYLLABLES).capitalize(),
+                password='!', role='Аналітик',
+            ))
+            if len(batch) == 5000:
+                User.objects.bulk_create(batch)
+                batch = []
+        User.objects.bulk_create(batch)
+        indexed = search_index.index_queryset('user', User.objects.filter(email__endswith=BENCH_DOMAIN))
+        self.stdout.write(f"Створено {count} користувачів, проіндексовано {indexed}")
+
+    def _cleanup(self, User):
+        bench_users = User.objects.filter(email__endswith=BENCH_DOMAIN)
+        SearchEntry.objects.filter(kind='user', object_id__in=bench_users.values('pk')).delete()
+        with search_index.paused():
+            deleted, _ = bench_users.delete()
+        self.stdout.write(f"Видалено синтетичних записів: {deleted}")
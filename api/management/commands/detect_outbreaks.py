@@ -0,0 +1,28 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import detection
+
+
+class Command(BaseCommand):
+    help = ("Шукає аномалії (EARS C1/C2/C3, CUSUM, Farrington) у денних рядах заклад × категорія "
+            "і зберігає сигнали OutbreakAlert. Обробляє лише дні після попереднього запуску.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="Останній день для обробки (YYYY-MM-DD, за замовчуванням учора)")
+        parser.add_argument('--rebuild', action='store_true', help="Видалити сигнали й перерахувати всю історію")
+        parser.add_argument('--post', action='store_true',
+                            help="Надіслати нові сигнали в чат-кімнати закладів (settings.OUTBREAK_ALERT_SENDER)")
+
+    def handle(self, *args, **options):
+        try:
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as exc:
+            raise CommandError(f"Некоректна дата: {exc}")
+
+        started = time.perf_counter()
+        alerts = detection.detect(until=until, rebuild=options['rebuild'], post=options['post'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Нових сигналів: {len(alerts)} ({elapsed:.2f} с)"))
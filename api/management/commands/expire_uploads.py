@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import uploads
+
+
+class Command(BaseCommand):
+    help = "Видаляє незавершені завантаження частинами, що не оновлювались довше за горизонт, і їхні тимчасові файли."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, dest='hours',
+                            help="Горизонт у годинах (за замовчуванням settings.UPLOAD_SESSION_TTL_HOURS)")
+
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.UPLOAD_SESSION_TTL_HOURS
+        if hours < 0:
+            raise CommandError("--older-than не може бути від'ємним")
+        removed = uploads.expire_sessions(hours)
+        self.stdout.write(self.style.SUCCESS(f"Видалено незавершених завантажень: {removed}"))
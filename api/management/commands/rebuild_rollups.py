@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Перераховує денні агрегати візитів (DailyVisitRollup) з таблиці Visit і архівів візитів."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="Перший день діапазону (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', help="Останній день діапазону (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(f"Некоректна дата: {exc}")
+
+        created = rollups.rebuild(date_from=date_from, date_to=date_to)
+        self.stdout.write(self.style.SUCCESS(f"Створено рядків агрегатів: {created}"))
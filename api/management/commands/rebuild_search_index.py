@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api import search_index
+
+
+class Command(BaseCommand):
+    help = "Перебудовує триграмний пошуковий індекс (SearchEntry/SearchGram)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(search_index.FIELDS),
+                            help="Тип об'єктів для перебудови (можна вказати кілька разів)")
+        parser.add_argument('--batch-size', type=int, default=search_index.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = search_index.rebuild(kinds=options['kind'], batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"{kind}: проіндексовано {count}"))
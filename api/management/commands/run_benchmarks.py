@@ -0,0 +1,127 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import benchmarks, synthetic
+from api.models import Visit
+
+
+class Command(BaseCommand):
+    help = ("Бенчмарк усіх маршрутів api/urls.py на локальній SQLite з синтетичними даними "
+            "(--scale 10k або 1m). Результати пишуться в JSON і порівнюються з базовою лінією; "
+            "регресія завершує команду з помилкою. Запускати з "
+            "DJANGO_SETTINGS_MODULE=monitoring_system.settings_benchmark.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(benchmarks.SCALES), default='10k')
+        parser.add_argument('--repeat', type=int, default=20, help="Вимірювань на сценарій (після прогріву)")
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--rounds', type=int,
+                            help="Скільки разів пройти всі сценарії (за замовчуванням 1, для базової лінії 3)")
+        parser.add_argument('--max-seconds', type=float, default=10.0,
+                            help="Ліміт часу на сценарій (не менше трьох вимірювань)")
+        parser.add_argument('--case', action='append', dest='cases', help="Лише ці сценарії (можна кілька)")
+        parser.add_argument('--output', help="Файл результатів (за замовчуванням benchmarks/results/<scale>.json)")
+        parser.add_argument('--baseline', help="Базова лінія (за замовчуванням benchmarks/baseline.json)")
+        parser.add_argument('--threshold', type=float, default=benchmarks.DEFAULT_THRESHOLD,
+                            help="У скільки разів повільніший p50 вважається регресією")
+        parser.add_argument('--normalize', action='store_true',
+                            help="Нормувати затримки на калібрування (базова лінія з іншої машини)")
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Записати результати як нову базову лінію для цього масштабу")
+        parser.add_argument('--reseed', action='store_true', help="Заново згенерувати базу масштабу")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                "Бенчмарки працюють лише з SQLite: DJANGO_SETTINGS_MODULE=monitoring_system.settings_benchmark"
+            )
+        directory = getattr(settings, 'BENCHMARK_DIR', os.path.join(settings.BASE_DIR, 'benchmarks'))
+        scale = options['scale']
+        cases = benchmarks.CASES
+        if options['cases']:
+            unknown = set(options['cases']) - {case.name for case in cases}
+            if unknown:
+                raise CommandError(f"Невідомі сценарії: {', '.join(sorted(unknown))}")
+            cases = [case for case in cases if case.name in options['cases']]
+
+        uncovered = benchmarks.uncovered_routes()
+        if uncovered:
+            raise CommandError(f"Маршрути без сценарію бенчмарку: {', '.join(uncovered)}")
+
+        self._use_database(directory, scale, options['reseed'])
+        self.stdout.write(f"{'сценарій':<26} {'p50, мс':>10} {'p95, мс':>10} {'запитів/с':>10} {'SQL':>6} статус")
+        rounds = options['rounds'] or (3 if options['update_baseline'] else 1)
+        suite = benchmarks.Suite(
+            scale, repeat=options['repeat'], warmup=options['warmup'], max_seconds=options['max_seconds'],
+        )
+        result = suite.run(cases, rounds=rounds, log=self.stdout.write)
+
+        failed = [name for name, case in result['cases'].items() if not case['ok']]
+        baseline_path = options['baseline'] or os.path.join(directory, 'baseline.json')
+        baseline = self._read_json(baseline_path)
+        regressions = []
+        if not options['update_baseline'] and scale in baseline:
+            regressions = suite.confirm(result, baseline[scale], options['threshold'], normalize=options['normalize'])
+
+        output = options['output'] or os.path.join(directory, 'results', f'{scale}.json')
+        result['regressions'] = regressions
+        self._write_json(output, result)
+        self.stdout.write(f"Результати: {output}")
+
+        if options['update_baseline']:
+            baseline[scale] = benchmarks.baseline_entry(result)
+            self._write_json(baseline_path, baseline)
+            self.stdout.write(self.style.SUCCESS(f"Базову лінію '{scale}' оновлено: {baseline_path}"))
+        elif scale in baseline:
+            for item in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f"РЕГРЕСІЯ {item['case']}: {item['metric']} {item['current']} проти {item['baseline']} "
+                    f"(×{item['ratio']})"
+                ))
+            if regressions:
+                raise CommandError(f"Виявлено регресій продуктивності: {len(regressions)}")
+            self.stdout.write(self.style.SUCCESS(f"Регресій відносно базової лінії '{scale}' немає."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Базової лінії для '{scale}' немає — порівняння пропущено."))
+
+        if failed:
+            raise CommandError(f"Неочікуваний статус відповіді: {', '.join(failed)}")
+
+    def _use_database(self, directory, scale, reseed):
+        """Перемикається на окрему базу масштабу (як тестова БД) і заповнює її за потреби."""
+        data_dir = os.path.join(directory, 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        database = os.path.join(data_dir, f'{scale}.sqlite3')
+        manifest = os.path.join(data_dir, f'{scale}.json')
+        seed = benchmarks.seed_config(scale)
+        fresh = reseed or self._read_json(manifest) != seed
+        if fresh:
+            for path in (database, manifest):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=True)
+        if fresh or not Visit.objects.exists():
+            self.stdout.write(f"Генерація даних масштабу {scale}...")
+            config = synthetic.load_config(**seed, bulk_load=True)
+            synthetic.SyntheticDataGenerator(config, log=lambda message: None).run()
+            self._write_json(manifest, seed)
+
+    @staticmethod
+    def _read_json(path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+
+    @staticmethod
+    def _write_json(path, data):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, ensure_ascii=False, indent=2, sort_keys=True)
+            handle.write('\n')
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import ingest, reports
+from api.models import Report, ReportJob
+
+
+class Command(BaseCommand):
+    help = ("Воркер черги звітів: виконує завдання ReportJob і зберігає готові PDF як Report, "
+            "а також імпортує завантажені CSV/XLSX-звіти у візити.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2.0, help="Пауза між перевірками порожньої черги, с")
+        parser.add_argument('--once', action='store_true', help="Виконати всі наявні завдання й завершитись")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Воркер звітів запущено.")
+        try:
+            while True:
+                reports.requeue_stale()
+                ingest.requeue_stale()
+                job = reports.claim_next()
+                if job is None:
+                    # PDF-звіти чекає користувач — імпорт файлів лише коли їх немає
+                    report = ingest.claim_next()
+                    if report is not None:
+                        self.ingest(report)
+                        continue
+                    if options['once']:
+                        return
+                    time.sleep(options['poll'])
+                    continue
+                started = time.monotonic()
+                job = reports.run(job)
+                elapsed = time.monotonic() - started
+                if job.status == ReportJob.DONE:
+                    self.stdout.write(self.style.SUCCESS(f"{job}: готово за {elapsed:.2f} с"))
+                else:
+                    self.stderr.write(f"{job}: помилка\n{job.error}")
+        except KeyboardInterrupt:
+            self.stdout.write("Воркер звітів зупинено.")
+
+    def ingest(self, report):
+        started = time.monotonic()
+        report = ingest.run(report)
+        elapsed = time.monotonic() - started
+        summary = (f"звіт #{report.pk}: рядків {report.ingest_rows}, візитів {report.ingest_created}, "
+                   f"помилок {report.ingest_failed} за {elapsed:.2f} с")
+        if report.ingest_status == Report.INGEST_FAILED:
+            self.stderr.write(f"{summary}\n{report.ingest_errors[-1]['error']}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Імпорт {summary} ({report.ingest_status})"))
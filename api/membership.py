@@ -0,0 +1,70 @@
+# api/membership.py
+"""
+Кеш членства в чат-кімнатах: заклад → множина id кімнат.
+
+Множина завантажується одним запитом при першому зверненні, далі перевірка
+доступу — пошук у множині в пам'яті. Зміни ChatRoom.participants скидають
+кеш через m2m_changed (api/signals.py) і після коміту збільшують лічильник
+версії в БД (data_version.LocalVersion). Кожен запис позначений версією,
+прочитаною до запиту членства, і відкидається при розбіжності з поточною:
+потік, що почав читати до відкликання доступу, не може зберегти старе
+членство під новою версією. Інші процеси (веб-воркери, ASGI, воркер звітів)
+бачать зміну не пізніше ніж через data_version.REFRESH_SECONDS.
+"""
+import threading
+
+from . import data_version
+from .models import ChatRoom
+
+VERSION_NAME = 'chat_membership'
+
+_lock = threading.Lock()
+_rooms = {}
+_version = data_version.LocalVersion(VERSION_NAME)
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def rooms_for(institution_id):
+    version = _version.get()
+    with _lock:
+        entry = _rooms.get(institution_id)
+        if entry is not None and entry[0] == version:
+            _stats['hits'] += 1
+            return entry[1]
+        _stats['misses'] += 1
+    rooms = frozenset(
+        ChatRoom.participants.through.objects
+        .filter(institution_id=institution_id)
+        .values_list('chatroom_id', flat=True)
+    )
+    with _lock:
+        _rooms[institution_id] = (version, rooms)
+    return rooms
+
+
+def is_member(institution_id, room_id):
+    if not institution_id:
+        return False
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return False
+    return room_id in rooms_for(institution_id)
+
+
+def invalidate(institution_ids=None):
+    """Скидає кеш для вказаних закладів (або весь) і після коміту повідомляє інші процеси."""
+    with _lock:
+        if institution_ids is None:
+            _rooms.clear()
+        else:
+            for institution_id in institution_ids:
+                _rooms.pop(institution_id, None)
+        _stats['invalidations'] += 1
+    # Нова версія відкидає й записи цього процесу: інший потік міг перечитати членство до коміту
+    _version.bump()
+
+
+def stats():
+    with _lock:
+        return dict(_stats, institutions=len(_rooms))
@@ -0,0 +1,246 @@
+# api/metrics.py
+"""
+Метрики запитів: гістограми тривалості, кількість і час SQL-запитів по кожному
+представленню (VisitViewSet.list, StatisticsView.get, ...) у форматі Prometheus.
+
+SQL рахується через connection.execute_wrapper лише на час обробки запиту:
+на кожен запит до БД — один виклик обгортки та perf_counter, без збереження
+тексту SQL, крім кількох найповільніших для журналу повільних запитів.
+Збір вмикається/вимикається під час роботи прапорцем у Django-кеші. Як і самі
+лічильники, прапорець діє в межах процесу: за типового LocMemCache перемикання
+стосується лише процесу, що обробив POST /api/metrics/; на всі процеси воно
+поширюється, лише якщо CACHES налаштовано на спільний бекенд (Redis, Memcached).
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger('api.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOWEST_QUERIES = 5
+SLOW_LOG_SIZE = 100
+
+ENABLED_KEY = 'metrics_enabled'
+# Як часто (с) перечитувати прапорець із кешу, щоб не звертатись до нього на кожен запит
+FLAG_REFRESH_SECONDS = 1.0
+
+
+class QueryTracker:
+    """Обгортка execute_wrapper: лічильник і сумарний час SQL плюс кілька найповільніших запитів."""
+
+    __slots__ = ('count', 'seconds', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._queries = {}
+        self._sql_seconds = {}
+        self._responses = {}
+        self.slow_requests = deque(maxlen=SLOW_LOG_SIZE)
+
+    def observe(self, view, method, status, elapsed, tracker):
+        key = (view, method)
+        with self._lock:
+            if key not in self._latency:
+                self._latency[key] = _Histogram(LATENCY_BUCKETS)
+                self._queries[key] = _Histogram(QUERY_BUCKETS)
+                self._sql_seconds[key] = 0.0
+            self._latency[key].observe(elapsed)
+            self._queries[key].observe(tracker.count)
+            self._sql_seconds[key] += tracker.seconds
+            status_key = (view, method, str(status))
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._queries.clear()
+            self._sql_seconds.clear()
+            self._responses.clear()
+            self.slow_requests.clear()
+
+    def render(self):
+        """Текстовий формат експозиції Prometheus."""
+        lines = []
+        with self._lock:
+            lines += _histogram_lines(
+                'http_request_duration_seconds', "Тривалість обробки запиту", self._latency,
+            )
+            lines += _histogram_lines(
+                'http_request_sql_queries', "Кількість SQL-запитів на HTTP-запит", self._queries,
+            )
+            lines += [
+                '# HELP http_request_sql_seconds_total Сумарний час SQL-запитів',
+                '# TYPE http_request_sql_seconds_total counter',
+            ]
+            lines += [
+                f'http_request_sql_seconds_total{_labels(view=view, method=method)} {seconds:.6f}'
+                for (view, method), seconds in sorted(self._sql_seconds.items())
+            ]
+            lines += [
+                '# HELP http_responses_total Кількість відповідей за статусом',
+                '# TYPE http_responses_total counter',
+            ]
+            lines += [
+                f'http_responses_total{_labels(view=view, method=method, status=status)} {count}'
+                for (view, method, status), count in sorted(self._responses.items())
+            ]
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def gauge_lines(name, help_text, value, metric_type='gauge'):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name} {value}']
+
+
+def _histogram_lines(name, help_text, histograms):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for (view, method), histogram in sorted(histograms.items()):
+        for bound, total in histogram.cumulative():
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_labels(view=view, method=method, le=le)} {total}')
+        lines.append(f'{name}_sum{_labels(view=view, method=method)} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{_labels(view=view, method=method)} {histogram.count}')
+    return lines
+
+
+registry = Registry()
+
+_flag = {'enabled': None, 'checked_at': 0.0}
+
+
+def is_enabled():
+    now = time.monotonic()
+    if _flag['enabled'] is None or now - _flag['checked_at'] > FLAG_REFRESH_SECONDS:
+        _flag['enabled'] = cache.get(ENABLED_KEY, getattr(settings, 'METRICS_ENABLED', True))
+        _flag['checked_at'] = now
+    return _flag['enabled']
+
+
+def set_enabled(enabled):
+    """Вмикає або вимикає збір метрик (у процесах, що бачать той самий Django-кеш)."""
+    cache.set(ENABLED_KEY, bool(enabled), timeout=None)
+    _flag['enabled'] = bool(enabled)
+    _flag['checked_at'] = time.monotonic()
+
+
+def view_name(view_func, method):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+    return f'{cls.__name__}.{method.lower()}'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_enabled():
+            return self.get_response(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        if response.streaming:
+            # Потокові відповіді (експорт) читають БД під час віддачі тіла — рахуємо і цей час
+            response.streaming_content = self._stream(
+                request, response, response.streaming_content, tracker, started,
+            )
+        else:
+            self._record(request, response, tracker, time.perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_name(view_func, request.method)
+
+    def _stream(self, request, response, content, tracker, started):
+        try:
+            with connection.execute_wrapper(tracker):
+                yield from content
+        finally:
+            self._record(request, response, tracker, time.perf_counter() - started)
+
+    def _record(self, request, response, tracker, elapsed):
+        view = getattr(request, 'metrics_view', 'unresolved')
+        registry.observe(view, request.method, response.status_code, elapsed, tracker)
+        if elapsed >= getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', 1.0):
+            entry = {
+                'view': view,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'seconds': round(elapsed, 4),
+                'sql_queries': tracker.count,
+                'sql_seconds': round(tracker.seconds, 4),
+                'slowest_sql': [
+                    {'seconds': round(seconds, 4), 'sql': sql}
+                    for seconds, sql in sorted(tracker.slowest, reverse=True)
+                ],
+            }
+            registry.slow_requests.append(entry)
+            logger.warning(
+                "Повільний запит %s %s (%s): %.3f с, SQL: %d запитів / %.3f с; найповільніший: %s",
+                request.method, entry['path'], view, elapsed, tracker.count, tracker.seconds,
+                entry['slowest_sql'][0]['sql'] if entry['slowest_sql'] else '-',
+            )
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:09
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    Visit = apps.get_model('api', 'Visit')
+    DailyVisitRollup = apps.get_model('api', 'DailyVisitRollup')
+    totals = (
+        Visit.objects.annotate(day=TruncDate('visit_date'))
+        .values_list('day', 'institution_id').annotate(n=Count('id')).order_by()
+    )
+    by_category = (
+        Visit.objects.filter(symptoms__isnull=False).annotate(day=TruncDate('visit_date'))
+        .values_list('day', 'institution_id', 'symptoms__category').annotate(n=Count('id', distinct=True)).order_by()
+    )
+    rows = [DailyVisitRollup(day=d, institution_id=i, category='', count=n) for d, i, n in totals]
+    rows += [DailyVisitRollup(day=d, institution_id=i, category=c, count=n) for d, i, c, n in by_category]
+    DailyVisitRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('category', models.CharField(blank=True, default='', max_length=50, verbose_name='Категорія')),
+                ('count', models.IntegerField(default=0, verbose_name='Кількість візитів')),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.institution', verbose_name='Заклад')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'day'], name='api_dailyvi_categor_196c40_idx')],
+                'unique_together': {('day', 'institution', 'category')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
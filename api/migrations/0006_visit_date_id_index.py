@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_dailyvisitrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['visit_date', 'id'], name='api_visit_visit_d_641f43_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_search_index(apps, schema_editor):
+    # Чисті функції нормалізації з api.search_index; моделі — історичні
+    from api.search_index import FIELDS, TEXT_MAX_LENGTH, gram_hash, normalize, trigrams
+
+    SearchEntry = apps.get_model('api', 'SearchEntry')
+    SearchGram = apps.get_model('api', 'SearchGram')
+    sources = {'user': apps.get_model('api', 'User'), 'institution': apps.get_model('api', 'Institution'),
+               'patient': apps.get_model('api', 'Patient')}
+    for kind, model in sources.items():
+        for pk, *values in model.objects.values_list('pk', *FIELDS[kind]).iterator():
+            text = normalize(' '.join(value or '' for value in values))[:TEXT_MAX_LENGTH]
+            grams = trigrams(text)
+            entry = SearchEntry.objects.create(kind=kind, object_id=pk, text=text, gram_count=len(grams))
+            SearchGram.objects.bulk_create([SearchGram(gram=gram_hash(gram), kind=kind, entry=entry) for gram in grams])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_visit_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Користувач'), ('institution', 'Заклад'), ('patient', 'Пацієнт')], max_length=20, verbose_name="Тип об'єкта")),
+                ('object_id', models.PositiveIntegerField(verbose_name="ID об'єкта")),
+                ('text', models.CharField(max_length=512, verbose_name='Нормалізований текст')),
+                ('gram_count', models.PositiveIntegerField(default=0, verbose_name='Кількість триграм')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.IntegerField(verbose_name='Хеш триграми')),
+                ('kind', models.CharField(max_length=20, verbose_name="Тип об'єкта")),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grams', to='api.searchentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'gram', 'entry'], name='api_searchg_kind_378da1_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
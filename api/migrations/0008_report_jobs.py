@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_searchentry_searchgram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Ключ кешу'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='data_version',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Версія даних'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='source',
+            field=models.CharField(choices=[('upload', 'Завантажено'), ('generated', 'Згенеровано')], default='upload', max_length=20, verbose_name='Джерело'),
+        ),
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Тип звіту')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Параметри')),
+                ('cache_key', models.CharField(max_length=64, verbose_name='Ключ кешу')),
+                ('data_version', models.BigIntegerField(verbose_name='Версія даних')),
+                ('status', models.CharField(choices=[('pending', 'Очікує'), ('running', 'Виконується'), ('done', 'Готово'), ('failed', 'Помилка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Помилка')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Спроби')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='api.report')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='api_reportj_status_27e75d_idx'), models.Index(fields=['cache_key', 'data_version'], name='api_reportj_cache_k_ee51fd_idx')],
+            },
+        ),
+    ]
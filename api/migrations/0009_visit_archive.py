@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Місяць')),
+                ('part', models.PositiveIntegerField(default=1, verbose_name='Частина')),
+                ('file', models.FileField(upload_to='visit_archive/')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Кількість візитів')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Контрольна сума')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['institution', 'visit_date', 'id'], name='api_visit_institu_f5dde7_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='visitarchive',
+            unique_together={('month', 'part')},
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_visit_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_day', models.DateField(blank=True, null=True)),
+                ('cusum', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutbreakAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('category', models.CharField(max_length=50, verbose_name='Категорія')),
+                ('method', models.CharField(choices=[('ears_c1', 'EARS C1'), ('ears_c2', 'EARS C2'), ('ears_c3', 'EARS C3'), ('cusum', 'CUSUM'), ('farrington', 'Farrington')], max_length=20, verbose_name='Метод')),
+                ('observed', models.IntegerField(verbose_name='Спостережено')),
+                ('expected', models.FloatField(verbose_name='Очікувано')),
+                ('score', models.FloatField(verbose_name='Статистика')),
+                ('threshold', models.FloatField(verbose_name='Поріг')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True, verbose_name='Надіслано в чат')),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.institution', verbose_name='Заклад')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='api_outbrea_day_e21ca3_idx')],
+                'unique_together': {('day', 'institution', 'category', 'method')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_outbreak_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='Контрольна сума')),
+                ('size', models.BigIntegerField(verbose_name='Розмір, байт')),
+                ('file', models.FileField(upload_to='blobs/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name="Ім'я файлу"),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reports', to='api.fileblob'),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name="Ім'я файлу")),
+                ('size', models.BigIntegerField(verbose_name='Розмір, байт')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='Контрольна сума')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Отримано, байт')),
+                ('status', models.CharField(choices=[('active', 'Завантажується'), ('complete', 'Завершено')], default='active', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.report')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='api_uploads_status_0c016c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='ingest_created',
+            field=models.PositiveIntegerField(default=0, verbose_name='Створено візитів'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='ingest_errors',
+            field=models.JSONField(blank=True, default=list, verbose_name='Помилки імпорту'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='ingest_failed',
+            field=models.PositiveIntegerField(default=0, verbose_name='Рядків з помилками'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='ingest_rows',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оброблено рядків'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='ingest_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Очікує імпорту'), ('running', 'Імпортується'), ('done', 'Імпортовано'), ('failed', 'Помилка імпорту'), ('duplicate', 'Вміст уже імпортовано')], db_index=True, default='', max_length=20, verbose_name='Статус імпорту'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='ingest_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
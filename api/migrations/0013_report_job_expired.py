@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_report_ingest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Очікує'), ('running', 'Виконується'), ('done', 'Готово'), ('failed', 'Помилка'), ('expired', 'Застарів')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+import api.storage
+
+
+def _file_names(apps):
+    names = set()
+    for model in ('FileBlob', 'Report'):
+        names.update(apps.get_model('api', model).objects.exclude(file='').values_list('file', flat=True))
+    return names
+
+
+def move_to_private(apps, schema_editor):
+    # Вміст звітів раніше лежав у публічному MEDIA_ROOT
+    api.storage.move_files(_file_names(apps), settings.MEDIA_ROOT, settings.PRIVATE_MEDIA_ROOT)
+
+
+def move_to_public(apps, schema_editor):
+    api.storage.move_files(_file_names(apps), settings.PRIVATE_MEDIA_ROOT, settings.MEDIA_ROOT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_report_job_expired'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fileblob',
+            name='file',
+            field=models.FileField(storage=api.storage.PrivateFileStorage(), upload_to='blobs/'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='file',
+            field=models.FileField(storage=api.storage.PrivateFileStorage(), upload_to='reports/'),
+        ),
+        migrations.RunPython(move_to_private, move_to_public),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+import api.storage
+
+
+def _file_names(apps):
+    return set(apps.get_model('api', 'VisitArchive').objects.exclude(file='').values_list('file', flat=True))
+
+
+def move_to_private(apps, schema_editor):
+    # Архіви візитів раніше лежали в публічному MEDIA_ROOT
+    api.storage.move_files(_file_names(apps), settings.MEDIA_ROOT, settings.PRIVATE_MEDIA_ROOT)
+
+
+def move_to_public(apps, schema_editor):
+    api.storage.move_files(_file_names(apps), settings.PRIVATE_MEDIA_ROOT, settings.MEDIA_ROOT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_private_report_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visitarchive',
+            name='file',
+            field=models.FileField(storage=api.storage.PrivateFileStorage(), upload_to='visit_archive/'),
+        ),
+        migrations.RunPython(move_to_private, move_to_public),
+    ]
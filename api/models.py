@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
+from .storage import private_storage
+
 class Institution(models.Model):
     INSTITUTION_TYPES = [
         ('Клініка', 'Клініка'),
@@ -50,6 +52,15 @@ class Visit(models.Model):
     institution = models.ForeignKey(Institution, on_delete=models.CASCADE, verbose_name="Заклад")
     symptoms = models.ManyToManyField(Symptom, verbose_name="Симптоми")
 
+    class Meta:
+        indexes = [
+            # Курсорна пагінація і фільтри за періодом ідуть по (visit_date, id);
+            # цей індекс обслуговує й запити лише за visit_date
+            models.Index(fields=['visit_date', 'id']),
+            # Візити одного закладу за період (список лікаря, експорт, звіти по закладу)
+            models.Index(fields=['institution', 'visit_date', 'id']),
+        ]
+
     def __str__(self):
         return f"Візит {self.patient.patient_code} до {self.institution.name} ({self.visit_date.strftime('%Y-%m-%d')})"
     
@@ -74,6 +85,18 @@ class Message(models.Model):
     def __str__(self):
         return f"Від {self.sender.username} у кімнаті {self.room.name}"
     
+class FileBlob(models.Model):
+    # Вміст завантаженого файлу, адресований контрольною сумою (див. api/uploads.py):
+    # однакові файли зберігаються один раз, звіти посилаються на спільний blob.
+    # Файли — у приватному сховищі (api/storage.py), віддаються лише власникам звітів
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="Контрольна сума")
+    size = models.BigIntegerField(verbose_name="Розмір, байт")
+    file = models.FileField(upload_to='blobs/', storage=private_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.size} Б)"
+
 class Report(models.Model):
     # Посилання на користувача, який завантажив звіт
     user = models.ForeignKey(
@@ -81,10 +104,220 @@ class Report(models.Model):
         on_delete=models.CASCADE, 
         related_name='reports'
     )
-    # Поле для зберігання файлу. Файли будуть у папці 'media/reports/'
-    file = models.FileField(upload_to='reports/')
+    # Поле для зберігання файлу. Файли будуть у папці 'reports/' приватного сховища
+    # (PRIVATE_MEDIA_ROOT, api/storage.py) і віддаються лише через API після перевірки доступу
+    file = models.FileField(upload_to='reports/', storage=private_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Завантажені файли зберігаються як FileBlob (file вказує на файл blob-а), name — ім'я від клієнта
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='reports')
+    name = models.CharField(max_length=255, blank=True, default='', verbose_name="Ім'я файлу")
+
+    # Імпорт рядків CSV/XLSX у візити (api/ingest.py, воркер run_report_worker)
+    INGEST_PENDING = 'pending'
+    INGEST_RUNNING = 'running'
+    INGEST_DONE = 'done'
+    INGEST_FAILED = 'failed'
+    INGEST_DUPLICATE = 'duplicate'
+    INGEST_STATUSES = [
+        (INGEST_PENDING, 'Очікує імпорту'),
+        (INGEST_RUNNING, 'Імпортується'),
+        (INGEST_DONE, 'Імпортовано'),
+        (INGEST_FAILED, 'Помилка імпорту'),
+        (INGEST_DUPLICATE, 'Вміст уже імпортовано'),
+    ]
+    ingest_status = models.CharField(max_length=20, choices=INGEST_STATUSES, blank=True, default='',
+                                     db_index=True, verbose_name="Статус імпорту")
+    # Оброблені рядки даних (для продовження після збою), створені візити, рядки з помилками
+    ingest_rows = models.PositiveIntegerField(default=0, verbose_name="Оброблено рядків")
+    ingest_created = models.PositiveIntegerField(default=0, verbose_name="Створено візитів")
+    ingest_failed = models.PositiveIntegerField(default=0, verbose_name="Рядків з помилками")
+    ingest_errors = models.JSONField(default=list, blank=True, verbose_name="Помилки імпорту")
+    ingest_updated_at = models.DateTimeField(null=True, blank=True)
+
+    # Згенеровані воркером звіти (api/reports.py) кешуються за ключем параметрів і версією даних
+    UPLOADED = 'upload'
+    GENERATED = 'generated'
+    SOURCES = [
+        (UPLOADED, 'Завантажено'),
+        (GENERATED, 'Згенеровано'),
+    ]
+    source = models.CharField(max_length=20, choices=SOURCES, default=UPLOADED, verbose_name="Джерело")
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True, verbose_name="Ключ кешу")
+    data_version = models.BigIntegerField(null=True, blank=True, verbose_name="Версія даних")
 
     def __str__(self):
         # Використовуємо .path, щоб отримати назву файлу
-        return f'Report ({self.file.path}) by {self.user.username}'
\ No newline at end of file
+        return f'Report ({self.file.path}) by {self.user.username}'
+
+class DailyVisitRollup(models.Model):
+    # Попередньо агреговані лічильники візитів: день × заклад × категорія симптомів.
+    # Рядок з порожньою категорією містить загальну кількість візитів за день.
+    day = models.DateField(verbose_name="День")
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, verbose_name="Заклад")
+    category = models.CharField(max_length=50, blank=True, default='', verbose_name="Категорія")
+    count = models.IntegerField(default=0, verbose_name="Кількість візитів")
+
+    class Meta:
+        unique_together = ('day', 'institution', 'category')
+        indexes = [models.Index(fields=['category', 'day'])]
+
+    def __str__(self):
+        return f"{self.day} / {self.institution_id} / {self.category or 'усі'}: {self.count}"
+
+class SearchEntry(models.Model):
+    # Нормалізований текст об'єкта для глобального пошуку (див. api/search_index.py)
+    KINDS = [
+        ('user', 'Користувач'),
+        ('institution', 'Заклад'),
+        ('patient', 'Пацієнт'),
+    ]
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name="Тип об'єкта")
+    object_id = models.PositiveIntegerField(verbose_name="ID об'єкта")
+    text = models.CharField(max_length=512, verbose_name="Нормалізований текст")
+    gram_count = models.PositiveIntegerField(default=0, verbose_name="Кількість триграм")
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.text}"
+
+class SearchGram(models.Model):
+    # Інвертований індекс: хеш триграми → запис пошуку. Тип дублюється з SearchEntry,
+    # щоб пошук по одному типу обходився індексом без з'єднання таблиць.
+    gram = models.IntegerField(verbose_name="Хеш триграми")
+    kind = models.CharField(max_length=20, verbose_name="Тип об'єкта")
+    entry = models.ForeignKey(SearchEntry, on_delete=models.CASCADE, related_name='grams')
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'gram', 'entry'])]
+
+class DataVersion(models.Model):
+    # Лічильник версії даних (api/data_version.py)
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+class ReportJob(models.Model):
+    # Завдання черги генерації звітів; виконує команда run_report_worker
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    # Файл звіту видалено, бо дані змінились (reports._prune) — звіт потрібно запросити знову
+    EXPIRED = 'expired'
+    STATUSES = [
+        (PENDING, 'Очікує'),
+        (RUNNING, 'Виконується'),
+        (DONE, 'Готово'),
+        (FAILED, 'Помилка'),
+        (EXPIRED, 'Застарів'),
+    ]
+    kind = models.CharField(max_length=50, verbose_name="Тип звіту")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметри")
+    cache_key = models.CharField(max_length=64, verbose_name="Ключ кешу")
+    data_version = models.BigIntegerField(verbose_name="Версія даних")
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING, verbose_name="Статус")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs')
+    report = models.ForeignKey(Report, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    error = models.TextField(blank=True, default='', verbose_name="Помилка")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Спроби")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['cache_key', 'data_version']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class VisitArchive(models.Model):
+    # Візити одного місяця, перенесені з таблиці Visit у стиснутий файл (gzip NDJSON,
+    # див. api/archive.py). Пізні візити за вже архівований місяць додаються новою частиною.
+    # Файли містять дані пацієнтів — лише в приватному сховищі (api/storage.py)
+    month = models.DateField(verbose_name="Місяць")
+    part = models.PositiveIntegerField(default=1, verbose_name="Частина")
+    file = models.FileField(upload_to='visit_archive/', storage=private_storage)
+    rows = models.PositiveIntegerField(default=0, verbose_name="Кількість візитів")
+    sha256 = models.CharField(max_length=64, verbose_name="Контрольна сума")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('month', 'part')
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} / {self.part}: {self.rows}"
+
+class OutbreakAlert(models.Model):
+    # Сигнал можливого спалаху в ряді заклад × категорія (див. api/detection.py)
+    C1 = 'ears_c1'
+    C2 = 'ears_c2'
+    C3 = 'ears_c3'
+    CUSUM = 'cusum'
+    FARRINGTON = 'farrington'
+    METHODS = [
+        (C1, 'EARS C1'),
+        (C2, 'EARS C2'),
+        (C3, 'EARS C3'),
+        (CUSUM, 'CUSUM'),
+        (FARRINGTON, 'Farrington'),
+    ]
+    day = models.DateField(verbose_name="День")
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, verbose_name="Заклад")
+    category = models.CharField(max_length=50, verbose_name="Категорія")
+    method = models.CharField(max_length=20, choices=METHODS, verbose_name="Метод")
+    # Для Farrington — тижнева сума (7 днів до дня включно), для інших — денна кількість
+    observed = models.IntegerField(verbose_name="Спостережено")
+    expected = models.FloatField(verbose_name="Очікувано")
+    score = models.FloatField(verbose_name="Статистика")
+    threshold = models.FloatField(verbose_name="Поріг")
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_at = models.DateTimeField(null=True, blank=True, verbose_name="Надіслано в чат")
+
+    class Meta:
+        unique_together = ('day', 'institution', 'category', 'method')
+        indexes = [models.Index(fields=['day'])]
+
+    def __str__(self):
+        return f"{self.day} / {self.institution_id} / {self.category}: {self.method}"
+
+class DetectionState(models.Model):
+    # Стан інкрементального виявлення спалахів: останній оброблений день і накопичені CUSUM рядів
+    name = models.CharField(max_length=50, unique=True)
+    last_day = models.DateField(null=True, blank=True)
+    cusum = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_day}"
+
+class UploadSession(models.Model):
+    # Докачуване завантаження файлу частинами (api/uploads.py): частини дописуються
+    # в тимчасовий файл за зсувом, після фіналізації вміст стає FileBlob і Report
+    ACTIVE = 'active'
+    COMPLETE = 'complete'
+    STATUSES = [
+        (ACTIVE, 'Завантажується'),
+        (COMPLETE, 'Завершено'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    name = models.CharField(max_length=255, verbose_name="Ім'я файлу")
+    size = models.BigIntegerField(verbose_name="Розмір, байт")
+    # Контрольна сума, заявлена клієнтом (необов'язково) — перевіряється при фіналізації
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name="Контрольна сума")
+    received = models.BigIntegerField(default=0, verbose_name="Отримано, байт")
+    status = models.CharField(max_length=20, choices=STATUSES, default=ACTIVE, verbose_name="Статус")
+    report = models.ForeignKey(Report, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'updated_at'])]
+
+    def __str__(self):
+        return f"{self.name}: {self.received}/{self.size} ({self.status})"
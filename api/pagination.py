@@ -0,0 +1,99 @@
+# api/pagination.py
+"""
+Курсорна (keyset) пагінація списку візитів за парою (visit_date, id).
+
+На відміну від OFFSET, кожна сторінка — це один індексний діапазон
+WHERE (visit_date, id) < (курсор) ORDER BY visit_date DESC, id DESC LIMIT n,
+тож вартість не залежить від того, наскільки далеко гортає клієнт.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(visit_date, pk, reverse=False):
+    payload = json.dumps({'d': visit_date.isoformat(), 'id': pk, 'r': int(reverse)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload['d']), int(payload['id']), bool(payload.get('r'))
+    except (TypeError, ValueError, KeyError):
+        raise NotFound("Некоректний курсор.")
+
+
+class VisitKeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'VISIT_PAGE_SIZE', 50)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            size = default
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        reverse = False
+        if cursor:
+            visit_date, pk, reverse = decode_cursor(cursor)
+            # Зайва умова по visit_date дозволяє БД почати з пошуку по індексу
+            if reverse:
+                queryset = queryset.filter(Q(visit_date__gt=visit_date) | Q(visit_date=visit_date, id__gt=pk),
+                                           visit_date__gte=visit_date)
+            else:
+                queryset = queryset.filter(Q(visit_date__lt=visit_date) | Q(visit_date=visit_date, id__lt=pk),
+                                           visit_date__lte=visit_date)
+        ordering = ('visit_date', 'id') if reverse else ('-visit_date', '-id')
+        rows = list(queryset.order_by(*ordering)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or reverse:
+                self.next_cursor = encode_cursor(last.visit_date, last.pk)
+            if cursor and not reverse or reverse and has_more:
+                self.previous_cursor = encode_cursor(first.visit_date, first.pk, reverse=True)
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.next_cursor),
+            'previous': self._link(self.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,117 @@
+# api/period_report.py
+"""
+Підготовка даних для аналітичного звіту за період (api/report_builder.py).
+
+Усі запити до БД виконуються тут, у процесі воркера: денні лічильники
+читаються одним запитом з DailyVisitRollup, SIR-калібрування — векторизоване
+(api/calibration.py). Пулу рендерингу передаються лише списки й словники.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+
+from . import calibration, report_builder, rollups
+from .models import DailyVisitRollup, Institution, Symptom
+
+PERIOD = 'period'
+
+
+def _dense(rows, days):
+    """{(заклад, категорія): масив по днях} з рядків (день, заклад, категорія, кількість)."""
+    index = {day: i for i, day in enumerate(days)}
+    series = {}
+    for day, institution_id, category, count in rows:
+        values = series.setdefault((institution_id, category), np.zeros(len(days), dtype=np.int64))
+        values[index[day]] += count
+    return series
+
+
+def _institution_series(series, institution_id, categories, length):
+    empty = np.zeros(length, dtype=np.int64)
+    return (
+        series.get((institution_id, rollups.TOTAL), empty),
+        {name: series.get((institution_id, name), empty) for name in categories},
+    )
+
+
+def collect(params):
+    """Повертає аргументи report_builder.build (без output) для параметрів звіту."""
+    date_from = date.fromisoformat(params['date_from'])
+    date_to = date.fromisoformat(params['date_to'])
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    day_labels = [day.isoformat() for day in days]
+    categories = [name for name, _ in Symptom.SYMPTOM_CATEGORIES]
+
+    rollup_rows = DailyVisitRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+    institutions = Institution.objects.order_by('name')
+    if params.get('institutions'):
+        rollup_rows = rollup_rows.filter(institution_id__in=params['institutions'])
+        institutions = institutions.filter(id__in=params['institutions'])
+    series = _dense(rollup_rows.values_list('day', 'institution_id', 'category', 'count'), days)
+    names = dict(institutions.values_list('id', 'name'))
+
+    totals = np.zeros(len(days), dtype=np.int64)
+    by_category = {name: np.zeros(len(days), dtype=np.int64) for name in categories}
+    institution_sections = []
+    institution_totals = []
+    for institution_id, name in names.items():
+        total, per_category = _institution_series(series, institution_id, categories, len(days))
+        if not total.any():
+            continue
+        totals += total
+        for category, values in per_category.items():
+            by_category[category] += values
+        institution_totals.append((name, int(total.sum())))
+        institution_sections.append(('institution', {
+            'title': f"Заклад: {name}",
+            'days': day_labels,
+            'totals': total.tolist(),
+            'by_category': {category: values.tolist() for category, values in per_category.items()},
+        }))
+
+    sections = [('overview', {
+        'title': "Огляд періоду",
+        'days': day_labels,
+        'totals': totals.tolist(),
+        'by_category': {category: values.tolist() for category, values in by_category.items()},
+        'category_totals': {category: int(values.sum()) for category, values in by_category.items()},
+        'institutions': sorted(institution_totals, key=lambda item: -item[1]),
+    })]
+    sections += institution_sections
+
+    # SIR-проєкції для категорій, де є випадки і популяція не менша за денний максимум
+    population, horizon = params['population'], params['horizon']
+    projection_days = [(date_from + timedelta(days=i)).isoformat() for i in range(len(days) + horizon)]
+    for category, observed in by_category.items():
+        if not observed.any() or observed.max() > population:
+            continue
+        fitted = calibration.fit(observed, population)
+        model = calibration.model_incidence(
+            fitted['beta'], fitted['gamma'], fitted['initial_infected'], population, len(projection_days)
+        )
+        sections.append(('projection', {
+            'title': f"SIR-проєкція: {category}",
+            'days': projection_days,
+            'observed': observed.tolist(),
+            'model': [float(value) for value in model],
+            'fitted': fitted,
+            'population': population,
+        }))
+
+    summary = [
+        f"Період: {date_from:%d.%m.%Y} — {date_to:%d.%m.%Y} ({len(days)} дн.)",
+        f"Закладів з візитами: {len(institution_sections)}",
+        f"Усього візитів: {int(totals.sum())}",
+        f"Горизонт SIR-проєкції: {horizon} дн., популяція: {population}",
+    ]
+    return {
+        'title': "Аналітичний звіт за період",
+        'subtitle': f"{date_from:%d.%m.%Y} — {date_to:%d.%m.%Y}",
+        'summary': summary,
+        'sections': sections,
+    }
+
+
+def render_period(output, params):
+    report_builder.build(output, workers=getattr(settings, 'REPORT_RENDER_WORKERS', None), **collect(params))
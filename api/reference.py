@@ -0,0 +1,87 @@
+# api/reference.py
+"""
+Кеш довідників (Symptom, Institution) у пам'яті процесу.
+
+Таблиці малі й змінюються рідко, а читаються на кожному завантаженні форм
+і при кожному записі візиту. Довідник завантажується одним запитом при першому
+зверненні; далі список і пошук за ID — у пам'яті. Збереження чи видалення
+запису скидає кеш через post_save/post_delete (api/signals.py) і після коміту
+збільшує лічильник версії в БД (data_version.LocalVersion, як і кеш членства
+в чат-кімнатах). Таблиця позначена версією, прочитаною до її завантаження;
+версія з БД звіряється не частіше ніж раз на data_version.REFRESH_SECONDS,
+тож звернення до кешу зазвичай не коштують жодного запиту, а інші процеси
+бачать зміну не пізніше ніж через цей інтервал.
+
+Об'єкти в кеші спільні для потоків — їх лише читають, змінювати не можна.
+Оновлення через QuerySet.update() сигналів не надсилає: після нього потрібно
+викликати invalidate() вручну.
+"""
+import threading
+
+from . import data_version
+from .models import Institution, Symptom
+
+VERSION_NAME = 'reference_data'
+MODELS = (Symptom, Institution)
+
+_lock = threading.Lock()
+_tables = {}
+_version = data_version.LocalVersion(VERSION_NAME)
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _table(model):
+    """(кортеж об'єктів за зростанням ID, словник ID → об'єкт)."""
+    version = _version.get()
+    with _lock:
+        entry = _tables.get(model)
+        if entry is not None and entry[0] == version:
+            _stats['hits'] += 1
+            return entry[1]
+        _stats['misses'] += 1
+    rows = tuple(model.objects.order_by('pk'))
+    table = (rows, {obj.pk: obj for obj in rows})
+    with _lock:
+        _tables[model] = (version, table)
+    return table
+
+
+def objects(model):
+    """Усі записи довідника за зростанням ID."""
+    return _table(model)[0]
+
+
+def by_id(model):
+    """Словник ID → об'єкт; для кількох пошуків поспіль — одна звірка версії."""
+    return _table(model)[1]
+
+
+def lookup(index, pk):
+    """Об'єкт зі словника by_id() або None (зокрема для некоректного ID)."""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return index.get(pk)
+
+
+def get(model, pk):
+    """Об'єкт довідника за ID або None (зокрема для некоректного ID)."""
+    return lookup(by_id(model), pk)
+
+
+def invalidate(model=None):
+    """Скидає кеш вказаного довідника (або всіх) і після коміту повідомляє інші процеси."""
+    with _lock:
+        if model is None:
+            _tables.clear()
+        else:
+            _tables.pop(model, None)
+        _stats['invalidations'] += 1
+    # Нова версія відкидає й таблиці цього процесу: інший потік міг перечитати довідник до коміту
+    _version.bump()
+
+
+def stats():
+    with _lock:
+        return dict(_stats, tables=len(_tables))
@@ -0,0 +1,478 @@
+# api/report_builder.py
+"""
+Збирання багатосторінкових PDF-звітів із розділів.
+
+Кожен розділ (таблиці, графіки) рендериться окремим документом ReportLab
+Platypus у пулі процесів у тимчасовий файл; потім розділи по одному
+копіюються у вихідний потік (_PdfStream), а на кожну сторінку додається
+наскрізний номер. У пам'яті при цьому лише об'єкти поточного розділу і зсуви
+вже записаних об'єктів. Розділи отримують лише підготовлені дані (списки,
+словники), тож модуль не залежить від Django і безпечно імпортується в
+дочірніх процесах.
+"""
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, NumberObject,
+    TextStringObject,
+)
+from reportlab.graphics.charts.barcharts import HorizontalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+# --- РЕЄСТРАЦІЯ ШРИФТУ ---
+# (Це потрібно для кирилиці у PDF)
+try:
+    pdfmetrics.registerFont(TTFont('FreeSans', '/usr/share/fonts/truetype/freefont/FreeSans.ttf'))
+except IOError:
+    # Це може бути інший шлях у вашому Docker-контейнері
+    print("ПОПЕРЕДЖЖЕННЯ: Шрифт FreeSans не знайдено. PDF може мати проблеми з кирилицею.")
+
+FONT = 'FreeSans'
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 18 * mm
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+SERIES_COLORS = [
+    colors.HexColor('#1f77b4'), colors.HexColor('#d62728'), colors.HexColor('#2ca02c'),
+    colors.HexColor('#9467bd'), colors.HexColor('#ff7f0e'), colors.HexColor('#8c564b'),
+]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _styles():
+    base = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle('title', parent=base['Title'], fontName=FONT, fontSize=20, leading=24),
+        'h1': ParagraphStyle('h1', parent=base['Heading1'], fontName=FONT, fontSize=15, leading=19),
+        'h2': ParagraphStyle('h2', parent=base['Heading2'], fontName=FONT, fontSize=12, leading=15),
+        'body': ParagraphStyle('body', parent=base['Normal'], fontName=FONT, fontSize=9.5, leading=12.5),
+        'caption': ParagraphStyle('caption', parent=base['Normal'], fontName=FONT, fontSize=8,
+                                  textColor=colors.grey, alignment=TA_CENTER),
+    }
+
+
+def _table(rows, col_widths=None):
+    table = LongTable(rows, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), FONT),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e8eef5')),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#b0b8c4')),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7f9fb')]),
+        ('TOPPADDING', (0, 0), (-1, -1), 1.5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1.5),
+    ]))
+    return table
+
+
+def _line_chart(days, series, height=170):
+    """Лінійний графік кількох рядів за днями; series — список (назва, значення)."""
+    drawing = Drawing(CONTENT_WIDTH, height + 30)
+    plot = LinePlot()
+    plot.x, plot.y = 35, 40
+    plot.width, plot.height = CONTENT_WIDTH - 50, height - 20
+    plot.data = [list(enumerate(values)) for _, values in series]
+    for index in range(len(series)):
+        plot.lines[index].strokeColor = SERIES_COLORS[index % len(SERIES_COLORS)]
+        plot.lines[index].strokeWidth = 1.2
+    plot.xValueAxis.valueMin = 0
+    plot.xValueAxis.valueMax = max(len(days) - 1, 1)
+    plot.xValueAxis.valueSteps = list(range(0, len(days), max(len(days) // 6, 1)))
+    plot.xValueAxis.labelTextFormat = lambda value: days[int(value)][5:] if 0 <= int(value) < len(days) else ''
+    plot.yValueAxis.valueMin = 0
+    for axis in (plot.xValueAxis, plot.yValueAxis):
+        axis.labels.fontName = FONT
+        axis.labels.fontSize = 7
+    drawing.add(plot)
+
+    legend = Legend()
+    legend.x, legend.y = 35, 12
+    legend.fontName, legend.fontSize = FONT, 7
+    legend.alignment = 'right'
+    legend.columnMaximum = 1
+    legend.colorNamePairs = [(SERIES_COLORS[i % len(SERIES_COLORS)], name) for i, (name, _) in enumerate(series)]
+    drawing.add(legend)
+    return drawing
+
+
+def _bar_chart(labels, values):
+    height = 22 * len(labels) + 30
+    drawing = Drawing(CONTENT_WIDTH, height)
+    chart = HorizontalBarChart()
+    chart.x, chart.y = 140, 15
+    chart.width, chart.height = CONTENT_WIDTH - 160, height - 25
+    chart.data = [list(values)]
+    chart.bars[0].fillColor = SERIES_COLORS[0]
+    chart.categoryAxis.categoryNames = list(labels)
+    chart.valueAxis.valueMin = 0
+    for axis in (chart.categoryAxis, chart.valueAxis):
+        axis.labels.fontName = FONT
+        axis.labels.fontSize = 7.5
+    drawing.add(chart)
+    return drawing
+
+
+def _overview(payload, styles):
+    story = [Paragraph(payload['title'], styles['h1'])]
+    story.append(Paragraph("Щоденна кількість візитів (усі заклади)", styles['h2']))
+    series = [("Усі візити", payload['totals'])] + list(payload['by_category'].items())
+    story.append(_line_chart(payload['days'], series))
+    story.append(Spacer(1, 6 * mm))
+
+    story.append(Paragraph("Розподіл за категоріями симптомів", styles['h2']))
+    categories = sorted(payload['category_totals'].items(), key=lambda item: -item[1])
+    if categories:
+        story.append(_bar_chart([name for name, _ in categories], [count for _, count in categories]))
+    total = sum(payload['totals']) or 1
+    rows = [["Категорія", "Візитів", "Частка"]] + [
+        [name, f"{count:,}".replace(',', ' '), f"{count / total:.1%}"] for name, count in categories
+    ]
+    story.append(_table(rows, [CONTENT_WIDTH * 0.5, CONTENT_WIDTH * 0.25, CONTENT_WIDTH * 0.25]))
+    story.append(Spacer(1, 6 * mm))
+
+    story.append(Paragraph("Заклади", styles['h2']))
+    rows = [["Заклад", "Візитів"]] + [[name, f"{count:,}".replace(',', ' ')] for name, count in payload['institutions']]
+    story.append(_table(rows, [CONTENT_WIDTH * 0.75, CONTENT_WIDTH * 0.25]))
+    return story
+
+
+def _institution(payload, styles):
+    story = [Paragraph(payload['title'], styles['h1'])]
+    categories = list(payload['by_category'])
+    series = [("Усі візити", payload['totals'])] + list(payload['by_category'].items())
+    story.append(_line_chart(payload['days'], series))
+    story.append(Spacer(1, 4 * mm))
+
+    rows = [["Дата", "Усього"] + categories]
+    for index, day in enumerate(payload['days']):
+        rows.append([day, payload['totals'][index]] + [payload['by_category'][name][index] for name in categories])
+    first = CONTENT_WIDTH * 0.2
+    rest = (CONTENT_WIDTH - first) / (len(categories) + 1)
+    story.append(_table(rows, [first] + [rest] * (len(categories) + 1)))
+    return story
+
+
+def _projection(payload, styles):
+    fitted = payload['fitted']
+    confidence = fitted['confidence']
+    story = [Paragraph(payload['title'], styles['h1'])]
+    story.append(Paragraph(
+        f"Підібрано за {len(payload['observed'])} днів спостережень, популяція {payload['population']}. "
+        f"β = {fitted['beta']:.3f} [{confidence['beta'][0]:.3f}; {confidence['beta'][1]:.3f}], "
+        f"γ = {fitted['gamma']:.3f} [{confidence['gamma'][0]:.3f}; {confidence['gamma'][1]:.3f}], "
+        f"R₀ = {fitted['r0']:.2f} [{confidence['r0'][0]:.2f}; {confidence['r0'][1]:.2f}] (95%).",
+        styles['body'],
+    ))
+    story.append(Spacer(1, 3 * mm))
+    observed = payload['observed'] + [None] * (len(payload['model']) - len(payload['observed']))
+    story.append(_line_chart(payload['days'], [
+        ("Спостереження", [value if value is not None else 0 for value in observed]),
+        ("SIR-модель", payload['model']),
+    ]))
+    story.append(Paragraph("Після кінця періоду графік спостережень дорівнює нулю — далі лише проєкція.",
+                           styles['caption']))
+    story.append(Spacer(1, 4 * mm))
+    rows = [["Дата", "Спостереження", "Модель"]] + [
+        [day, '' if obs is None else obs, f"{model:.1f}"]
+        for day, obs, model in zip(payload['days'], observed, payload['model'])
+    ]
+    story.append(_table(rows, [CONTENT_WIDTH / 3] * 3))
+    return story
+
+
+SECTIONS = {
+    'overview': _overview,
+    'institution': _institution,
+    'projection': _projection,
+}
+
+
+def render_section(task):
+    """Рендерить розділ у файл path; повертає кількість сторінок. Виконується в дочірньому процесі."""
+    kind, payload, path, header = task
+    styles = _styles()
+
+    def decorate(pdf, doc):
+        pdf.saveState()
+        pdf.setFont(FONT, 7.5)
+        pdf.setFillColor(colors.grey)
+        pdf.drawString(MARGIN, PAGE_HEIGHT - 10 * mm, header)
+        pdf.restoreState()
+
+    doc = SimpleDocTemplate(path, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                            topMargin=MARGIN, bottomMargin=MARGIN, title=payload['title'])
+    doc.build(SECTIONS[kind](payload, styles), onFirstPage=decorate, onLaterPages=decorate)
+    return doc.page
+
+
+def _render_title(path, title, subtitle, summary, contents):
+    styles = _styles()
+    story = [Spacer(1, 25 * mm), Paragraph(title, styles['title']), Paragraph(subtitle, styles['caption']),
+             Spacer(1, 10 * mm)]
+    story += [Paragraph(line, styles['body']) for line in summary]
+    story += [Spacer(1, 8 * mm), Paragraph("Зміст", styles['h2'])]
+    rows = [["Розділ", "Сторінка"]] + [[name, page] for name, page in contents]
+    story.append(_table(rows, [CONTENT_WIDTH * 0.8, CONTENT_WIDTH * 0.2]))
+    doc = SimpleDocTemplate(path, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                            topMargin=MARGIN, bottomMargin=MARGIN, title=title)
+    doc.build(story)
+    return doc.page
+
+
+def _render_page_numbers(path, total):
+    pdf = canvas.Canvas(path, pagesize=A4)
+    for number in range(1, total + 1):
+        pdf.setFont(FONT, 7.5)
+        pdf.setFillColor(colors.grey)
+        pdf.drawRightString(PAGE_WIDTH - MARGIN, 10 * mm, f"Сторінка {number} з {total}")
+        pdf.showPage()
+    pdf.save()
+
+
+class _PdfStream:
+    """
+    Послідовний запис PDF у файловий об'єкт: кожен об'єкт записується одразу,
+    у пам'яті лишаються тільки зсуви для таблиці xref.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.offsets = []
+        self.position = 0
+        self._write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.output.write(data)
+        self.position += len(data)
+
+    def reserve(self):
+        """Номер для об'єкта, який буде записано пізніше (на нього вже можна посилатися)."""
+        self.offsets.append(None)
+        return IndirectObject(len(self.offsets), 0, None)
+
+    def add(self, obj, ref=None):
+        ref = ref or self.reserve()
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer)
+        self.offsets[ref.idnum - 1] = self.position
+        self._write(b'%d 0 obj\n%s\nendobj\n' % (ref.idnum, buffer.getvalue()))
+        return ref
+
+    def close(self, root, info):
+        start = self.position
+        table = [b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.offsets) + 1)]
+        table += [b'%010d 00000 n \n' % offset for offset in self.offsets]
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(len(self.offsets) + 1),
+            NameObject('/Root'): root,
+            NameObject('/Info'): info,
+        })
+        buffer = io.BytesIO()
+        trailer.write_to_stream(buffer)
+        self._write(b''.join(table) + b'trailer\n' + buffer.getvalue() + b'\nstartxref\n%d\n%%%%EOF\n' % start)
+
+
+class _Copier:
+    """Переносить об'єкти одного PdfReader у _PdfStream з перенумерацією посилань."""
+
+    def __init__(self, stream, reader):
+        self.stream = stream
+        self.reader = reader
+        self.ids = {}
+        self.pending = []
+
+    def ref(self, source):
+        if source.idnum not in self.ids:
+            self.ids[source.idnum] = self.stream.reserve()
+            self.pending.append(source)
+        return self.ids[source.idnum]
+
+    def translate(self, obj):
+        """Замінює посилання в obj (на місці) на номери у вихідному файлі; об'єкти, на які вони ведуть, — у черзі."""
+        if isinstance(obj, IndirectObject):
+            return self.ref(obj)
+        if isinstance(obj, DictionaryObject):
+            for key, value in list(obj.items()):
+                obj[key] = self.translate(value)
+        elif isinstance(obj, ArrayObject):
+            for index, value in enumerate(obj):
+                obj[index] = self.translate(value)
+        return obj
+
+    def flush(self):
+        while self.pending:
+            source = self.pending.pop()
+            self.stream.add(self.translate(self.reader.get_object(source)), self.ids[source.idnum])
+
+
+def _inherited(page, key):
+    """Успадковуваний атрибут сторінки (/Resources, /MediaBox) — зі сторінки або її предків."""
+    node = page
+    while key not in node:
+        if '/Parent' not in node:
+            return None
+        node = node['/Parent']
+    return node[key]
+
+
+class _PageWriter:
+    """
+    Дописує сторінки PDF-файлів у вихідний потік по одному файлу за раз і накладає
+    на кожну сторінку відповідну сторінку файлу з номерами (як Form XObject).
+    """
+    NUMBER = NameObject('/PageNumber')
+
+    def __init__(self, output, numbers_path):
+        self.stream = _PdfStream(output)
+        self.pages_ref = self.stream.reserve()
+        self.kids = ArrayObject()
+        self.numbers = PdfReader(numbers_path)
+        self.numbers_copier = _Copier(self.stream, self.numbers)
+        # Вміст сторінки береться в q ... Q, щоб її графічний стан не вплинув на номер
+        self.prefix = self.stream.add(self._content(b'q\n'))
+        self.suffix = self.stream.add(self._content(b'Q q %s Do Q\n' % self.NUMBER.encode()))
+
+    @staticmethod
+    def _content(data):
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return stream
+
+    def _number_form(self, index):
+        page = self.numbers.pages[index]
+        contents = page['/Contents']
+        parts = contents if isinstance(contents, ArrayObject) else [contents]
+        form = self._content(b''.join(part.get_object().get_data() for part in parts))
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject(page.mediabox),
+            NameObject('/Resources'): page.raw_get('/Resources'),
+        })
+        ref = self.stream.add(self.numbers_copier.translate(form))
+        self.numbers_copier.flush()
+        return ref
+
+    def append(self, path):
+        reader = PdfReader(path)
+        copier = _Copier(self.stream, reader)
+        pages = list(reader.pages)
+        refs = [copier.ref(page.indirect_reference) for page in pages]
+        copier.pending.clear()
+        for page, ref in zip(pages, refs):
+            resources = DictionaryObject(_inherited(page, '/Resources') or {})
+            xobjects = DictionaryObject(resources['/XObject'] if '/XObject' in resources else {})
+            contents = page.raw_get('/Contents')
+            contents = list(contents.get_object()) if isinstance(contents.get_object(), ArrayObject) else [contents]
+            media_box = _inherited(page, '/MediaBox')
+            for key in ('/Parent', '/Resources', '/Contents'):
+                page.pop(NameObject(key), None)
+            copier.translate(page)
+            resources = copier.translate(resources)
+            xobjects = copier.translate(xobjects)
+            xobjects[self.NUMBER] = self._number_form(len(self.kids))
+            resources[NameObject('/XObject')] = xobjects
+            page.update({
+                NameObject('/Parent'): self.pages_ref,
+                NameObject('/Resources'): resources,
+                NameObject('/MediaBox'): copier.translate(ArrayObject(media_box)),
+                NameObject('/Contents'): ArrayObject(
+                    [self.prefix] + [copier.translate(part) for part in contents] + [self.suffix]
+                ),
+            })
+            self.stream.add(page, ref)
+            copier.flush()
+            self.kids.append(ref)
+
+    def close(self, title):
+        self.stream.add(DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): self.kids,
+            NameObject('/Count'): NumberObject(len(self.kids)),
+        }), self.pages_ref)
+        root = self.stream.add(DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): self.pages_ref,
+        }))
+        info = self.stream.add(DictionaryObject({NameObject('/Title'): TextStringObject(title)}))
+        self.stream.close(root, info)
+
+
+def _get_pool(workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def build(output, title, subtitle, summary, sections, workers=None):
+    """
+    Збирає звіт у файловий об'єкт output. sections — список (тип, дані) з SECTIONS.
+    Розділи рендеряться паралельно; титульна сторінка із змістом — після них,
+    коли відомо, з якої сторінки починається кожен розділ.
+    """
+    with tempfile.TemporaryDirectory(prefix='report-') as workdir:
+        tasks = [
+            (kind, payload, os.path.join(workdir, f'section-{index:04d}.pdf'), title)
+            for index, (kind, payload) in enumerate(sections)
+        ]
+        if workers == 1 or len(tasks) < 2:
+            page_counts = [render_section(task) for task in tasks]
+        else:
+            try:
+                page_counts = list(_get_pool(workers).map(render_section, tasks))
+            except BrokenProcessPool:
+                # Пул міг загинути (наприклад, робочий процес убито) — рендеримо в поточному процесі
+                _reset_pool()
+                page_counts = [render_section(task) for task in tasks]
+
+        # Титульна сторінка займає одну сторінку, якщо зміст не надто довгий; інакше — перерахунок
+        title_path = os.path.join(workdir, 'title.pdf')
+        title_pages = 1
+        while True:
+            contents, page = [], title_pages + 1
+            for (kind, payload), count in zip(sections, page_counts):
+                contents.append((payload['title'], page))
+                page += count
+            rendered = _render_title(title_path, title, subtitle, summary, contents)
+            if rendered == title_pages:
+                break
+            title_pages = rendered
+
+        total = page - 1
+        numbers_path = os.path.join(workdir, 'numbers.pdf')
+        _render_page_numbers(numbers_path, total)
+
+        writer = _PageWriter(output, numbers_path)
+        for path in [title_path] + [task[2] for task in tasks]:
+            writer.append(path)
+        writer.close(title)
+    return total
@@ -0,0 +1,187 @@
+# api/reports.py
+"""
+Генерація PDF-звітів поза веб-запитом.
+
+Запит лише ставить завдання ReportJob у чергу в БД; команда run_report_worker
+забирає завдання й рендерить звіт. Готовий файл зберігається як Report з
+ключем (cache_key, data_version): поки дані не змінились (api/data_version.py),
+повторні запити віддають збережений файл без повторного рендерингу.
+"""
+import hashlib
+import json
+import tempfile
+import traceback
+from datetime import timedelta
+
+from django.core.files import File
+from django.db.models import F, Sum
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+# report_builder реєструє шрифт FreeSans під час імпорту
+from . import archive, data_version, report_builder, rollups
+from .models import DailyVisitRollup, Patient, Report, ReportJob, Visit
+from .period_report import PERIOD, render_period
+
+QUICK = 'quick'
+
+# Завдання, що "виконується" довше за це, вважається покинутим (воркер упав)
+STALE_AFTER = timedelta(minutes=15)
+MAX_ATTEMPTS = 3
+ERROR_LIMIT = 4000
+
+
+def render_quick(output, params):
+    """Швидкий звіт: загальні лічильники та останні 5 візитів на одній сторінці A4."""
+    p = canvas.Canvas(output, pagesize=A4)
+    width, height = A4
+    p.setFont('FreeSans', 12)
+
+    # --- ЗБИРАЄМО ДАНІ ---
+    # Візити архівованих місяців (api/archive.py) лишаються в загальних лічильниках
+    total_visits = Visit.objects.count() + archive.archived_count()
+    total_patients = Patient.objects.count()
+
+    most_common_symptom_data = DailyVisitRollup.objects.exclude(category=rollups.TOTAL) \
+                                                      .values('category') \
+                                                      .annotate(count=Sum('count')) \
+                                                      .order_by('-count') \
+                                                      .first()
+
+    if most_common_symptom_data and most_common_symptom_data['count']:
+        most_common_symptom = f"{most_common_symptom_data['category']} ({most_common_symptom_data['count']} випадків)"
+    else:
+        most_common_symptom = "Немає даних"
+
+    latest_visits = Visit.objects.select_related('patient').order_by('-visit_date')[:5]
+
+    # --- МАЛЮЄМО ДАНІ НА PDF ---
+    y = height - 100
+
+    p.setFont('FreeSans', 16)
+    p.drawString(100, y, "Швидкий звіт: Епідеміологічна ситуація")
+    y -= 20
+    p.drawString(100, y, "---------------------------------------------")
+    y -= 30
+
+    p.setFont('FreeSans', 12)
+    p.drawString(100, y, f"Загальна кількість візитів: {total_visits}")
+    y -= 20
+    p.drawString(100, y, f"Загальна кількість пацієнтів: {total_patients}")
+    y -= 20
+    p.drawString(100, y, f"Найпоширеніша категорія симптомів: {most_common_symptom}")
+    y -= 40
+
+    p.setFont('FreeSans', 14)
+    p.drawString(100, y, "Останні 5 візитів:")
+    y -= 25
+
+    p.setFont('FreeSans', 10)
+    for visit in latest_visits:
+        visit_date = visit.visit_date.strftime('%Y-%m-%d')
+        patient_name = str(visit.patient) if visit.patient else "Невідомий пацієнт"
+        p.drawString(120, y, f"• Дата: {visit_date} - Пацієнт: {patient_name}")
+        y -= 15
+
+    p.showPage()
+    p.save()
+
+
+# Тип звіту → (функція рендерингу, ім'я файлу для завантаження)
+RENDERERS = {
+    QUICK: (render_quick, 'quick_report.pdf'),
+    PERIOD: (render_period, 'period_report.pdf'),
+}
+
+
+def cache_key(kind, params):
+    payload = json.dumps([kind, params], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def filename_for(kind):
+    return RENDERERS[kind][1]
+
+
+def cached_report(kind, params, version):
+    return (
+        Report.objects.filter(source=Report.GENERATED, cache_key=cache_key(kind, params), data_version=version)
+        .order_by('-id').first()
+    )
+
+
+def enqueue(kind, params, user, version):
+    """
+    Ставить завдання в чергу або повертає вже заплановане цим користувачем для тих самих
+    параметрів і даних. Завдання інших користувачів не віддаються (їх бачать лише власники);
+    повторного рендерингу все одно не буде — run() спершу шукає готовий звіт.
+    """
+    key = cache_key(kind, params)
+    job = (
+        ReportJob.objects
+        .filter(cache_key=key, data_version=version, user=user, status__in=[ReportJob.PENDING, ReportJob.RUNNING])
+        .order_by('id').first()
+    )
+    if job is None:
+        job = ReportJob.objects.create(kind=kind, params=params, cache_key=key, data_version=version, user=user)
+    return job
+
+
+def requeue_stale():
+    now = timezone.now()
+    stale = ReportJob.objects.filter(status=ReportJob.RUNNING, started_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ReportJob.PENDING)
+    stale.update(status=ReportJob.FAILED, finished_at=now, error="Перевищено кількість спроб виконання.")
+
+
+def claim_next():
+    """Забирає найстаріше завдання; умовний UPDATE гарантує, що його отримає лише один воркер."""
+    for job_id in ReportJob.objects.filter(status=ReportJob.PENDING).order_by('created_at', 'id') \
+                                   .values_list('id', flat=True)[:10]:
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def _prune(report):
+    # Старі версії того самого звіту більше ніколи не будуть віддані
+    outdated = Report.objects.filter(
+        source=Report.GENERATED, cache_key=report.cache_key, data_version__lt=report.data_version,
+    )
+    # Завдання, що вказували на видалені файли, позначаються застарілими, а не лишаються "готовими" без файлу
+    ReportJob.objects.filter(report__in=outdated).update(status=ReportJob.EXPIRED, report=None)
+    for old in outdated:
+        old.file.delete(save=False)
+        old.delete()
+
+
+def run(job):
+    """Виконує завдання: бере готовий звіт для поточної версії даних або рендерить новий."""
+    try:
+        # Версія читається до рендерингу: якщо дані зміняться під час нього, звіт
+        # отримає старішу позначку і наступний запит просто згенерує новий
+        version = data_version.current()
+        report = cached_report(job.kind, job.params, version)
+        if report is None:
+            render, filename = RENDERERS[job.kind]
+            # Звіт пишеться у тимчасовий файл і потоково копіюється у сховище, а не тримається в пам'яті
+            with tempfile.TemporaryFile() as output:
+                render(output, job.params)
+                output.seek(0)
+                report = Report(user_id=job.user_id, source=Report.GENERATED, cache_key=job.cache_key,
+                                data_version=version)
+                report.file.save(filename, File(output), save=True)
+            _prune(report)
+        job.report = report
+        job.status = ReportJob.DONE
+        job.error = ''
+    except Exception:
+        job.status = ReportJob.FAILED
+        job.error = traceback.format_exc()[-ERROR_LIMIT:]
+    job.finished_at = timezone.now()
+    job.save(update_fields=['report', 'status', 'error', 'finished_at'])
+    return job
@@ -0,0 +1,195 @@
+# api/rollups.py
+"""
+Інкрементальне ведення денних агрегатів візитів (DailyVisitRollup).
+
+Кожен візит дає внесок +1 у рядок "усі візити" (category='') свого дня і
+закладу та +1 у рядок кожної окремої категорії його симптомів.
+Сигнали (api/signals.py) знімають внески до і після зміни та застосовують різницю.
+"""
+from collections import Counter
+from datetime import datetime, time
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive, data_version
+from .models import DailyVisitRollup, Visit
+
+# Категорія рядка із загальною кількістю візитів
+TOTAL = ''
+# Різниці з більшою кількістю рядків застосовуються пакетно (_apply_many)
+APPLY_ONE_BY_ONE = 16
+
+
+def visit_day(visit_date):
+    """День візиту у поточному часовому поясі (так само, як TruncDate у БД)."""
+    if timezone.is_aware(visit_date):
+        visit_date = timezone.localtime(visit_date)
+    return visit_date.date()
+
+
+def snapshot(visit_ids):
+    """
+    Повертає {visit_id: (день, institution_id, frozenset(категорій))}
+    для візитів, що зараз є в БД. Один запит на весь набір.
+    """
+    visit_ids = list(visit_ids)
+    if not visit_ids:
+        return {}
+    state = {}
+    rows = (
+        Visit.objects
+        .filter(id__in=visit_ids)
+        .values_list('id', 'visit_date', 'institution_id', 'symptoms__category')
+    )
+    for visit_id, visit_date, institution_id, category in rows:
+        day, _, categories = state.get(visit_id, (visit_day(visit_date), institution_id, frozenset()))
+        if category:
+            categories = categories | {category}
+        state[visit_id] = (day, institution_id, categories)
+    return state
+
+
+def contribution(day, institution_id, categories):
+    """Внесок одного візиту в агрегати."""
+    delta = Counter({(day, institution_id, TOTAL): 1})
+    for category in categories:
+        delta[(day, institution_id, category)] += 1
+    return delta
+
+
+def diff(before, after):
+    """Різниця агрегатів між двома знімками (результат snapshot)."""
+    delta = Counter()
+    for state in after.values():
+        delta.update(contribution(*state))
+    for state in before.values():
+        delta.subtract(contribution(*state))
+    return delta
+
+
+def _apply_one(day, institution_id, category, n):
+    rows = DailyVisitRollup.objects.filter(day=day, institution_id=institution_id, category=category)
+    if rows.update(count=F('count') + n) or n < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailyVisitRollup.objects.create(day=day, institution_id=institution_id, category=category, count=n)
+    except IntegrityError:
+        # Рядок паралельно створив інший запит — просто додаємо до нього
+        rows.update(count=F('count') + n)
+
+
+def _apply_many(items):
+    """
+    Та сама семантика для великої різниці (пакетний імпорт): один SELECT наявних рядків,
+    UPDATE ... SET count = count + n через executemany і один bulk_create для нових рядків.
+    """
+    existing = set(
+        DailyVisitRollup.objects
+        .filter(day__in={day for (day, _, _), _ in items}, institution_id__in={key[1] for key, _ in items})
+        .values_list('day', 'institution_id', 'category')
+    )
+    table = connection.ops.quote_name(DailyVisitRollup._meta.db_table)
+    count, day_column, institution_column, category_column = (
+        connection.ops.quote_name(DailyVisitRollup._meta.get_field(name).column)
+        for name in ('count', 'day', 'institution', 'category')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {table} SET {count} = {count} + %s '
+            f'WHERE {day_column} = %s AND {institution_column} = %s AND {category_column} = %s',
+            [(n, connection.ops.adapt_datefield_value(day), institution_id, category)
+             for (day, institution_id, category), n in items if (day, institution_id, category) in existing],
+        )
+    missing = [(key, n) for key, n in items if key not in existing and n > 0]
+    try:
+        with transaction.atomic():
+            DailyVisitRollup.objects.bulk_create([
+                DailyVisitRollup(day=day, institution_id=institution_id, category=category, count=n)
+                for (day, institution_id, category), n in missing
+            ])
+    except IntegrityError:
+        # Частину рядків паралельно створив інший запит — нові рядки по одному
+        for key, n in missing:
+            _apply_one(*key, n)
+
+
+def apply(delta):
+    """Застосовує різницю {(день, заклад, категорія): n} атомарними UPDATE ... SET count = count + n."""
+    items = [(key, n) for key, n in delta.items() if n]
+    if not items:
+        # Збереження без змін агрегатів не скидає кеш звітів; хто змінює таблицю Visit,
+        # не змінюючи агрегатів (архівування), оновлює версію сам
+        return
+    data_version.bump()
+    if len(items) > APPLY_ONE_BY_ONE:
+        _apply_many(items)
+        return
+    for (day, institution_id, category), n in items:
+        _apply_one(day, institution_id, category, n)
+
+
+def archived_contributions(date_from=None, date_to=None):
+    """Counter внесків архівованих візитів {(день, institution_id, категорія): n} за діапазон днів."""
+    counts = Counter()
+    for row in archive.read_archives(date_from, date_to):
+        day = visit_day(datetime.fromisoformat(row['visit_date']))
+        if date_from and day < date_from or date_to and day > date_to:
+            continue
+        for category in [TOTAL, *row['categories']]:
+            counts[day, row['institution_id'], category] += 1
+    return counts
+
+
+def rebuild(date_from=None, date_to=None, batch_size=1000):
+    """
+    Повністю перераховує агрегати з таблиці Visit і архівів візитів (за весь час
+    або за діапазон днів). Повертає кількість створених рядків.
+    """
+    visits = Visit.objects.all()
+    rollups = DailyVisitRollup.objects.all()
+    tz = timezone.get_current_timezone()
+    if date_from:
+        visits = visits.filter(visit_date__gte=timezone.make_aware(datetime.combine(date_from, time.min), tz))
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        visits = visits.filter(visit_date__lte=timezone.make_aware(datetime.combine(date_to, time.max), tz))
+        rollups = rollups.filter(day__lte=date_to)
+
+    totals = (
+        visits
+        .annotate(day=TruncDate('visit_date'))
+        .values_list('day', 'institution_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    by_category = (
+        visits
+        .filter(symptoms__isnull=False)
+        .annotate(day=TruncDate('visit_date'))
+        .values_list('day', 'institution_id', 'symptoms__category')
+        .annotate(n=Count('id', distinct=True))
+        .order_by()
+    )
+
+    created = 0
+    batch = []
+    with transaction.atomic():
+        data_version.bump()
+        rollups.delete()
+        rows = archived_contributions(date_from, date_to)
+        rows.update({(day, institution_id, TOTAL): n for day, institution_id, n in totals.iterator()})
+        for day, institution_id, category, n in by_category.iterator():
+            rows[day, institution_id, category] += n
+        for (day, institution_id, category), n in rows.items():
+            batch.append(DailyVisitRollup(day=day, institution_id=institution_id, category=category, count=n))
+            if len(batch) >= batch_size:
+                DailyVisitRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailyVisitRollup.objects.bulk_create(batch)
+        created += len(batch)
+    return created
@@ -0,0 +1,305 @@
+# api/rt.py
+"""
+Оцінка ефективного репродуктивного числа Rt за денною кількістю візитів
+методом Cori et al. (рівняння відновлення з байєсівською оцінкою у ковзному вікні).
+
+Інфекційний тиск дня t — згортка захворюваності з дискретизованим гамма-розподілом
+серійного інтервалу: Λ_t = Σ_s I[t-s]·w[s]. Для вікна τ днів, що закінчується в t,
+апостеріорний розподіл Rt — гамма з формою a + ΣI і швидкістю 1/b + ΣΛ (суми
+за вікном), де a, b — параметри апріорного розподілу.
+
+Ряди (категорія × заклад) беруться з денних агрегатів DailyVisitRollup і кешуються
+в пам'яті процесу разом із Λ, кумулятивними сумами та сумами вікон. Кеш звіряється
+з data_version (спільна для процесів версія даних): після зміни візитів з БД
+читаються лише дні від кінця кешованого ряду мінус len(w), масиви дописуються на
+місці, а перераховується хвіст від першого зміненого дня — новий день коштує
+O(len(w) + 1) і один запит по кількох днях замість читання всієї історії.
+Зміни давніших днів (візит, внесений заднім числом) при цьому не видно: вони
+з'являються, коли ряд завантажується наново — після витіснення з кешу або
+перезапуску процесу.
+"""
+import math
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import data_version, rollups
+from .models import DailyVisitRollup
+
+# Апріорний гамма-розподіл Rt (форма, масштаб) — як у EpiEstim
+PRIOR_SHAPE = 1.0
+PRIOR_SCALE = 5.0
+DEFAULT_WINDOW = 7
+MAX_WINDOW = 56
+# Серійний інтервал (середнє, стандартне відхилення, днів) за категоріями
+SERIAL_INTERVALS = {
+    'Грип': (2.6, 1.5),
+    'Вітрянка': (14.0, 2.4),
+}
+DEFAULT_SERIAL_INTERVAL = (4.7, 2.9)
+MAX_SERIAL_INTERVAL_DAYS = 60
+# Відкидається хвіст розподілу серійного інтервалу з такою масою
+SI_TAIL_MASS = 1e-3
+# Квантиль стандартного нормального розподілу для 95% інтервалу
+Z_975 = 1.959964
+
+
+def serial_interval(mean, sd, max_days=MAX_SERIAL_INTERVAL_DAYS):
+    """
+    Дискретизований гамма-розподіл серійного інтервалу: масив w, де w[s] — ймовірність
+    інтервалу s днів (w[0] = 0, сума 1). Маса відрізка [s - 0.5, s + 0.5) береться
+    чисельним інтегруванням густини, маса [0, 0.5) приєднується до s = 1.
+    """
+    shape = (mean / sd) ** 2
+    scale = sd ** 2 / mean
+    steps = 100
+    x = (np.arange((max_days + 1) * steps) + 0.5) / steps
+    density = np.exp((shape - 1) * np.log(x) - x / scale - math.lgamma(shape) - shape * math.log(scale))
+    # Маса кожного дня: відрізки [s - 0.5, s + 0.5) по `steps` точок
+    mass = np.add.reduceat(density / steps, np.arange(steps // 2, x.size, steps))
+    w = np.zeros(max_days + 1)
+    w[1:] = mass[:max_days]
+    w[1] += density[:steps // 2].sum() / steps
+    cumulative = np.cumsum(w)
+    last = min(int(np.searchsorted(cumulative, cumulative[-1] * (1 - SI_TAIL_MASS))) + 1, max_days + 1)
+    w = w[:last]
+    return w / w.sum()
+
+
+def posterior(sum_incidence, sum_infectivity, prior_shape=PRIOR_SHAPE, prior_scale=PRIOR_SCALE):
+    """
+    Середнє, стандартне відхилення та 95% інтервал Rt за сумами вікна.
+    Квантилі гамма-розподілу — наближення Вілсона–Гільферті (форма ≥ a = 1).
+    """
+    shape = prior_shape + sum_incidence
+    scale = 1 / (1 / prior_scale + sum_infectivity)
+    mean = shape * scale
+    spread = 1 / (9 * shape)
+    lower = mean * np.maximum(1 - spread - Z_975 * np.sqrt(spread), 0) ** 3
+    upper = mean * (1 - spread + Z_975 * np.sqrt(spread)) ** 3
+    return mean, np.sqrt(shape) * scale, lower, upper
+
+
+def _grown(array, size):
+    """Копія array у новому буфері довжини size (хвіст — нулі)."""
+    grown = np.zeros(size)
+    grown[:array.size] = array
+    return grown
+
+
+class Series:
+    """
+    Денний ряд з першого дня з візитами: захворюваність, Λ, кумулятивні суми й суми вікон.
+    Масиви ростуть на місці з подвоєнням місткості, тож новий день не копіює історію;
+    зміни й читання, яким потрібні узгоджені масиви, виконуються під self.lock.
+    """
+
+    def __init__(self, start, incidence, w):
+        self.start = start
+        self.w = w
+        self.version = None
+        self.lock = threading.Lock()
+        self.size = 0
+        self._incidence = np.zeros(0)
+        self._infectivity = np.zeros(0)
+        self._cum_incidence = np.zeros(1)
+        self._cum_infectivity = np.zeros(1)
+        self._windows = {}
+        self.update(incidence)
+
+    @property
+    def end(self):
+        return self.start + timedelta(days=self.size - 1)
+
+    @property
+    def incidence(self):
+        return self._incidence[:self.size]
+
+    @property
+    def infectivity(self):
+        return self._infectivity[:self.size]
+
+    def _reserve(self, size):
+        if size <= self._incidence.size:
+            return
+        capacity = max(size, 2 * self._incidence.size)
+        self._incidence = _grown(self._incidence, capacity)
+        self._infectivity = _grown(self._infectivity, capacity)
+        self._cum_incidence = _grown(self._cum_incidence, capacity + 1)
+        self._cum_infectivity = _grown(self._cum_infectivity, capacity + 1)
+        self._windows = {
+            window: tuple(_grown(sums, capacity) for sums in kept) for window, kept in self._windows.items()
+        }
+
+    def update(self, incidence, offset=0):
+        """
+        Підміняє дні від offset значеннями incidence (ряд стає довжини offset + len(incidence),
+        не коротшим) і перераховує хвіст від першої розбіжності. Повертає індекс цього дня.
+        """
+        with self.lock:
+            size = offset + incidence.size
+            changed = np.flatnonzero(incidence[:self.size - offset] != self._incidence[offset:self.size])
+            first = offset + int(changed[0]) if changed.size else self.size
+            if first == size:
+                return first
+            self._reserve(size)
+            self._incidence[first:size] = incidence[first - offset:]
+            self.size = size
+            tail = len(self.w) - 1
+            lead = max(tail - first, 0)
+            padded = np.concatenate([np.zeros(lead), self._incidence[first + lead - tail:size]])
+            # Λ[first:] — згортка I з w у режимі 'valid' по відрізку I[first - len(w) + 1:]
+            self._infectivity[first:size] = np.convolve(padded, self.w, 'valid')
+            np.cumsum(self._incidence[first:size], out=self._cum_incidence[first + 1:size + 1])
+            self._cum_incidence[first + 1:size + 1] += self._cum_incidence[first]
+            np.cumsum(self._infectivity[first:size], out=self._cum_infectivity[first + 1:size + 1])
+            self._cum_infectivity[first + 1:size + 1] += self._cum_infectivity[first]
+            for window in self._windows:
+                self._window_sums(window, first)
+            return first
+
+    def _window_sums(self, window, first):
+        t = np.arange(first, self.size)
+        lower = np.maximum(t + 1 - window, 0)
+        if window not in self._windows:
+            self._windows[window] = (np.zeros(self._incidence.size), np.zeros(self._incidence.size))
+        sum_incidence, sum_infectivity = self._windows[window]
+        np.subtract(self._cum_incidence[t + 1], self._cum_incidence[lower], out=sum_incidence[first:self.size])
+        np.subtract(self._cum_infectivity[t + 1], self._cum_infectivity[lower], out=sum_infectivity[first:self.size])
+
+    def window_sums(self, window):
+        """(ΣI, ΣΛ) за вікно `window` днів, що закінчується в кожному дні ряду; викликається під self.lock."""
+        if window not in self._windows:
+            self._window_sums(window, 0)
+        return tuple(sums[:self.size] for sums in self._windows[window])
+
+
+def load_incidence(category=None, institution_id=None, until=None, since=None):
+    """
+    (перший день, масив денної кількості візитів до until включно) або (None, порожній масив).
+    З since масив починається з since (навіть якщо того дня візитів не було).
+    """
+    rows = DailyVisitRollup.objects.filter(category=category or rollups.TOTAL)
+    if institution_id:
+        rows = rows.filter(institution_id=institution_id)
+    if until:
+        rows = rows.filter(day__lte=until)
+    if since:
+        rows = rows.filter(day__gte=since)
+    counts = [
+        (day, n) for day, n in rows.values_list('day').annotate(n=Sum('count')).order_by('day') if n
+    ]
+    if not counts and not since:
+        return None, np.zeros(0)
+    start = since or counts[0][0]
+    end = until or (counts[-1][0] if counts else start - timedelta(days=1))
+    incidence = np.zeros((end - start).days + 1)
+    for day, n in counts:
+        incidence[(day - start).days] = n
+    return start, incidence
+
+
+class SeriesCache:
+    """LRU-кеш рядів у пам'яті процесу, звірений з data_version."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or getattr(settings, 'RT_CACHE_MAX_SERIES', 512)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'updates': 0, 'misses': 0}
+
+    def get(self, category, institution_id, si, today):
+        key = (category, institution_id, si)
+        version = data_version.current()
+        with self._lock:
+            series = self._entries.get(key)
+            if series is not None:
+                self._entries.move_to_end(key)
+                if series.version == version and series.end == today:
+                    self._stats['hits'] += 1
+                    return series
+
+        if series is not None and today >= series.end:
+            # Перечитуються лише дні від end - len(w): візити вносяться за останні дні, а
+            # зміни давніших днів інкрементальне оновлення не бачить (див. опис модуля)
+            since = max(series.start, series.end - timedelta(days=len(series.w)))
+            _, incidence = load_incidence(category, institution_id, today, since=since)
+            series.update(incidence, offset=(since - series.start).days)
+            with self._lock:
+                self._stats['updates'] += 1
+        else:
+            start, incidence = load_incidence(category, institution_id, today)
+            if start is None:
+                return None
+            series = Series(start, incidence, serial_interval(*si))
+            with self._lock:
+                self._stats['misses'] += 1
+        series.version = version
+        with self._lock:
+            self._entries[key] = series
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return series
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+series_cache = SeriesCache()
+
+
+def estimate(category=None, institution_id=None, window=DEFAULT_WINDOW, si_mean=None, si_sd=None,
+             date_from=None, date_to=None, today=None):
+    """
+    Оцінки Rt за днями [date_from, date_to] (за замовчуванням — весь ряд до сьогодні).
+    Оцінка дня t використовує вікно [t - window + 1, t] і з'являється, коли вікно
+    не захоплює перший день ряду; за нульового інфекційного тиску значення — None.
+    """
+    today = today or timezone.localdate()
+    default_mean, default_sd = SERIAL_INTERVALS.get(category, DEFAULT_SERIAL_INTERVAL)
+    si = (si_mean or default_mean, si_sd or default_sd)
+    series = series_cache.get(category, institution_id, si, today)
+    result = {
+        'category': category,
+        'institution': institution_id,
+        'window': window,
+        'prior': {'shape': PRIOR_SHAPE, 'scale': PRIOR_SCALE},
+        'serial_interval': {'mean': si[0], 'sd': si[1]},
+        'estimates': [],
+    }
+    if series is None:
+        return result
+    result['serial_interval']['distribution'] = [round(value, 6) for value in series.w[1:].tolist()]
+
+    # Ряд оновлюється на місці, тож потрібні зрізи копіюються під його блокуванням
+    with series.lock:
+        first = max(window, (date_from - series.start).days if date_from else 0)
+        last = min(series.size - 1, (date_to - series.start).days if date_to else series.size)
+        if first > last:
+            return result
+        sum_incidence, sum_infectivity = (values[first:last + 1].copy() for values in series.window_sums(window))
+        incidence = series.incidence[first:last + 1].copy()
+    mean, std, lower, upper = posterior(sum_incidence, sum_infectivity)
+    defined = sum_infectivity > 0
+    for offset in range(last - first + 1):
+        ok = defined[offset]
+        result['estimates'].append({
+            'date': (series.start + timedelta(days=first + offset)).isoformat(),
+            'incidence': int(incidence[offset]),
+            'window_cases': int(sum_incidence[offset]),
+            'mean': round(float(mean[offset]), 4) if ok else None,
+            'std': round(float(std[offset]), 4) if ok else None,
+            'lower': round(float(lower[offset]), 4) if ok else None,
+            'upper': round(float(upper[offset]), 4) if ok else None,
+        })
+    return result
@@ -0,0 +1,234 @@
+# api/search_index.py
+"""
+Триграмний пошуковий індекс для користувачів, закладів і кодів пацієнтів.
+
+Текст нормалізується (casefold, ґ→г, ё→е, без апострофів і розділових знаків),
+кожне слово розбивається на триграми з доповненням пробілами, як у pg_trgm.
+Триграми зберігаються як 31-бітні хеші в SearchGram, тож вибірка кандидатів —
+це групування по індексу (kind, gram, entry) замість LIKE '%...%' по всій таблиці.
+
+Кандидати відбираються за кількістю спільних триграм (стійкість до описок),
+далі ранжуються за подібністю Жаккара з бонусом за точний збіг і збіг префікса.
+"""
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from math import ceil
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Institution, Patient, SearchEntry, SearchGram
+
+# Поля моделей, що потрапляють в індекс
+FIELDS = {
+    'user': ('username', 'email', 'first_name', 'last_name'),
+    'institution': ('name',),
+    'patient': ('patient_code',),
+}
+
+# Мінімальна частка триграм запиту, яку має містити кандидат
+MIN_MATCH_RATIO = 0.4
+# Скільки кандидатів (у разах від limit) передраховувати точною оцінкою
+CANDIDATE_FACTOR = 5
+# Верхня межа кандидатів для дуже поширених запитів
+MAX_CANDIDATES = 500
+FREQUENCY_CACHE_SIZE = 100_000
+# Частоти триграм перечитуються не рідше ніж раз на стільки секунд
+FREQUENCY_CACHE_TTL = 300
+BATCH_SIZE = 1000
+TEXT_MAX_LENGTH = 512
+
+_FOLD = str.maketrans({'ґ': 'г', 'ё': 'е'})
+_APOSTROPHES = re.compile(r"['’ʼ‘`]")
+_TOKEN = re.compile(r'[^\W_]+')
+
+_state = threading.local()
+_frequency_cache = {}
+_frequency_expires = [0.0]
+
+
+def model_for(kind):
+    return {'user': get_user_model(), 'institution': Institution, 'patient': Patient}[kind]
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFC', text or '').casefold().translate(_FOLD)
+    return ' '.join(_TOKEN.findall(_APOSTROPHES.sub('', text)))
+
+
+def trigrams(text, prefix=False):
+    """Триграми нормалізованого тексту. prefix=True — останнє слово може бути недописаним."""
+    grams = set()
+    tokens = text.split()
+    for index, token in enumerate(tokens):
+        open_end = prefix and index == len(tokens) - 1
+        padded = '  ' + token + ('' if open_end else ' ')
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def gram_hash(gram):
+    return zlib.crc32(gram.encode()) & 0x7FFFFFFF
+
+
+def _text(values):
+    return normalize(' '.join(value or '' for value in values))[:TEXT_MAX_LENGTH]
+
+
+@contextmanager
+def paused():
+    """Вимикає синхронізацію через сигнали в поточному потоці (масові операції)."""
+    _state.paused = True
+    try:
+        yield
+    finally:
+        _state.paused = False
+
+
+def sync(kind, instance, update_fields=None):
+    """Оновлює запис індексу для об'єкта; нічого не пише, якщо текст не змінився."""
+    fields = FIELDS[kind]
+    if getattr(_state, 'paused', False):
+        return
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    text = _text(getattr(instance, field) for field in fields)
+    entry = SearchEntry.objects.filter(kind=kind, object_id=instance.pk).first()
+    if entry is not None and entry.text == text:
+        return
+    grams = trigrams(text)
+    with transaction.atomic():
+        # Паралельні збереження того самого об'єкта: наявний запис блокується, а вставку
+        # нового get_or_create переживає і без IntegrityError у сигналі post_save
+        entry, created = SearchEntry.objects.select_for_update().get_or_create(
+            kind=kind, object_id=instance.pk, defaults={'text': text, 'gram_count': len(grams)},
+        )
+        if not created:
+            if entry.text == text:
+                return
+            entry.text, entry.gram_count = text, len(grams)
+            entry.save(update_fields=['text', 'gram_count'])
+            entry.grams.all().delete()
+        SearchGram.objects.bulk_create([SearchGram(gram=gram_hash(gram), kind=kind, entry=entry) for gram in grams])
+
+
+def remove(kind, object_id):
+    if not getattr(_state, 'paused', False):
+        SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def index_queryset(kind, queryset=None, batch_size=BATCH_SIZE):
+    """Індексує об'єкти пакетами за pk; існуючі записи цих об'єктів замінюються."""
+    fields = FIELDS[kind]
+    queryset = model_for(kind).objects.all() if queryset is None else queryset
+    queryset = queryset.order_by('pk').values_list('pk', *fields)
+    last_pk, total = 0, 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return total
+        last_pk = rows[-1][0]
+        grams = {pk: trigrams(_text(values)) for pk, *values in rows}
+        with transaction.atomic():
+            SearchEntry.objects.filter(kind=kind, object_id__in=grams).delete()
+            SearchEntry.objects.bulk_create([
+                SearchEntry(kind=kind, object_id=pk, text=_text(values), gram_count=len(grams[pk]))
+                for pk, *values in rows
+            ])
+            # bulk_create у MySQL не повертає ключі — дочитуємо їх одним запитом
+            entry_ids = dict(
+                SearchEntry.objects.filter(kind=kind, object_id__in=grams).values_list('object_id', 'id')
+            )
+            SearchGram.objects.bulk_create(
+                [
+                    SearchGram(gram=gram_hash(gram), kind=kind, entry_id=entry_ids[pk])
+                    for pk, object_grams in grams.items()
+                    for gram in object_grams
+                ],
+                batch_size=5000,
+            )
+        total += len(rows)
+
+
+def rebuild(kinds=None, batch_size=BATCH_SIZE):
+    """Повністю перебудовує індекс для вказаних типів; повертає {тип: кількість}."""
+    counts = {}
+    _frequency_cache.clear()
+    for kind in kinds or FIELDS:
+        SearchGram.objects.filter(kind=kind).delete()
+        SearchEntry.objects.filter(kind=kind).delete()
+        counts[kind] = index_queryset(kind, batch_size=batch_size)
+    return counts
+
+
+def _score(query_text, query_gram_count, hits, entry):
+    similarity = hits / (query_gram_count + entry.gram_count - hits)
+    if entry.text == query_text:
+        return similarity + 1.0
+    tokens = entry.text.split()
+    if all(any(token.startswith(part) for token in tokens) for part in query_text.split()):
+        return similarity + 0.5
+    return similarity
+
+
+def _frequencies(kind, hashes):
+    """
+    Кількість записів на триграму. Кешується в процесі на FREQUENCY_CACHE_TTL секунд
+    і слугує підказкою для вибору фільтрувальних триграм: застаріле значення
+    впливає на швидкість, а після перевищення MAX_CANDIDATES — і на те, які
+    кандидати розглядаються першими.
+    """
+    now = time.monotonic()
+    if now >= _frequency_expires[0] or len(_frequency_cache) > FREQUENCY_CACHE_SIZE:
+        _frequency_cache.clear()
+        _frequency_expires[0] = now + FREQUENCY_CACHE_TTL
+    missing = [value for value in hashes if (kind, value) not in _frequency_cache]
+    if missing:
+        counts = dict(
+            SearchGram.objects.filter(kind=kind, gram__in=missing)
+            .values_list('gram').annotate(n=Count('pk')).order_by()
+        )
+        for value in missing:
+            _frequency_cache[(kind, value)] = counts.get(value, 0)
+    return {value: _frequency_cache[(kind, value)] for value in hashes}
+
+
+def search(query, kind, limit=10):
+    """ID об'єктів типу kind, найкраще релевантних запиту, у порядку спадання оцінки."""
+    query_text = normalize(query)
+    if not query_text:
+        return []
+    hashes = {gram_hash(gram) for gram in trigrams(query_text, prefix=True)}
+    min_hits = max(1, ceil(len(hashes) * MIN_MATCH_RATIO))
+
+    # Запис із min_hits спільних триграм обов'язково містить хоча б одну з
+    # (n - min_hits + 1) найрідкісніших, тож кандидатів шукаємо лише по них
+    frequencies = _frequencies(kind, hashes)
+    rarest = sorted(hashes, key=frequencies.get)[:len(hashes) - min_hits + 1]
+    candidate_ids = set()
+    # Від найрідкіснішої триграми: вони найінформативніші, якщо кандидатів більше межі
+    for value in rarest:
+        if len(candidate_ids) >= MAX_CANDIDATES:
+            break
+        candidate_ids.update(
+            SearchGram.objects.filter(kind=kind, gram=value).exclude(entry_id__in=candidate_ids)
+            .values_list('entry_id', flat=True)[:MAX_CANDIDATES - len(candidate_ids)]
+        )
+    if not candidate_ids:
+        return []
+    candidates = list(
+        SearchGram.objects.filter(kind=kind, gram__in=hashes, entry_id__in=candidate_ids)
+        .values('entry_id').annotate(hits=Count('pk')).filter(hits__gte=min_hits)
+        .order_by('-hits', 'entry_id')[:limit * CANDIDATE_FACTOR]
+    )
+    entries = SearchEntry.objects.in_bulk([row['entry_id'] for row in candidates])
+    scored = sorted(
+        (-_score(query_text, len(hashes), row['hits'], entries[row['entry_id']]), entries[row['entry_id']].object_id)
+        for row in candidates
+    )
+    return [object_id for _, object_id in scored[:limit]]
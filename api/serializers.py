@@ -1,10 +1,14 @@
 # api/serializers.py
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.reverse import reverse
 from .models import Institution, User, Patient, Symptom, Visit, ChatRoom, Message
-from .models import Report
+from .models import OutbreakAlert, Report, ReportJob, UploadSession
+from . import reference
 
 
 from dj_rest_auth.registration.serializers import RegisterSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -20,16 +24,46 @@ class SymptomSerializer(serializers.ModelSerializer):
         model = Symptom
         fields = '__all__'
 
+class ReferencePrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, що шукає запис довідника в кеші процесу (api/reference.py), а не в БД."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Список ID перевіряється за одним знімком довідника, а не окремим зверненням на кожен ID
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ReferenceManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data, index=None):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if index is None:
+            index = reference.by_id(self.queryset.model)
+        obj = reference.lookup(index, data)
+        if obj is None:
+            try:
+                int(data)
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+class ReferenceManyRelatedField(serializers.ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        index = reference.by_id(self.child_relation.queryset.model)
+        return [self.child_relation.to_internal_value(item, index) for item in data]
+
 # api/serializers.py
 class PatientSerializer(serializers.ModelSerializer):
-    # Додаємо поле, яке бере 'username' з об'єкта 'user'
-    username = serializers.CharField(source='user.username', read_only=True)
-
     class Meta:
         model = Patient
-        # Додайте 'username' до списку полів
-        fields = ['id', 'user', 'username', 'some_other_field'] 
-        # (замініть 'some_other_field' на ваші реальні поля)
+        fields = ['id', 'patient_code']
 
 class VisitSerializer(serializers.ModelSerializer):
     # Поля для відображення (read-only)
@@ -43,7 +77,7 @@ class VisitSerializer(serializers.ModelSerializer):
     patient = serializers.PrimaryKeyRelatedField(
         queryset=Patient.objects.all(), write_only=True
     )
-    symptoms = serializers.PrimaryKeyRelatedField(
+    symptoms = ReferencePrimaryKeyRelatedField(
         queryset=Symptom.objects.all(), many=True, write_only=True
     )
 
@@ -122,10 +156,67 @@ class UserDetailSerializer(serializers.ModelSerializer):
         # Це важливо для безпеки та для логіки нашого UI
         read_only_fields = ['role', 'institution_name']
 
+class PrivateFileField(serializers.FileField):
+    # Файл у приватному сховищі (api/storage.py): замість адреси в MEDIA_URL —
+    # посилання на представлення view_name, яке перевіряє доступ
+    def __init__(self, view_name, **kwargs):
+        self.view_name = view_name
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return reverse(self.view_name, args=[value.instance.pk], request=self.context.get('request'))
+
 class ReportSerializer(serializers.ModelSerializer):
+    file = PrivateFileField('report-download')
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True, default=None)
+
     class Meta:
         model = Report
         # 'file' - це поле, яке ми очікуємо з фронтенду
-        fields = ['id', 'user', 'file', 'uploaded_at']
+        fields = ['id', 'user', 'file', 'name', 'sha256', 'uploaded_at', 'ingest_status', 'ingest_rows',
+                  'ingest_created', 'ingest_failed', 'ingest_errors']
         # 'user' та 'uploaded_at' будуть встановлені автоматично на бекенді
-        read_only_fields = ['user', 'uploaded_at']
\ No newline at end of file
+        read_only_fields = ['user', 'name', 'uploaded_at', 'ingest_status', 'ingest_rows', 'ingest_created',
+                            'ingest_failed', 'ingest_errors']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'name', 'size', 'sha256', 'received', 'status', 'report', 'created_at', 'updated_at']
+        read_only_fields = ['received', 'status', 'report', 'created_at', 'updated_at']
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Розмір файлу має бути від 1 до {settings.UPLOAD_MAX_SIZE} байт.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or set(value) - set('0123456789abcdef')):
+            raise serializers.ValidationError("Очікується sha256 у шістнадцятковому вигляді.")
+        return value
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    # Посилання на готовий файл з'являється, коли завдання виконано
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'status', 'error', 'file', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_file(self, job):
+        if job.report_id is None:
+            return None
+        return reverse('report-job-download', args=[job.pk], request=self.context.get('request'))
+
+class OutbreakAlertSerializer(serializers.ModelSerializer):
+    institution_name = serializers.CharField(source='institution.name', read_only=True)
+
+    class Meta:
+        model = OutbreakAlert
+        fields = ['id', 'day', 'institution', 'institution_name', 'category', 'method', 'observed', 'expected',
+                  'score', 'threshold', 'created_at', 'posted_at']
+        read_only_fields = fields
@@ -0,0 +1,171 @@
+# api/signals.py
+"""
+Обробники сигналів моделей. Підключаються в ApiConfig.ready().
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import archive, chat_sync, data_version, membership, reference, rollups, search_index
+from .consumers import room_group
+from .models import ChatRoom, Institution, Message, Patient, Symptom, User, Visit
+from .serializers import MessageSerializer
+
+
+# --- Денні агрегати візитів (DailyVisitRollup) ---
+
+@receiver(pre_save, sender=Visit)
+def remember_visit_rollup_state(sender, instance, raw=False, **kwargs):
+    instance._rollup_before = {} if raw or instance.pk is None else rollups.snapshot([instance.pk])
+
+
+@receiver(post_save, sender=Visit)
+def update_rollups_on_visit_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = instance.__dict__.pop('_rollup_before', {})
+    rollups.apply(rollups.diff(before, rollups.snapshot([instance.pk])))
+
+
+@receiver(pre_delete, sender=Visit)
+def remember_deleted_visit_rollup_state(sender, instance, **kwargs):
+    if archive.is_archiving():
+        # Візит переноситься в архів, його внесок в агрегатах лишається
+        return
+    instance._rollup_before = rollups.snapshot([instance.pk])
+
+
+@receiver(post_delete, sender=Visit)
+def update_rollups_on_visit_delete(sender, instance, **kwargs):
+    if archive.is_archiving():
+        # Версію даних один раз на весь місяць збільшує archive_month
+        return
+    rollups.apply(rollups.diff(instance.__dict__.pop('_rollup_before', {}), {}))
+
+
+@receiver(m2m_changed, sender=Visit.symptoms.through)
+def update_rollups_on_symptoms_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if not reverse:
+            visit_ids = [instance.pk]
+        elif action == 'pre_clear':
+            visit_ids = instance.visit_set.values_list('id', flat=True)
+        else:
+            visit_ids = pk_set or []
+        instance._rollup_m2m_before = rollups.snapshot(visit_ids)
+    else:
+        before = instance.__dict__.pop('_rollup_m2m_before', {})
+        rollups.apply(rollups.diff(before, rollups.snapshot(before.keys())))
+
+
+@receiver(pre_save, sender=Symptom)
+def remember_symptom_rollup_state(sender, instance, raw=False, **kwargs):
+    instance._rollup_before = {}
+    if raw or instance.pk is None:
+        return
+    old_category = Symptom.objects.filter(pk=instance.pk).values_list('category', flat=True).first()
+    if old_category is not None and old_category != instance.category:
+        instance._rollup_before = rollups.snapshot(instance.visit_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Symptom)
+def update_rollups_on_symptom_save(sender, instance, raw=False, **kwargs):
+    before = instance.__dict__.pop('_rollup_before', {})
+    if before:
+        rollups.apply(rollups.diff(before, rollups.snapshot(before.keys())))
+
+
+@receiver(pre_delete, sender=Symptom)
+def remember_deleted_symptom_rollup_state(sender, instance, **kwargs):
+    instance._rollup_before = rollups.snapshot(instance.visit_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Symptom)
+def update_rollups_on_symptom_delete(sender, instance, **kwargs):
+    before = instance.__dict__.pop('_rollup_before', {})
+    rollups.apply(rollups.diff(before, rollups.snapshot(before.keys())))
+
+
+# --- Розсилка нових повідомлень чату підписникам WebSocket ---
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    event = {'type': 'chat.message', 'message': dict(MessageSerializer(instance).data)}
+    transaction.on_commit(lambda: async_to_sync(channel_layer.group_send)(room_group(instance.room_id), event))
+
+
+@receiver(post_save, sender=Message)
+def wake_long_polls(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: chat_sync.notify(instance.room_id, instance.id))
+
+
+# --- Кеш членства в чат-кімнатах ---
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def invalidate_membership_on_participants_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        membership.invalidate([instance.pk])
+    elif action == 'post_clear':
+        membership.invalidate()
+    else:
+        membership.invalidate(pk_set or [])
+
+
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_membership_on_room_delete(sender, instance, **kwargs):
+    membership.invalidate()
+
+
+@receiver(post_delete, sender=Institution)
+def invalidate_membership_on_institution_delete(sender, instance, **kwargs):
+    membership.invalidate([instance.pk])
+
+
+# --- Кеш довідників (api/reference.py) ---
+
+def invalidate_reference_data(sender, **kwargs):
+    reference.invalidate(sender)
+
+
+for reference_model in reference.MODELS:
+    post_save.connect(invalidate_reference_data, sender=reference_model,
+                      dispatch_uid=f'reference_save_{reference_model.__name__}')
+    post_delete.connect(invalidate_reference_data, sender=reference_model,
+                        dispatch_uid=f'reference_delete_{reference_model.__name__}')
+
+
+# --- Пошуковий індекс (SearchEntry / SearchGram) ---
+
+SEARCH_KINDS = {User: 'user', Institution: 'institution', Patient: 'patient'}
+
+
+def index_search_entry(sender, instance, update_fields=None, **kwargs):
+    search_index.sync(SEARCH_KINDS[sender], instance, update_fields)
+
+
+def remove_search_entry(sender, instance, **kwargs):
+    search_index.remove(SEARCH_KINDS[sender], instance.pk)
+
+
+for search_model in SEARCH_KINDS:
+    post_save.connect(index_search_entry, sender=search_model, dispatch_uid=f'search_index_{search_model.__name__}')
+    post_delete.connect(remove_search_entry, sender=search_model, dispatch_uid=f'search_remove_{search_model.__name__}')
+
+
+# --- Версія даних для кешу згенерованих звітів ---
+# Зміни візитів оновлюють версію в rollups.apply; тут — лише пацієнти
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def bump_data_version_on_patient_change(sender, **kwargs):
+    data_version.bump()
@@ -0,0 +1,133 @@
+# api/sir_cache.py
+"""
+Кеш результатів детермінованого моделювання (SIRModelingView).
+
+Ключ — хеш нормалізованих параметрів без кількості днів, тому збережений
+довший прогін обслуговує будь-який коротший запит зрізом масивів.
+Два рівні: обмежений LRU у пам'яті процесу та (за бажанням) спільний
+бекенд Django-кешу, заданий налаштуванням SIR_CACHE_BACKEND.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import epidemic
+
+
+def normalize(run):
+    """Канонічне представлення параметрів прогону (результат parse_model_params) без days."""
+    spec = epidemic.MODELS[run['model']]
+    return {
+        'model': run['model'],
+        'integrator': run['integrator'],
+        'dt': repr(float(run['dt'])),
+        'population': int(run['population']),
+        'initial': {name: int(run['initial'].get(name, 0)) for name in spec.compartments[1:]},
+        'params': {name: repr(float(run['params'][name])) for name in spec.params},
+    }
+
+
+def make_key(run):
+    payload = json.dumps(normalize(run), sort_keys=True, separators=(',', ':'))
+    return 'sir:' + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cells(entry):
+    return sum(values.size for values in entry['trajectory'].values())
+
+
+def _slice(entry, days):
+    return {name: values[:days] for name, values in entry['trajectory'].items()}
+
+
+class ModelResultCache:
+    def __init__(self, max_entries=None, max_cells=None, backend=None, timeout=None):
+        self.max_entries = max_entries or getattr(settings, 'SIR_CACHE_MAX_ENTRIES', 256)
+        # Сумарна кількість чисел у всіх збережених траєкторіях
+        self.max_cells = max_cells or getattr(settings, 'SIR_CACHE_MAX_CELLS', 5_000_000)
+        self.backend = backend if backend is not None else getattr(settings, 'SIR_CACHE_BACKEND', None)
+        self.timeout = timeout or getattr(settings, 'SIR_CACHE_TIMEOUT', 3600)
+        self._entries = OrderedDict()
+        self._cells = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'sliced_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def _shared(self):
+        return caches[self.backend] if self.backend else None
+
+    def get(self, run):
+        """Повертає траєкторію для run або None (промах)."""
+        key = make_key(run)
+        days = run['days']
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['days'] >= days:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                if entry['days'] > days:
+                    self._stats['sliced_hits'] += 1
+                return _slice(entry, days)
+
+        shared = self._shared()
+        if shared is not None:
+            entry = shared.get(key)
+            if entry is not None and entry['days'] >= days:
+                self._store(key, entry)
+                with self._lock:
+                    self._stats['shared_hits'] += 1
+                return _slice(entry, days)
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, run, trajectory):
+        key = make_key(run)
+        entry = {'days': run['days'], 'trajectory': trajectory}
+        self._store(key, entry)
+        shared = self._shared()
+        if shared is not None:
+            existing = shared.get(key)
+            if existing is None or existing['days'] < entry['days']:
+                shared.set(key, entry, self.timeout)
+
+    def _store(self, key, entry):
+        cells = _cells(entry)
+        if cells > self.max_cells:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                if previous['days'] >= entry['days']:
+                    entry = previous
+                    cells = _cells(previous)
+                self._cells -= _cells(previous)
+            self._entries[key] = entry
+            self._cells += cells
+            while len(self._entries) > self.max_entries or self._cells > self.max_cells:
+                _, evicted = self._entries.popitem(last=False)
+                self._cells -= _cells(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cells = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['shared_hits'] + self._stats['misses']
+            hits = lookups - self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                cells=self._cells,
+                hit_rate=hits / lookups if lookups else 0.0,
+                shared_backend=self.backend,
+            )
+
+
+result_cache = ModelResultCache()
@@ -0,0 +1,106 @@
+# api/stochastic.py
+"""
+Стохастична SIR-модель (ланцюгова біноміальна, крок — доба) для ансамблю реалізацій.
+
+Реалізації ділляться на пакети фіксованого розміру; кожен пакет отримує власне
+зерно з SeedSequence(seed).spawn(...) і векторизовано інтегрується в окремому
+процесі. Оскільки поділ на пакети не залежить від кількості процесів, результат
+однаковий за будь-якої кількості ядер.
+Модуль не залежить від Django, щоб робочі процеси імпортували лише NumPy.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+CHUNK_RUNS = 1000
+QUANTILES = (5, 50, 95)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chain_binomial(population, initial_infected, initial_recovered, beta, gamma, days, runs, seed):
+    """
+    Інтегрує `runs` реалізацій одночасно. Повертає масиви S, I, R форми (days, runs).
+    Імовірність зараження за добу: 1 - exp(-beta * I / N), одужання: 1 - exp(-gamma).
+    """
+    rng = np.random.default_rng(seed)
+    S = np.empty((days, runs), dtype=np.int64)
+    I = np.empty((days, runs), dtype=np.int64)
+    R = np.empty((days, runs), dtype=np.int64)
+    S[0] = population - initial_infected - initial_recovered
+    I[0] = initial_infected
+    R[0] = initial_recovered
+    p_recover = -np.expm1(-gamma)
+    for t in range(1, days):
+        p_infect = -np.expm1(-beta * I[t - 1] / population)
+        infections = rng.binomial(S[t - 1], p_infect)
+        recoveries = rng.binomial(I[t - 1], p_recover)
+        S[t] = S[t - 1] - infections
+        I[t] = I[t - 1] + infections - recoveries
+        R[t] = R[t - 1] + recoveries
+    # int32 удвічі зменшує обсяг даних, що передаються між процесами
+    return S.astype(np.int32), I.astype(np.int32), R.astype(np.int32)
+
+
+def _run_chunk(args):
+    return chain_binomial(*args)
+
+
+def _get_pool(workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def ensemble(population, initial_infected, initial_recovered, beta, gamma, days, runs, seed=0,
+             major_outbreak_threshold=0.1, workers=None):
+    """
+    Запускає ансамбль і повертає квантилі 5/50/95% для кожного компартменту,
+    середні значення та ймовірність згасання: частку реалізацій, у яких інфекція
+    зникла до того, як перехворіло major_outbreak_threshold популяції.
+    """
+    seeds = np.random.SeedSequence(seed).spawn((runs + CHUNK_RUNS - 1) // CHUNK_RUNS)
+    chunks = [
+        (population, initial_infected, initial_recovered, beta, gamma, days,
+         min(CHUNK_RUNS, runs - i * CHUNK_RUNS), child)
+        for i, child in enumerate(seeds)
+    ]
+    if len(chunks) == 1:
+        parts = [_run_chunk(chunks[0])]
+    else:
+        try:
+            parts = list(_get_pool(workers).map(_run_chunk, chunks))
+        except BrokenProcessPool:
+            # Пул міг загинути (наприклад, робочий процес убито) — рахуємо в поточному процесі
+            _reset_pool()
+            parts = [_run_chunk(chunk) for chunk in chunks]
+
+    S, I, R = (np.concatenate(arrays, axis=1) for arrays in zip(*parts))
+    # Початково одужалі не рахуються: перехворілі — це початкові інфіковані плюс нові зараження
+    ever_infected = S[0] - S[-1] + initial_infected
+    extinct = (I[-1] == 0) & (ever_infected < major_outbreak_threshold * population)
+
+    compartments = {'susceptible': S, 'infected': I, 'recovered': R}
+    bands = {name: np.percentile(values, QUANTILES, axis=1) for name, values in compartments.items()}
+    return {
+        'quantiles': {
+            f'p{q}': {name: bands[name][i] for name in compartments}
+            for i, q in enumerate(QUANTILES)
+        },
+        'mean': {name: values.mean(axis=1) for name, values in compartments.items()},
+        'extinction_probability': float(extinct.mean()),
+    }
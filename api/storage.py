@@ -0,0 +1,56 @@
+# api/storage.py
+"""
+Приватне сховище файлів із даними пацієнтів (вміст звітів, архіви візитів).
+
+MEDIA_ROOT роздається веб-сервером без автентифікації (у DEBUG — через
+django.conf.urls.static), тож такі файли лежать окремо, у PRIVATE_MEDIA_ROOT,
+і віддаються лише представленнями API після перевірки доступу. Публічних
+адрес у цього сховища немає: url() завжди завершується помилкою.
+"""
+import os
+import shutil
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+def private_dir(path, setting):
+    """Абсолютний шлях каталогу з налаштування setting; він не може бути в MEDIA_ROOT."""
+    if not path:
+        raise ImproperlyConfigured(f"Не задано {setting}.")
+    path = os.path.abspath(path)
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    if os.path.commonpath([path, media_root]) == media_root:
+        raise ImproperlyConfigured(f"{setting} не може бути всередині MEDIA_ROOT: вміст MEDIA_ROOT публічний.")
+    return path
+
+
+def move_files(names, source, target):
+    """Переносить файли з відносними іменами names з каталогу source у target (для міграцій)."""
+    for name in names:
+        origin, destination = os.path.join(source, name), os.path.join(target, name)
+        if os.path.isfile(origin) and not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(origin, destination)
+
+
+@deconstructible
+class PrivateFileStorage(FileSystemStorage):
+    @cached_property
+    def base_location(self):
+        return private_dir(getattr(settings, 'PRIVATE_MEDIA_ROOT', None), 'PRIVATE_MEDIA_ROOT')
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting in ('PRIVATE_MEDIA_ROOT', 'MEDIA_ROOT'):
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError("Приватні файли не мають публічної адреси — віддавайте їх через API.")
+
+
+private_storage = PrivateFileStorage()
@@ -0,0 +1,350 @@
+# api/synthetic.py
+"""
+Генератор синтетичних даних для навантажувального тестування.
+
+Денна інтенсивність візитів для кожної пари (заклад, категорія симптомів) —
+сезонна крива × тижневий цикл × розмір закладу × локальні спалахи (гаусові
+піки на випадковій підмножині закладів); фактичні кількості — пуассонівські.
+Усі розподіли рахуються NumPy-масивами; великі таблиці (пацієнти, візити,
+симптоми візитів, повідомлення) заповнюються пакетним executemany.
+
+Ключі візитів призначаються наперед (max(id) + 1 ...), тому зв'язки з
+симптомами вставляються без повторного читання і однаково працюють на SQLite
+та MySQL. Генератор розрахований на роботу без паралельних записів у таблиці.
+"""
+import json
+import math
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import membership, rollups, search_index
+from .models import ChatRoom, Institution, Message, Patient, Symptom, User, Visit
+
+SymptomLink = Visit.symptoms.through
+ParticipantLink = ChatRoom.participants.through
+
+DEFAULT_CONFIG = {
+    'seed': 42,
+    'prefix': 'synthetic',
+    'institutions': 20,
+    'doctors_per_institution': 5,
+    'patients': 50_000,
+    'visits': 1_000_000,
+    'start': '2024-01-01',
+    'days': 730,
+    'outbreaks': 8,
+    'chat_rooms': 5,
+    'messages': 10_000,
+    'batch_size': 10_000,
+    # Пакетна вставка візитів іде частинами по стільки днів (обмежує пам'ять)
+    'days_per_chunk': 30,
+    # Режим масового завантаження для порожньої тестової БД: без перевірки FK під час
+    # вставки, а на SQLite — ще й з перебудовою вторинних індексів після неї
+    'bulk_load': False,
+}
+
+SYMPTOMS = {
+    'Грип': ["Гарячка", "Кашель", "Біль у горлі", "Ломота в тілі", "Нежить", "Озноб"],
+    'Вітрянка': ["Висип", "Свербіж шкіри", "Пухирці", "Субфебрильна температура"],
+    'Ментальні труднощі': ["Тривожність", "Безсоння", "Пригнічений настрій", "Втома", "Дратівливість"],
+}
+
+# Частка категорії, пік сезону (день року) і амплітуда сезонності
+CATEGORY_PROFILES = {
+    'Грип': (0.5, 15, 0.8),
+    'Вітрянка': (0.2, 100, 0.5),
+    'Ментальні труднощі': (0.3, 320, 0.15),
+}
+# Відносна кількість візитів за днями тижня (пн ... нд)
+WEEKDAY_FACTORS = np.array([1.15, 1.1, 1.05, 1.0, 0.95, 0.45, 0.3])
+# Розподіл кількості симптомів у візиті: 1, 2 або 3
+SYMPTOMS_PER_VISIT = np.array([0.5, 0.35, 0.15])
+
+CITIES = ["Київ", "Львів", "Харків", "Одеса", "Дніпро", "Вінниця", "Полтава", "Чернігів", "Ужгород", "Луцьк"]
+MESSAGES = [
+    "Фіксуємо зростання звернень з гарячкою.",
+    "Лабораторія підтвердила нові випадки.",
+    "Потрібні додаткові тест-системи.",
+    "Ситуація стабільна, динаміка без змін.",
+    "Надіслали оновлений звіт за тиждень.",
+    "Просимо звірити дані за вихідні.",
+]
+
+
+def load_config(path=None, **overrides):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, encoding='utf-8') as handle:
+            config.update(json.load(handle))
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Невідомі параметри конфігурації: {', '.join(sorted(unknown))}")
+    return config
+
+
+def _utc_strings(seconds, origin):
+    """Секунди від origin → рядки 'YYYY-MM-DD HH:MM:SS' (UTC), як їх передає в БД сам Django."""
+    stamps = np.datetime64(origin, 's') + np.asarray(seconds, dtype=np.int64).astype('timedelta64[s]')
+    return np.char.replace(np.datetime_as_string(stamps, unit='s'), 'T', ' ').tolist()
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """
+    Пакетна вставка кортежів значень напряму через executemany.
+
+    bulk_create витрачає більшу частину часу на створення моделей і підготовку
+    кожного значення; тут значення вже мають вигляд, у якому їх передає в БД
+    Django (числові ключі, рядки дат у UTC), тож лишається лише сам INSERT.
+    """
+    columns = [model._meta.get_field(name).column for name in fields]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[offset:offset + batch_size])
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """
+    SQLite: видаляє вторинні індекси таблиць і створює їх заново після вставки.
+
+    Побудова індексу по вже заповненій таблиці (одне сортування) значно дешевша
+    за оновлення кількох B-дерев на кожен рядок. На інших СУБД нічого не робить:
+    там індекси потрібні зовнішнім ключам, а DDL не транзакційний.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            "AND tbl_name IN ({})".format(', '.join(['%s'] * len(tables))),
+            tables,
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def intensity(config, rng, institution_count):
+    """Очікувана кількість візитів, масив форми (дні, заклади, категорії), що в сумі дає config['visits']."""
+    days = config['days']
+    start = date.fromisoformat(config['start'])
+    t = np.arange(days)
+    day_of_year = (start.timetuple().tm_yday - 1 + t) % 365.25
+    weekday = WEEKDAY_FACTORS[(start.weekday() + t) % 7]
+    size = rng.lognormal(0.0, 0.5, institution_count)
+
+    categories = list(CATEGORY_PROFILES)
+    rate = np.empty((days, institution_count, len(categories)))
+    for k, name in enumerate(categories):
+        share, peak, amplitude = CATEGORY_PROFILES[name]
+        season = 1 + amplitude * np.cos(2 * math.pi * (day_of_year - peak) / 365.25)
+        rate[:, :, k] = share * (season * weekday)[:, None] * size[None, :]
+
+    for _ in range(config['outbreaks']):
+        k = rng.integers(len(categories))
+        center = rng.uniform(0, days)
+        width = rng.uniform(5, 20)
+        height = rng.uniform(1, 4)
+        affected = rng.random(institution_count) < rng.uniform(0.1, 0.5)
+        bump = height * np.exp(-0.5 * ((t - center) / width) ** 2)
+        rate[:, affected, k] *= 1 + bump[:, None]
+
+    return rate * (config['visits'] / rate.sum()), categories
+
+
+class SyntheticDataGenerator:
+    def __init__(self, config, log=print):
+        self.config = config
+        self.log = log
+        self.rng = np.random.default_rng(config['seed'])
+        self.prefix = config['prefix']
+        self.batch_size = config['batch_size']
+
+    def run(self):
+        summary = {}
+        self.institution_ids = self._institutions()
+        self.doctor_ids = self._doctors()
+        self.patient_ids = self._patients()
+        self.symptom_ids = self._symptoms()
+        summary['institutions'] = len(self.institution_ids)
+        summary['doctors'] = self.doctor_ids.size
+        summary['patients'] = len(self.patient_ids)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            if self.config['bulk_load']:
+                # Ключі узгоджені за побудовою, тож перевірку FK можна вимкнути, як у loaddata
+                stack.enter_context(connection.constraint_checks_disabled())
+                stack.enter_context(deferred_indexes(Visit, SymptomLink))
+            summary['visits'], summary['visit_symptoms'] = self._visits()
+        summary['visit_seconds'] = round(time.perf_counter() - started, 2)
+        summary['chat_rooms'], summary['messages'] = self._chat()
+
+        # Вставки в обхід ORM не надсилають сигналів — похідні дані перебудовуємо окремо
+        self.log("Перерахунок денних агрегатів...")
+        first_day = date.fromisoformat(self.config['start'])
+        rollups.rebuild(first_day, first_day + timedelta(days=self.config['days'] - 1))
+        self.log("Індексація для пошуку...")
+        # Ключі нових записів — суцільні діапазони
+        for kind, ids in (('institution', self.institution_ids), ('user', self.doctor_ids.ravel().tolist()),
+                          ('patient', self.patient_ids)):
+            if ids:
+                queryset = search_index.model_for(kind).objects.filter(id__gte=ids[0], id__lte=ids[-1])
+                search_index.index_queryset(kind, queryset)
+        membership.invalidate()
+        return summary
+
+    def _institutions(self):
+        count = self.config['institutions']
+        start = _next_id(Institution)
+        types = [value for value, _ in Institution.INSTITUTION_TYPES]
+        Institution.objects.bulk_create([
+            Institution(
+                id=start + i,
+                name=f"{self.prefix} {CITIES[i % len(CITIES)]} №{start + i}",
+                type=types[int(self.rng.random() < 0.2)],
+            )
+            for i in range(count)
+        ])
+        self.log(f"Заклади: {count}")
+        return list(range(start, start + count))
+
+    def _doctors(self):
+        per_institution = self.config['doctors_per_institution']
+        start = _next_id(User)
+        users = []
+        for i, institution_id in enumerate(self.institution_ids):
+            for j in range(per_institution):
+                number = start + i * per_institution + j
+                users.append(User(
+                    id=number, username=f"{self.prefix}_doctor_{number}", password='!',
+                    email=f"doctor{number}@{self.prefix}.example", role='Лікар/Лаборант',
+                    institution_id=institution_id,
+                ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        self.log(f"Лікарі: {len(users)}")
+        # Матриця (заклад, лікар) для векторизованого вибору лікаря візиту
+        return np.arange(start, start + len(users)).reshape(len(self.institution_ids), per_institution)
+
+    def _patients(self):
+        count = self.config['patients']
+        start = _next_id(Patient)
+        with transaction.atomic():
+            insert_rows(Patient, ['id', 'patient_code'], [
+                (number, f"{self.prefix}-P{number:09d}") for number in range(start, start + count)
+            ], self.batch_size)
+        self.log(f"Пацієнти: {count}")
+        return list(range(start, start + count))
+
+    def _symptoms(self):
+        existing = dict(Symptom.objects.values_list('name', 'id'))
+        missing = [
+            Symptom(name=name, category=category)
+            for category, names in SYMPTOMS.items() for name in names if name not in existing
+        ]
+        Symptom.objects.bulk_create(missing)
+        ids = dict(Symptom.objects.values_list('name', 'id'))
+        return {category: np.array([ids[name] for name in names]) for category, names in SYMPTOMS.items()}
+
+    def _visits(self):
+        rate, categories = intensity(self.config, self.rng, len(self.institution_ids))
+        institution_ids = np.array(self.institution_ids)
+        patient_ids = np.array(self.patient_ids)
+        per_institution = self.doctor_ids.shape[1]
+        next_visit_id = _next_id(Visit)
+        visits_total = links_total = 0
+
+        for first_day in range(0, self.config['days'], self.config['days_per_chunk']):
+            chunk = rate[first_day:first_day + self.config['days_per_chunk']]
+            counts = self.rng.poisson(chunk).ravel()
+            cells = np.repeat(np.arange(counts.size), counts)
+            n = cells.size
+            if not n:
+                continue
+            day, institution, category = np.unravel_index(cells, chunk.shape)
+            # Візити в межах дня — з 8:00 до 20:00, упорядковані за часом
+            seconds = (first_day + day) * 86400 + self.rng.integers(8 * 3600, 20 * 3600, n)
+            order = np.argsort(seconds, kind='stable')
+            seconds, institution, category = seconds[order], institution[order], category[order]
+            ids = np.arange(next_visit_id, next_visit_id + n)
+            next_visit_id += n
+            visits = list(zip(
+                ids.tolist(),
+                _utc_strings(seconds, self.config['start']),
+                patient_ids[self.rng.integers(0, patient_ids.size, n)].tolist(),
+                self.doctor_ids[institution, self.rng.integers(0, per_institution, n)].tolist(),
+                institution_ids[institution].tolist(),
+            ))
+
+            # Симптоми: 1-3 різні симптоми категорії візиту (підряд по колу від випадкового)
+            per_visit = self.rng.choice(len(SYMPTOMS_PER_VISIT), n, p=SYMPTOMS_PER_VISIT) + 1
+            link_visits = np.repeat(ids, per_visit)
+            link_category = np.repeat(category, per_visit)
+            link_first = np.repeat(self.rng.integers(0, 1 << 30, n), per_visit)
+            position = np.arange(link_visits.size) - np.repeat(np.cumsum(per_visit) - per_visit, per_visit)
+            link_symptoms = np.empty(link_visits.size, dtype=np.int64)
+            for k, name in enumerate(categories):
+                mask = link_category == k
+                pool = self.symptom_ids[name]
+                link_symptoms[mask] = pool[(link_first[mask] + position[mask]) % pool.size]
+
+            with transaction.atomic():
+                insert_rows(Visit, ['id', 'visit_date', 'patient', 'doctor', 'institution'], visits, self.batch_size)
+                insert_rows(SymptomLink, ['visit', 'symptom'],
+                            list(zip(link_visits.tolist(), link_symptoms.tolist())), self.batch_size)
+            visits_total += n
+            links_total += link_visits.size
+            self.log(f"Візити: {visits_total}")
+        return visits_total, links_total
+
+    def _chat(self):
+        rooms = self.config['chat_rooms']
+        if not rooms or not self.institution_ids:
+            return 0, 0
+        start = _next_id(ChatRoom)
+        ChatRoom.objects.bulk_create([
+            ChatRoom(id=start + i, name=f"{self.prefix} кімната {start + i}") for i in range(rooms)
+        ])
+        participants = {}
+        links = []
+        for i in range(rooms):
+            size = self.rng.integers(2, max(len(self.institution_ids), 2) + 1)
+            chosen = self.rng.choice(len(self.institution_ids), min(size, len(self.institution_ids)), replace=False)
+            participants[start + i] = chosen
+            links += [ParticipantLink(chatroom_id=start + i, institution_id=self.institution_ids[k]) for k in chosen]
+        ParticipantLink.objects.bulk_create(links)
+
+        count = self.config['messages']
+        seconds = np.sort(self.rng.integers(0, self.config['days'] * 86400, count))
+        rooms_of_messages = self.rng.integers(start, start + rooms, count).tolist()
+        messages = []
+        for room_id, stamp in zip(rooms_of_messages, _utc_strings(seconds, self.config['start'])):
+            institution = participants[room_id][self.rng.integers(len(participants[room_id]))]
+            sender = self.doctor_ids[institution, self.rng.integers(self.doctor_ids.shape[1])]
+            messages.append((room_id, int(sender), MESSAGES[self.rng.integers(len(MESSAGES))], stamp))
+        with transaction.atomic():
+            insert_rows(Message, ['room', 'sender', 'content', 'timestamp'], messages, self.batch_size)
+        self.log(f"Чат-кімнати: {rooms}, повідомлення: {count}")
+        return rooms, count
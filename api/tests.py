@@ -1,3 +1,1313 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pypdf import PdfReader
+from rest_framework.test import APIClient
+
+import numpy as np
+
+from . import (
+    archive, benchmarks, calibration, consumers, data_version, detection, epidemic, exports, ingest, membership,
+    metrics, period_report, reference, reports, rollups, rt, search_index, sir_cache, stochastic, synthetic, uploads,
+)
+from .models import ChatRoom, DailyVisitRollup, DetectionState, FileBlob, Message, OutbreakAlert, Institution, Patient, Report, ReportJob, Symptom, UploadSession, User, Visit, VisitArchive
+from .routing import websocket_urlpatterns
+from .serializers import VisitSerializer
+from .sir_cache import result_cache
+from .views import SIRModelingView
+
+
+def use_temp_media(test):
+    """Публічні (MEDIA_ROOT) і приватні (api/storage.py) файли тесту — у тимчасовому каталозі."""
+    media = tempfile.TemporaryDirectory()
+    test.addCleanup(media.cleanup)
+    private = os.path.join(media.name, 'private')
+    media_settings = override_settings(
+        MEDIA_ROOT=os.path.join(media.name, 'public'), PRIVATE_MEDIA_ROOT=private,
+        UPLOAD_TEMP_DIR=os.path.join(private, 'uploads'),
+    )
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.doctor = User.objects.create_user('doctor', password='pass', institution=self.clinic)
+        self.patient = Patient.objects.create(patient_code='P-001')
+        self.cough = Symptom.objects.create(name="Кашель", category='Грип')
+        self.fever = Symptom.objects.create(name="Температура", category='Грип')
+        self.rash = Symptom.objects.create(name="Висип", category='Вітрянка')
+
+    def counts(self):
+        return set(DailyVisitRollup.objects.filter(count__gt=0).values_list('day', 'institution', 'category', 'count'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.counts()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.counts())
+        return incremental
+
+    def test_signals_keep_rollups_equal_to_rebuild(self):
+        first = Visit.objects.create(patient=self.patient, doctor=self.doctor, institution=self.clinic)
+        first.symptoms.set([self.cough, self.fever])
+        second = Visit.objects.create(patient=self.patient, doctor=self.doctor, institution=self.clinic)
+        second.symptoms.add(self.rash)
+        today = rollups.visit_day(first.visit_date)
+        # Два симптоми однієї категорії дають один внесок у категорію
+        self.assertEqual(self.assertMatchesRebuild(), {
+            (today, self.clinic.id, '', 2), (today, self.clinic.id, 'Грип', 1), (today, self.clinic.id, 'Вітрянка', 1),
+        })
+
+        first.symptoms.remove(self.cough)
+        self.fever.category = 'Вітрянка'
+        self.fever.save()
+        self.assertEqual(self.assertMatchesRebuild(), {(today, self.clinic.id, '', 2), (today, self.clinic.id, 'Вітрянка', 2)})
+
+        self.rash.delete()
+        second.delete()
+        self.assertEqual(self.assertMatchesRebuild(), {(today, self.clinic.id, '', 1), (today, self.clinic.id, 'Вітрянка', 1)})
+
+        response = APIClient().get('/api/statistics/')
+        self.assertEqual(response.data['disease_dynamics'], [{'day': today, 'count': 1}])
+        self.assertEqual(response.data['disease_distribution'], [{'symptoms__category': 'Вітрянка', 'count': 1}])
+
+    def test_only_real_changes_bump_data_version(self):
+        visit = Visit.objects.create(patient=self.patient, doctor=self.doctor, institution=self.clinic)
+        # Збереження без зміни агрегатів не скидає кеш звітів
+        with self.captureOnCommitCallbacks() as callbacks:
+            visit.save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            visit.symptoms.add(self.cough)
+        self.assertEqual(len(callbacks), 1)
+
+
+class EpidemicModelTests(TestCase):
+    def test_integrators_agree_and_conserve_population(self):
+        runs = {
+            integrator: epidemic.simulate('sir', initial={'infected': 10}, params={'beta': 0.3, 'population': 10_000},
+                                          days=120, integrator=integrator, dt=0.1)
+            for integrator in ('euler', 'rk4', 'rk45')
+        }
+        for trajectory in runs.values():
+            total = trajectory['susceptible'] + trajectory['infected'] + trajectory['recovered']
+            np.testing.assert_allclose(total, 10_000, rtol=1e-9)
+        np.testing.assert_allclose(runs['rk4']['infected'], runs['rk45']['infected'], rtol=1e-3, atol=1e-2)
+        # Метод Ейлера першого порядку: пік може зсунутися не більше ніж на день
+        self.assertLessEqual(abs(int(runs['rk4']['infected'].argmax()) - int(runs['euler']['infected'].argmax())), 1)
+
+    def test_invalid_parameters_are_rejected_before_simulation(self):
+        client = APIClient()
+        entries = result_cache.stats()['entries']
+        for data in ({'beta': 'nan'}, {'beta': 'inf'}, {'gamma': -0.1}, {'initial_infected': -5},
+                     {'dt': 'nan'}, {'days': SIRModelingView.MAX_STEPS + 1},
+                     # Повільна динаміка не виходить на стаціонарний стан: бюджет кроків вичерпується
+                     {'days': 5000, 'dt': 0.01, 'beta': 0.0002, 'gamma': 0.0001}):
+            response = client.post('/api/sir_modeling/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(result_cache.stats()['entries'], entries)
+
+        response = client.post('/api/sir_modeling/', {'days': 30, 'integrator': 'rk4'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['infected']), 30)
+
+    def test_long_horizons_are_limited_by_work_done(self):
+        client = APIClient()
+        # Після виходу на стаціонарний стан дні не витрачають бюджет кроків
+        for data in ({'model': 'sirs', 'days': 50_000}, {'days': 1000, 'dt': 0.01, 'integrator': 'rk4'},
+                     {'model': 'seir', 'days': 20_000, 'integrator': 'rk45'}):
+            response = client.post('/api/sir_modeling/', data, format='json')
+            self.assertEqual(response.status_code, 200, data)
+            self.assertEqual(len(response.data['days']), data['days'])
+        with self.assertRaises(ValueError):
+            epidemic.simulate('sir', initial={'infected': 1}, params={'population': 1000}, days=100, max_steps=98)
+        self.assertEqual(len(epidemic.simulate('sir', initial={'infected': 1}, params={'population': 1000},
+                                               days=100, max_steps=99)['infected']), 100)
+
+
+class SIRResultCacheTests(TestCase):
+    def setUp(self):
+        result_cache.clear()
+
+    def test_equivalent_requests_hit_and_shorter_horizons_are_sliced(self):
+        client = APIClient()
+        long = client.post('/api/sir_modeling/', {'days': 200, 'beta': 0.3}, format='json')
+        self.assertEqual(long['X-Cache'], 'MISS')
+        # Те саме після нормалізації: рядок замість числа, явні значення за замовчуванням
+        short = client.post('/api/sir_modeling/', {'days': '50', 'beta': '0.30', 'gamma': 0.1, 'model': 'sir'},
+                            format='json')
+        self.assertEqual(short['X-Cache'], 'HIT')
+        self.assertEqual(short.data['infected'], long.data['infected'][:50])
+        direct = epidemic.simulate('sir', initial={'infected': 1}, params={'beta': 0.3, 'population': 1000}, days=50)
+        np.testing.assert_allclose(short.data['infected'], direct['infected'])
+        self.assertEqual(client.post('/api/sir_modeling/', {'days': 50, 'beta': 0.31}, format='json')['X-Cache'], 'MISS')
+
+    def test_eviction_and_shared_backend(self):
+        run = {'model': 'sir', 'integrator': 'euler', 'dt': 1.0, 'population': 100,
+               'initial': {'infected': 1}, 'params': {'beta': 0.2, 'gamma': 0.1}}
+        trajectory = epidemic.simulate('sir', initial={'infected': 1}, params={'population': 100}, days=10)
+        self.addCleanup(cache.clear)
+        first = sir_cache.ModelResultCache(max_entries=1, backend='default')
+        first.put(dict(run, days=10), trajectory)
+        first.put(dict(run, days=10, population=200), trajectory)
+        self.assertEqual(first.stats()['entries'], 1)
+        # Інший процес (окремий екземпляр) отримує результат зі спільного кешу
+        second = sir_cache.ModelResultCache(backend='default')
+        self.assertEqual(len(second.get(dict(run, days=5))['infected']), 5)
+        self.assertEqual(second.stats()['shared_hits'], 1)
+
+
+class SIRSweepTests(TestCase):
+    def test_sweep_matches_single_runs(self):
+        response = APIClient().post('/api/sir_modeling/sweep/', {
+            'beta': {'start': 0.2, 'stop': 0.4, 'step': 0.1}, 'gamma': [0.1, 0.2], 'days': 60,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 6)
+        scenario = next(row for row in response.data['scenarios'] if row['beta'] == 0.4 and row['gamma'] == 0.1)
+        single = epidemic.simulate('sir', initial={'infected': 1}, params={'beta': 0.4, 'gamma': 0.1, 'population': 1000},
+                                   days=60)
+        self.assertEqual(scenario['peak_day'], int(single['infected'].argmax()))
+        self.assertAlmostEqual(scenario['r0'], 4.0)
+
+    def test_oversized_or_invalid_axes_are_rejected(self):
+        client = APIClient()
+        for data in ({'beta': {'start': 0, 'stop': 1, 'num': 10 ** 10}},
+                     {'beta': {'start': 0, 'stop': 1, 'step': 1e-12}},
+                     {'beta': {'start': 0, 'stop': 'inf', 'step': 0.1}},
+                     {'gamma': [0, 0.1]},
+                     {'gamma': 'nan'}):
+            response = client.post('/api/sir_modeling/sweep/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+
+
+class SIRCalibrationTests(TestCase):
+    def setUp(self):
+        self.observed = np.round(calibration.model_incidence(0.4, 0.1, 5, 10_000, 60))
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.start = date(2024, 1, 1)
+        DailyVisitRollup.objects.bulk_create([
+            DailyVisitRollup(day=self.start + timedelta(days=i), institution=self.clinic, category='Грип', count=int(n))
+            for i, n in enumerate(self.observed) if n
+        ])
+
+    def test_fit_recovers_known_parameters(self):
+        # Початкова кількість інфікованих (5) не дорівнює першому спостереженню — підбирається разом з beta і gamma
+        fitted = calibration.fit(self.observed, 10_000, fit_initial=True)
+        self.assertAlmostEqual(fitted['r0'], 4.0, delta=0.05)
+        self.assertAlmostEqual(fitted['beta'], 0.4, delta=0.01)
+        self.assertAlmostEqual(fitted['initial_infected'], 5, delta=0.5)
+        low, high = fitted['confidence']['beta']
+        self.assertTrue(low <= fitted['beta'] <= high)
+
+    def test_endpoint_fits_rollups_and_projects(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('analyst', password='pass', role='Аналітик'))
+        data = {'category': 'Грип', 'date_from': '2024-01-01', 'date_to': '2024-02-29', 'population': 10_000,
+                'horizon': 10}
+        response = client.post('/api/sir_modeling/fit/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row['cases'] for row in response.data['observed']], self.observed.tolist())
+        self.assertEqual(len(response.data['projection']), 70)
+        for bad in ({'category': 'Вітрянка'}, {'population': 10}, {'date_to': '2024-01-03'}):
+            self.assertEqual(client.post('/api/sir_modeling/fit/', dict(data, **bad), format='json').status_code, 400)
+
+
+class StochasticEnsembleTests(TestCase):
+    def test_initially_recovered_do_not_count_as_outbreak(self):
+        # Без передачі інфекція згасає в кожній реалізації, хоч половина популяції вже одужала
+        result = stochastic.ensemble(1000, 1, 500, beta=0.0, gamma=1.0, days=60, runs=50, seed=3)
+        self.assertEqual(result['extinction_probability'], 1.0)
+        np.testing.assert_array_equal(result['mean']['susceptible'], 499)
+
+    def test_seed_is_reproducible_and_invalid_rates_are_rejected(self):
+        client = APIClient()
+        data = {'population': 500, 'initial_infected': 3, 'days': 40, 'runs': 20, 'seed': 7}
+        first = client.post('/api/sir_modeling/stochastic/', data, format='json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data, client.post('/api/sir_modeling/stochastic/', data, format='json').data)
+        for bad in ({'beta': 'nan'}, {'gamma': 'inf'}, {'major_outbreak_threshold': 'nan'}):
+            response = client.post('/api/sir_modeling/stochastic/', dict(data, **bad), format='json')
+            self.assertEqual(response.status_code, 400, bad)
+
+
+class BulkVisitTests(TestCase):
+    def setUp(self):
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.doctor = User.objects.create_user('doctor', password='pass', role='Лікар', institution=self.clinic)
+        self.patient = Patient.objects.create(patient_code='P-001')
+        self.cough = Symptom.objects.create(name="Кашель", category='Грип')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+
+    def test_valid_rows_are_written_and_invalid_reported(self):
+        rows = [
+            {'patient': self.patient.id, 'symptoms': [self.cough.id], 'visit_date': '2024-03-05T10:00:00'},
+            {'patient': self.patient.id, 'symptoms': [self.cough.id]},
+            {'patient': 999999, 'symptoms': []},
+            {'patient': self.patient.id, 'symptoms': [999999]},
+            {'patient': self.patient.id, 'symptoms': [], 'visit_date': 'вчора'},
+            'не об\'єкт',
+        ]
+        response = self.client.post('/api/visits/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 4))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        dated = Visit.objects.get(visit_date__date=date(2024, 3, 5))
+        self.assertEqual(list(dated.symptoms.all()), [self.cough])
+        # Агрегати оновлено пакетом, як і для візитів через ORM
+        self.assertEqual(DailyVisitRollup.objects.get(day=date(2024, 3, 5), category='Грип').count, 1)
+
+    def test_ndjson_stream(self):
+        body = '\n'.join(json.dumps({'patient': self.patient.id, 'symptoms': [self.cough.id]}) for _ in range(3))
+        response = self.client.post('/api/visits/bulk/', body + '\n\n{oops\n', content_type='application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 1))
+        # Тіло без Content-Length (chunked) недоступне — 400 замість "нічого не створено"
+        response = self.client.post('/api/visits/bulk/', '', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+
+class VisitPaginationTests(TestCase):
+    def setUp(self):
+        self.institution = Institution.objects.create(name="Клініка №1", type='Клініка')
+        self.analyst = User.objects.create_user('analyst', password='pass', role='Аналітик')
+        self.patient = Patient.objects.create(patient_code='P-001')
+        self.symptoms = [
+            Symptom.objects.create(name="Кашель", category='Грип'),
+            Symptom.objects.create(name="Висип", category='Вітрянка'),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.analyst)
+
+    def create_visits(self, count):
+        for _ in range(count):
+            visit = Visit.objects.create(patient=self.patient, doctor=self.analyst, institution=self.institution)
+            visit.symptoms.set(self.symptoms)
+
+    def test_page_query_count_does_not_depend_on_rows(self):
+        # Візити + одна вибірка симптомів для всієї сторінки, незалежно від її розміру
+        self.create_visits(3)
+        with self.assertNumQueries(2):
+            small = self.client.get('/api/visits/', {'page_size': 50})
+        self.assertEqual(len(small.data['results']), 3)
+
+        self.create_visits(60)
+        with self.assertNumQueries(2):
+            full = self.client.get('/api/visits/', {'page_size': 50})
+        self.assertEqual(len(full.data['results']), 50)
+        self.assertEqual(len(full.data['results'][0]['symptoms_details']), 2)
+
+    def test_cursor_walks_all_visits_once(self):
+        self.create_visits(25)
+        seen = []
+        url, params = '/api/visits/', {'page_size': 10}
+        while url:
+            page = self.client.get(url, params).data
+            seen += [row['id'] for row in page['results']]
+            url, params = page['next'], None
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_previous_cursor_returns_previous_page(self):
+        self.create_visits(15)
+        first = self.client.get('/api/visits/', {'page_size': 5}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']],
+        )
+
+
+class VisitExportTests(TestCase):
+    def setUp(self):
+        self.clinic = Institution.objects.create(name="Клініка №1", type='Клініка')
+        self.analyst = User.objects.create_user('analyst', password='pass', role='Аналітик')
+        self.patient = Patient.objects.create(patient_code='P-001')
+        self.flu = Symptom.objects.create(name="Кашель", category='Грип')
+        self.pox = Symptom.objects.create(name="Висип", category='Вітрянка')
+        self.client = APIClient()
+        self.client.force_authenticate(self.analyst)
+
+    def create_visits(self, count, day=None):
+        for n in range(count):
+            visit = Visit.objects.create(patient=self.patient, doctor=self.analyst, institution=self.clinic)
+            visit.symptoms.set([self.flu] if n % 2 else [self.flu, self.pox])
+            if day:
+                Visit.objects.filter(pk=visit.pk).update(visit_date=timezone.make_aware(datetime(*day, 12)))
+
+    def test_csv_export(self):
+        self.create_visits(3)
+        response = self.client.get('/api/visits/export/', {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('visits.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(exports.EXPORT_COLUMNS))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(',P-001,Клініка №1,analyst,Вітрянка;Грип'))
+
+    def test_chunks_cover_ties_on_visit_date_once(self):
+        # Однакові visit_date на межі пакетів: курсор (visit_date, id) не губить і не дублює рядки
+        self.create_visits(7, day=(2024, 3, 1))
+        self.create_visits(4, day=(2024, 2, 1))
+        with self.assertNumQueries(12):
+            rows = list(exports.iter_visit_rows(Visit.objects.all(), chunk_size=2))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual([row['visit_date'][:10] for row in rows], ['2024-03-01'] * 7 + ['2024-02-01'] * 4)
+        self.assertEqual(sum(row['categories'] == ['Вітрянка', 'Грип'] for row in rows), 6)
+
+    def test_invalid_filter(self):
+        response = self.client.get('/api/visits/export/', {'format': 'ndjson', 'date_from': '01.03.2024'})
+        self.assertEqual(response.status_code, 400)
+
+
+class VisitArchiveTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        self.clinics = [Institution.objects.create(name=f"Клініка №{n}", type='Клініка') for n in (1, 2)]
+        self.analyst = User.objects.create_user('analyst', password='pass', role='Аналітик')
+        self.doctor = User.objects.create_user('doctor', password='pass', institution=self.clinics[0])
+        self.patient = Patient.objects.create(patient_code='P-001')
+        flu = Symptom.objects.create(name="Кашель", category='Грип')
+        pox = Symptom.objects.create(name="Висип", category='Вітрянка')
+        days = [(2023, 1, 10), (2023, 1, 20), (2023, 2, 5), (2024, 6, 1)]
+        for n, day in enumerate(days):
+            for clinic in self.clinics:
+                visit = Visit.objects.create(patient=self.patient, doctor=self.doctor, institution=clinic)
+                visit.symptoms.set([flu] if n % 2 else [flu, pox])
+                moment = timezone.make_aware(datetime(*day, 12, n))
+                # visit_date має auto_now_add — дату в минулому ставимо напряму
+                Visit.objects.filter(pk=visit.pk).update(visit_date=moment)
+        rollups.rebuild()
+
+    def export(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/visits/export/', {'format': 'ndjson', **params})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def rollup_counts(self):
+        return sorted(DailyVisitRollup.objects.values_list('day', 'institution_id', 'category', 'count'))
+
+    def test_archived_months_leave_table_but_not_statistics(self):
+        before = self.rollup_counts()
+        exported = self.export(self.analyst)
+        months = archive.archivable_months(today=date(2024, 6, 15), horizon_days=365)
+        self.assertEqual(months, [date(2023, 1, 1), date(2023, 2, 1), date(2023, 3, 1), date(2023, 4, 1),
+                                  date(2023, 5, 1)])
+        for month in months:
+            # Одне оновлення версії даних на місяць, а не по одному на кожен видалений візит
+            with self.captureOnCommitCallbacks() as callbacks:
+                archive.archive_month(month, batch_size=3)
+            self.assertEqual(len(callbacks), 1 if VisitArchive.objects.filter(month=month).exists() else 0)
+        self.assertTrue(all(part.file.path.startswith(settings.PRIVATE_MEDIA_ROOT)
+                            for part in VisitArchive.objects.all()))
+
+        self.assertEqual(Visit.objects.count(), 2)
+        self.assertEqual(archive.archived_count(), 6)
+        self.assertEqual(self.rollup_counts(), before)
+        # Експорт з архівів збігається з експортом до архівування, включно з порядком
+        self.assertEqual(self.export(self.analyst), exported)
+        filtered = self.export(self.analyst, date_from='2023-01-15', date_to='2023-02-28', category='Вітрянка')
+        self.assertEqual(filtered, [row for row in exported if '2023-01-15' <= row['visit_date'][:10] <= '2023-02-28'
+                                    and 'Вітрянка' in row['categories']])
+        self.assertEqual(len(filtered), 2)
+        # Лікар бачить в архіві лише свій заклад
+        own = self.export(self.doctor)
+        self.assertEqual(own, [row for row in exported if row['institution'] == "Клініка №1"])
+        self.assertEqual(self.export(self.doctor, institution=self.clinics[1].pk), [])
+
+        rollups.rebuild()
+        self.assertEqual(self.rollup_counts(), before)
+
+    def test_late_visit_goes_to_next_part(self):
+        archive.archive_month(date(2023, 1, 1))
+        late = Visit.objects.create(patient=self.patient, doctor=self.doctor, institution=self.clinics[1])
+        Visit.objects.filter(pk=late.pk).update(visit_date=timezone.make_aware(datetime(2023, 1, 15, 9)))
+        part = archive.archive_month(date(2023, 1, 1))
+        self.assertEqual((part.part, part.rows), (2, 1))
+        days = [row['visit_date'][:10] for row in self.export(self.analyst, date_to='2023-01-31')]
+        self.assertEqual(days, ['2023-01-20', '2023-01-20', '2023-01-15', '2023-01-10', '2023-01-10'])
+
+
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.lab = Institution.objects.create(name="Лабораторія", type='Лабораторія')
+        doctor = User.objects.create_user('doctor', password='pass', institution=self.clinic)
+        patient = Patient.objects.create(patient_code='P-001')
+        self.cough = Symptom.objects.create(name="Кашель", category='Грип')
+        self.fever = Symptom.objects.create(name="Жар", category='Грип')
+        self.rash = Symptom.objects.create(name="Висип", category='Вітрянка')
+        # (день, заклад, симптоми): 2024-03-04 — понеділок
+        visits = [
+            ((2024, 1, 15), self.clinic, [self.cough, self.rash]),
+            ((2024, 3, 4), self.clinic, [self.cough, self.fever]),
+            ((2024, 3, 6), self.lab, [self.rash]),
+            ((2024, 3, 10), self.clinic, [self.fever, self.rash]),
+            ((2024, 3, 11), self.lab, []),
+        ]
+        for day, institution, symptoms in visits:
+            visit = Visit.objects.create(patient=patient, doctor=doctor, institution=institution)
+            visit.symptoms.set(symptoms)
+            Visit.objects.filter(pk=visit.pk).update(visit_date=timezone.make_aware(datetime(*day, 10)))
+        rollups.rebuild()
+        self.client = APIClient()
+
+    def get(self, **params):
+        response = self.client.get('/api/statistics/timeseries/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    @staticmethod
+    def points(data):
+        return {
+            tuple(item['group'].values()): [(point['period'], point['count']) for point in item['points']]
+            for item in data['series']
+        }
+
+    def test_weekly_category_series_from_rollups(self):
+        data = self.get(granularity='week', group_by='category', date_from='2024-03-01')
+        self.assertEqual(data['source'], 'rollup')
+        self.assertEqual(self.points(data), {
+            ('Вітрянка',): [('2024-03-04', 2)],
+            ('Грип',): [('2024-03-04', 2)],
+        })
+        monthly = self.get(granularity='month', institution_type='Лабораторія')
+        self.assertEqual(self.points(monthly), {(): [('2024-03-01', 2)]})
+
+    def test_symptom_filter_falls_back_to_sql_with_archives(self):
+        archive.archive_month(date(2024, 1, 1))
+        # Два симптоми однієї категорії у візиті — один візит
+        data = self.get(granularity='month', symptom=[self.cough.pk, self.fever.pk], group_by='institution')
+        self.assertEqual(data['source'], 'visits')
+        self.assertEqual(self.points(data), {(self.clinic.pk,): [('2024-01-01', 1), ('2024-03-01', 2)]})
+        # Кілька категорій без групування — візит рахується один раз
+        both = self.get(granularity='month', category=['Грип', 'Вітрянка'])
+        self.assertEqual(both['source'], 'visits')
+        self.assertEqual(self.points(both), {(): [('2024-01-01', 1), ('2024-03-01', 3)]})
+        # Той самий зріз із куба і з SQL збігається
+        symptoms = [self.cough.pk, self.fever.pk, self.rash.pk]
+        self.assertEqual(
+            self.points(self.get(group_by=['category', 'institution'])),
+            self.points(self.get(group_by=['category', 'institution'], symptom=symptoms)),
+        )
+
+    def test_rejects_unknown_parameters(self):
+        for params in ({'granularity': 'year'}, {'group_by': 'region'}, {'date_from': '2024-13-01'}):
+            self.assertEqual(self.client.get('/api/statistics/timeseries/', params).status_code, 400)
+
+
+class OutbreakDetectionTests(TestCase):
+    def test_vectorized_statistics_match_direct_formulas(self):
+        counts = np.random.default_rng(7).poisson(4, size=(5, 60)).astype(float)
+        counts[2, 40:43] += 25
+        alarms, _ = detection.evaluate(counts, first=12, block_size=2)
+        found = {
+            (int(series), int(day), detection.METHODS[int(method)]): score
+            for series, day, method, score in zip(alarms['series'], alarms['day'], alarms['method'], alarms['score'])
+        }
+
+        def ears(row, t, lag):
+            base = counts[row, t - lag - 6:t - lag + 1]
+            return (counts[row, t] - base.mean()) / max(base.std(ddof=1), detection.MIN_SD)
+
+        expected = {}
+        for row in range(5):
+            s = 0.0
+            for t in range(12, 60):
+                c1, c2 = ears(row, t, 1), ears(row, t, 3)
+                c3 = sum(max(ears(row, t - k, 3) - 1, 0) for k in range(3))
+                s = max(s + c2 - detection.CUSUM_K, 0)
+                for method, value, threshold in ((OutbreakAlert.C1, c1, 3), (OutbreakAlert.C2, c2, 3),
+                                                 (OutbreakAlert.C3, c3, 2), (OutbreakAlert.CUSUM, s, 4)):
+                    if value > threshold:
+                        expected[row, t, method] = value
+                if s > detection.CUSUM_H:
+                    s = 0.0
+        self.assertIn((2, 40, OutbreakAlert.C1), expected)
+        self.assertEqual(set(expected), {key for key in found if key[2] != OutbreakAlert.FARRINGTON})
+        for key, value in expected.items():
+            self.assertAlmostEqual(found[key], value, places=4)
+
+    def test_incremental_runs_match_full_history_and_post_to_chat(self):
+        clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        room = ChatRoom.objects.create(name="Епідемія")
+        room.participants.add(clinic)
+        User.objects.create_user('monitor', password='pass', role='Аналітик')
+        rng = np.random.default_rng(1)
+        start = date(2023, 1, 1)
+        counts = rng.poisson(3, size=(2, 500))
+        counts[0, 495:498] += 30
+        DailyVisitRollup.objects.bulk_create([
+            DailyVisitRollup(day=start + timedelta(days=day), institution=clinic, category=category, count=n)
+            for category, series in zip(['Грип', 'Вітрянка'], counts)
+            for day, n in enumerate(series) if n
+        ])
+        last = start + timedelta(days=499)
+
+        detection.detect(until=last - timedelta(days=30))
+        with override_settings(OUTBREAK_ALERT_SENDER='monitor'):
+            detection.detect(until=last, post=True)
+        incremental = set(OutbreakAlert.objects.values_list('day', 'category', 'method', 'observed'))
+        state = DetectionState.objects.get().cusum
+        detection.detect(until=last, rebuild=True)
+        self.assertEqual(set(OutbreakAlert.objects.values_list('day', 'category', 'method', 'observed')), incremental)
+        self.assertEqual(DetectionState.objects.get().cusum, state)
+        self.assertIn((start + timedelta(days=495), 'Грип', OutbreakAlert.C1, counts[0, 495]), incremental)
+        self.assertTrue(Message.objects.filter(room=room, content__contains='Грип').exists())
+
+        doctor = User.objects.create_user('doctor', password='pass', institution=clinic)
+        client = APIClient()
+        client.force_authenticate(doctor)
+        response = client.get('/api/alerts/', {'date_from': '2024-04-25', 'method': OutbreakAlert.C1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['institution_name'], "Клініка")
+        self.assertEqual(len(client.get('/api/alerts/', {'limit': 1}).data), 1)
+        for limit in (0, -5):
+            self.assertEqual(client.get('/api/alerts/', {'limit': limit}).status_code, 400)
+
+
+class RtEstimationTests(TestCase):
+    def setUp(self):
+        # Кеш рядів живе на рівні процесу, а ID після відкату транзакції тесту можуть повторюватись
+        rt.series_cache.clear()
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.start = date(2024, 1, 1)
+        self.counts = np.random.default_rng(3).poisson(np.linspace(5, 40, 60)).astype(float)
+        DailyVisitRollup.objects.bulk_create([
+            DailyVisitRollup(day=self.start + timedelta(days=i), institution=self.clinic, category='Грип', count=int(n))
+            for i, n in enumerate(self.counts) if n
+        ])
+        self.today = self.start + timedelta(days=59)
+
+    def test_matches_renewal_equation(self):
+        data = rt.estimate('Грип', window=7, today=self.today)
+        w = rt.serial_interval(*rt.SERIAL_INTERVALS['Грип'])
+        self.assertAlmostEqual(w.sum(), 1)
+        self.assertAlmostEqual(float(np.arange(w.size) @ w), 2.6, places=1)
+        infectivity = [
+            sum(self.counts[t - s] * w[s] for s in range(1, w.size) if t >= s) for t in range(self.counts.size)
+        ]
+        self.assertEqual(data['estimates'][0]['date'], '2024-01-08')
+        for estimate in data['estimates']:
+            t = (date.fromisoformat(estimate['date']) - self.start).days
+            shape = rt.PRIOR_SHAPE + self.counts[t - 6:t + 1].sum()
+            rate = 1 / rt.PRIOR_SCALE + sum(infectivity[t - 6:t + 1])
+            self.assertAlmostEqual(estimate['mean'], shape / rate, places=3)
+            self.assertLess(estimate['lower'], estimate['mean'])
+            self.assertGreater(estimate['upper'], estimate['mean'])
+
+    def test_new_day_updates_cached_series_incrementally(self):
+        rt.estimate('Грип', window=7, today=self.today)
+        tomorrow = self.today + timedelta(days=1)
+        DailyVisitRollup.objects.create(day=tomorrow, institution=self.clinic, category='Грип', count=55)
+        with self.captureOnCommitCallbacks(execute=True):
+            data_version.bump()
+        updated = rt.estimate('Грип', window=7, today=tomorrow)
+        self.assertEqual(rt.series_cache.stats()['updates'], 1)
+        self.assertEqual(updated['estimates'][-1]['incidence'], 55)
+
+        rt.series_cache.clear()
+        self.assertEqual(rt.estimate('Грип', window=7, today=tomorrow), updated)
+
+    def test_updates_read_recent_days_and_grow_in_place(self):
+        rt.estimate('Грип', window=7, today=self.today)
+        series = rt.series_cache.get('Грип', None, rt.SERIAL_INTERVALS['Грип'], self.today)
+        misses, buffers = rt.series_cache.stats()['misses'], []
+        today = self.today
+        for _ in range(5):
+            # Поправка вчорашнього дня і новий день
+            DailyVisitRollup.objects.filter(day=today, category='Грип').update(count=F('count') + 3)
+            today += timedelta(days=1)
+            DailyVisitRollup.objects.create(day=today, institution=self.clinic, category='Грип', count=20)
+            with self.captureOnCommitCallbacks(execute=True):
+                data_version.bump()
+            since = series.end - timedelta(days=len(series.w))
+            with CaptureQueriesContext(connection) as queries:
+                updated = rt.estimate('Грип', window=7, today=today)
+            self.assertIn(f"'{since.isoformat()}'", queries[-1]['sql'])
+            buffers.append(series._incidence)
+        # Місткість подвоюється один раз, далі дні дописуються в той самий буфер
+        self.assertTrue(all(buffer is buffers[0] for buffer in buffers))
+        self.assertEqual(rt.series_cache.stats()['misses'], misses)
+
+        rt.series_cache.clear()
+        self.assertEqual(rt.estimate('Грип', window=7, today=today), updated)
+
+    def test_api_validates_parameters(self):
+        client = APIClient()
+        response = client.get('/api/rt/', {'category': 'Грип', 'institution': self.clinic.id, 'date_from': '2024-02-20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estimates'][0]['date'], '2024-02-20')
+        self.assertEqual(client.get('/api/rt/', {'window': 0}).status_code, 400)
+        self.assertEqual(client.get('/api/rt/', {'si_mean': 5}).status_code, 400)
+
+
+class ReportJobQueueTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        self.owner = User.objects.create_user('analyst', password='pass', role='Аналітик')
+        self.other = User.objects.create_user('doctor', password='pass', role='Лікар')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def request_report(self):
+        response = self.client.get('/api/quick-report/')
+        self.assertEqual(response.status_code, 202)
+        return response.data['id']
+
+    def test_jobs_are_visible_only_to_their_owner(self):
+        job_id = self.request_report()
+        self.assertEqual(self.client.get(f'/api/report-jobs/{job_id}/').data['status'], ReportJob.PENDING)
+
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertEqual(other.get(f'/api/report-jobs/{job_id}/').status_code, 404)
+        self.assertEqual(other.get('/api/report-jobs/').data, [])
+        # Той самий звіт для іншого користувача — окреме завдання
+        self.assertNotEqual(other.get('/api/quick-report/').data['id'], job_id)
+
+    def test_worker_renders_report_and_expires_outdated_jobs(self):
+        job_id = self.request_report()
+        reports.run(reports.claim_next())
+        done = self.client.get(f'/api/report-jobs/{job_id}/').data
+        self.assertEqual(done['status'], ReportJob.DONE)
+        # Файл звіту приватний: посилання веде на представлення завдання, а не в MEDIA_URL
+        self.assertTrue(done['file'].endswith(f'/api/report-jobs/{job_id}/download/'))
+        self.assertEqual(b''.join(self.client.get(done['file']).streaming_content)[:4], b'%PDF')
+        response = self.client.get('/api/quick-report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+
+        # Дані змінились: новий звіт заміняє старий, а попереднє завдання позначається застарілим
+        data_version._increment()
+        self.request_report()
+        reports.run(reports.claim_next())
+        job = self.client.get(f'/api/report-jobs/{job_id}/').data
+        self.assertEqual((job['status'], job['file']), (ReportJob.EXPIRED, None))
+        self.assertEqual(Report.objects.filter(source=Report.GENERATED).count(), 1)
+
+
+class PeriodReportTests(TestCase):
+    def setUp(self):
+        self.clinics = [Institution.objects.create(name=f"Клініка №{n}", type='Клініка') for n in (1, 2)]
+        self.start = date(2024, 1, 1)
+        self.observed = np.round(calibration.model_incidence(0.4, 0.1, 5, 10_000, 30)).astype(int)
+        DailyVisitRollup.objects.bulk_create([
+            DailyVisitRollup(day=self.start + timedelta(days=i), institution=self.clinics[0], category=category,
+                             count=int(n))
+            for i, n in enumerate(self.observed) if n for category in (rollups.TOTAL, 'Грип')
+        ])
+        self.params = {'date_from': '2024-01-01', 'date_to': '2024-01-30', 'institutions': [], 'population': 10_000,
+                       'horizon': 14}
+
+    def test_sections_cover_active_institutions_and_categories(self):
+        report = period_report.collect(self.params)
+        kinds = [(kind, payload['title']) for kind, payload in report['sections']]
+        # Заклад без візитів і категорії без випадків розділів не мають
+        self.assertEqual(kinds, [
+            ('overview', "Огляд періоду"), ('institution', "Заклад: Клініка №1"), ('projection', "SIR-проєкція: Грип"),
+        ])
+        overview, _, projection = (payload for _, payload in report['sections'])
+        self.assertEqual(overview['totals'], self.observed.tolist())
+        self.assertEqual(overview['institutions'], [("Клініка №1", int(self.observed.sum()))])
+        self.assertEqual((len(projection['observed']), len(projection['model'])), (30, 44))
+
+    @override_settings(REPORT_RENDER_WORKERS=1)
+    def test_render_produces_title_and_section_pages(self):
+        output = io.BytesIO()
+        period_report.render_period(output, self.params)
+        output.seek(0)
+        self.assertEqual(output.read(4), b'%PDF')
+        output.seek(0)
+        reader = PdfReader(output, strict=True)
+        # Титульна сторінка із змістом і щонайменше по сторінці на кожен з трьох розділів
+        self.assertGreaterEqual(len(reader.pages), 4)
+        self.assertEqual(reader.metadata.title, "Аналітичний звіт за період")
+        # Номер накладено на кожну сторінку окремим Form XObject
+        for page in reader.pages:
+            self.assertEqual(page['/Resources']['/XObject']['/PageNumber']['/Subtype'], '/Form')
+
+    def test_endpoint_validates_parameters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('analyst', password='pass', role='Аналітик'))
+        query = {'date_from': '2024-01-01', 'date_to': '2024-01-30'}
+        self.assertEqual(client.get('/api/period-report/', query).status_code, 202)
+        for bad in ({'date_to': '2023-12-31'}, {'date_to': '2030-01-01'}, {'population': 0}, {'horizon': 1000},
+                    {'institution': 'x'}):
+            self.assertEqual(client.get('/api/period-report/', dict(query, **bad)).status_code, 400, bad)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        self.user = User.objects.create_user('doctor', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.content = b"patient,symptom\n" + b"P-001,\xd0\x9a\xd0\xb0\xd1\x88\xd0\xb5\xd0\xbb\xd1\x8c\n" * 5000
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+    def put(self, session_id, offset, chunk):
+        return self.client.put(f'/api/uploads/{session_id}/', chunk, content_type='application/octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset))
+
+    def upload(self, sha256=''):
+        response = self.client.post('/api/uploads/', {'name': 'lab.csv', 'size': len(self.content), 'sha256': sha256})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def test_resumed_upload_is_deduplicated(self):
+        session_id = self.upload()
+        self.assertEqual(self.put(session_id, 0, self.content[:40000]).data['received'], 40000)
+        # Повтор з неправильного зсуву — сервер повідомляє, звідки продовжувати
+        response = self.put(session_id, 10, self.content[10:50000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 40000)
+        self.assertEqual(self.client.post(f'/api/uploads/{session_id}/finalize/').status_code, 400)
+        # Продовження в "іншому процесі": інкрементального хешу немає, сума дораховується з файлу
+        uploads._hashers.clear()
+        self.put(session_id, 40000, self.content[40000:])
+        response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['report']['sha256'], self.sha256)
+        self.assertEqual(self.client.post(f'/api/uploads/{session_id}/finalize/').data, response.data)
+
+        second = self.upload()
+        self.put(second, 0, self.content)
+        self.client.post(f'/api/uploads/{second}/finalize/')
+        response = self.client.post('/api/reports/', {'file': SimpleUploadedFile('lab.csv', self.content)})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['sha256'], self.sha256)
+        # Відомий вміст: звіт створюється без передачі файлу
+        response = self.client.post('/api/uploads/', {'name': 'copy.csv', 'size': len(self.content),
+                                                      'sha256': self.sha256})
+        self.assertEqual(response.data['status'], UploadSession.COMPLETE)
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.reports.count(), 4)
+        with blob.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_known_hash_does_not_grant_another_users_content(self):
+        self.client.post('/api/reports/', {'file': SimpleUploadedFile('lab.csv', self.content)})
+        other = User.objects.create_user('other', password='pass')
+        self.client.force_authenticate(other)
+        # Інший користувач знає суму, але не має файлу — потрібне повне завантаження
+        session_id = self.upload(sha256=self.sha256)
+        self.assertEqual(self.client.get(f'/api/uploads/{session_id}/').data['status'], UploadSession.ACTIVE)
+        self.assertFalse(Report.objects.filter(user=other).exists())
+        self.put(session_id, 0, self.content)
+        response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, 200)
+        # Після повного завантаження вміст зберігається одним blob
+        self.assertEqual(FileBlob.objects.get().reports.count(), 2)
+
+    def test_files_stay_private_and_are_served_to_owner(self):
+        session_id = self.upload()
+        self.put(session_id, 0, self.content[:1000])
+        # Незавершене завантаження і вміст — поза публічним MEDIA_ROOT
+        self.assertTrue(os.path.exists(os.path.join(settings.UPLOAD_TEMP_DIR, f'{session_id}.part')))
+        self.put(session_id, 1000, self.content[1000:])
+        report = self.client.post(f'/api/uploads/{session_id}/finalize/').data['report']
+        self.assertFalse(os.path.exists(settings.MEDIA_ROOT))
+        blob = FileBlob.objects.get()
+        self.assertTrue(blob.file.path.startswith(settings.PRIVATE_MEDIA_ROOT))
+
+        self.assertTrue(report['file'].endswith(f'/api/reports/{report["id"]}/download/'))
+        response = self.client.get(report['file'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='pass'))
+        self.assertEqual(other.get(report['file']).status_code, 404)
+        self.assertIn(APIClient().get(report['file']).status_code, (401, 403))
+
+        for unsafe in (None, os.path.join(settings.MEDIA_ROOT, 'uploads')):
+            with override_settings(UPLOAD_TEMP_DIR=unsafe), self.assertRaises(ImproperlyConfigured):
+                uploads.temp_dir()
+
+    def test_short_body_does_not_advance_upload(self):
+        session_id = self.upload()
+        session = UploadSession.objects.get(pk=session_id)
+        with self.assertRaises(ValueError):
+            uploads.write_chunk(session, 0, io.BytesIO(self.content[:100]), 200)
+        session.refresh_from_db()
+        self.assertEqual(session.received, 0)
+        self.assertFalse(os.path.exists(uploads.part_path(session)))
+
+    def test_checksum_mismatch_restarts_upload(self):
+        session_id = self.upload(sha256='0' * 64)
+        self.put(session_id, 0, self.content)
+        response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{session_id}/').data['received'], 0)
+        self.assertFalse(FileBlob.objects.exists())
+
+
+class ReportIngestTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        self.clinic = Institution.objects.create(name="Клініка", type='Клініка')
+        self.user = User.objects.create_user('lab', password='pass', institution=self.clinic)
+        self.cough = Symptom.objects.create(name="Кашель", category='Грип')
+        self.rash = Symptom.objects.create(name="Висип", category='Вітрянка')
+        Patient.objects.create(patient_code='P-001')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='lab.csv'):
+        response = self.client.post('/api/reports/', {'file': SimpleUploadedFile(name, content.encode())})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_csv_rows_become_visits(self):
+        content = (
+            "Patient_Code,Symptoms,Visit_Date\n"
+            "P-001,кашель; Висип,2024-03-04\n"
+            "P-777,Кашель,2024-03-04T15:30:00\n"
+            ",Кашель,2024-03-05\n"
+            "\n"
+            "P-001,Нежить,2024-03-05\n"
+            "P-002,,не дата\n"
+            "P-002,,\n"
+        )
+        self.assertEqual(self.upload(content)['ingest_status'], Report.INGEST_PENDING)
+        report = ingest.run(ingest.claim_next())
+
+        self.assertEqual(report.ingest_status, Report.INGEST_DONE)
+        self.assertEqual((report.ingest_rows, report.ingest_created, report.ingest_failed), (6, 3, 3))
+        self.assertEqual([error['row'] for error in report.ingest_errors], [2, 3, 4])
+        visit = Visit.objects.get(patient__patient_code='P-001')
+        self.assertEqual(set(visit.symptoms.all()), {self.cough, self.rash})
+        self.assertEqual(visit.doctor, self.user)
+        self.assertEqual(rollups.visit_day(visit.visit_date), date(2024, 3, 4))
+        # Нові пацієнти створені й потрапили в пошуковий індекс
+        self.assertIn(Patient.objects.get(patient_code='P-777').id, search_index.search('P-777', 'patient'))
+        cube = set(DailyVisitRollup.objects.values_list('day', 'institution_id', 'category', 'count'))
+        rollups.rebuild()
+        self.assertEqual(set(DailyVisitRollup.objects.values_list('day', 'institution_id', 'category', 'count')), cube)
+
+        # Той самий вміст удруге не імпортується
+        self.upload(content, name='copy.csv')
+        self.assertEqual(ingest.run(ingest.claim_next()).ingest_status, Report.INGEST_DUPLICATE)
+        self.assertEqual(Visit.objects.count(), 3)
+
+    def test_resumes_after_processed_rows(self):
+        data = self.upload("patient,symptom\n" + "".join(f"P-{i:03d},Кашель\n" for i in range(10)))
+        # Воркер упав після двох зафіксованих пакетів по 3 рядки
+        Report.objects.filter(pk=data['id']).update(ingest_rows=6, ingest_created=6)
+        report = ingest.claim_next()
+        with report.file.open('rb') as fileobj:
+            ingest.ReportIngestor(report, batch_size=3).write(ingest.iter_rows(fileobj, '.csv'))
+        report.refresh_from_db()
+        self.assertEqual((report.ingest_rows, report.ingest_created), (10, 10))
+        self.assertEqual(sorted(Visit.objects.values_list('patient__patient_code', flat=True)),
+                         ['P-006', 'P-007', 'P-008', 'P-009'])
+
+
+class MessageSyncTests(TestCase):
+    def setUp(self):
+        membership.invalidate()
+        self.institution = Institution.objects.create(name="Лікарня №4", type='Лікарня')
+        self.user = User.objects.create_user('doctor', password='pass', role='Лікар', institution=self.institution)
+        self.room = ChatRoom.objects.create(name="Вітрянка")
+        self.room.participants.add(self.institution)
+        self.messages = [
+            Message.objects.create(room=self.room, sender=self.user, content=f"Повідомлення {n}") for n in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, **params):
+        response = self.client.get('/api/messages/', dict(params, room=self.room.id))
+        self.assertEqual(response.status_code, 200)
+        return [message['id'] for message in response.data]
+
+    def test_pages_and_incremental_sync(self):
+        ids = [message.id for message in self.messages]
+        # Без курсора — лише останні limit повідомлень, а не вся історія
+        self.assertEqual(self.ids(limit=2), ids[-2:])
+        self.assertEqual(self.ids(before_id=ids[3], limit=2), ids[1:3])
+        self.assertEqual(self.ids(after_id=ids[1]), ids[2:])
+        for limit in (0, -1, 'x'):
+            response = self.client.get('/api/messages/', {'room': self.room.id, 'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_etag_and_long_poll(self):
+        response = self.client.get('/api/messages/', {'room': self.room.id, 'after_id': self.messages[-1].id})
+        self.assertEqual(response.data, [])
+        repeat = self.client.get('/api/messages/', {'room': self.room.id, 'after_id': self.messages[-1].id},
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+        started = time.monotonic()
+        self.assertEqual(self.ids(after_id=self.messages[-1].id, wait=0.2), [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        new = Message.objects.create(room=self.room, sender=self.user, content="Нове")
+        self.assertEqual(self.ids(after_id=self.messages[-1].id, wait=5), [new.id])
+
+
+class ChatConsumerTests(TestCase):
+    def setUp(self):
+        membership.invalidate()
+        self.institution = Institution.objects.create(name="Лікарня №4", type='Лікарня')
+        self.outsider = Institution.objects.create(name="Клініка №2", type='Клініка')
+        self.user = User.objects.create_user('doctor', password='pass', role='Лікар', institution=self.institution)
+        self.room = ChatRoom.objects.create(name="Вітрянка")
+        self.room.participants.add(self.institution)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.room.id}/')
+        communicator.scope['user'] = user
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    def post(self, content):
+        # Розсилка йде з on_commit — у TestCase виконуємо колбеки явно
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(room=self.room, sender=self.user, content=content)
+
+    def test_member_receives_new_messages(self):
+        async def scenario():
+            communicator, connected, _ = await self.connect(self.user)
+            self.assertTrue(connected)
+            message = await database_sync_to_async(self.post)("Новий випадок")
+            received = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return message, received
+
+        message, received = async_to_sync(scenario)()
+        self.assertEqual((received['id'], received['content']), (message.id, "Новий випадок"))
+
+    def test_non_member_is_rejected(self):
+        stranger = User.objects.create_user('stranger', password='pass', institution=self.outsider)
+
+        async def scenario():
+            results = []
+            for user in (stranger, AnonymousUser()):
+                communicator, connected, code = await self.connect(user)
+                results.append((connected, code))
+            return results
+
+        self.assertEqual(async_to_sync(scenario)(), [(False, consumers.CLOSE_FORBIDDEN)] * 2)
+
+    def test_asgi_application_serves_websocket_only(self):
+        from monitoring_system.asgi import application
+
+        client = Client()
+        client.force_login(self.user)
+        headers = [
+            (b'origin', b'http://localhost'),
+            (b'cookie', f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'.encode()),
+        ]
+
+        async def scenario():
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{self.room.id}/', headers=headers)
+            connected, _ = await communicator.connect()
+            message = await database_sync_to_async(self.post)("Через ASGI")
+            received = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return connected, message, received
+
+        connected, message, received = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual(received['id'], message.id)
+        # HTTP лишається на WSGI: під ASGI потокові відповіді Django 4.2 буферизуються в пам'яті
+        self.assertNotIn('daphne', settings.INSTALLED_APPS)
+        with self.assertRaises(ValueError):
+            async_to_sync(application)({'type': 'http', 'path': '/api/visits/export/'}, None, None)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.kyiv = Institution.objects.create(name="Лікарня Київська", type='Лікарня')
+        self.lviv = Institution.objects.create(name="Клініка Львівська", type='Клініка')
+        self.exact = Institution.objects.create(name="Лікарня", type='Лікарня')
+        self.user = User.objects.create_user('analyst', password='pass', role='Аналітик')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ranking_typos_and_prefixes(self):
+        # Точний збіг — першим, далі збіг префікса; запит з опискою "ликарня" знаходить ті самі записи
+        self.assertEqual(search_index.search("лікарня", 'institution')[:2], [self.exact.id, self.kyiv.id])
+        self.assertEqual(set(search_index.search("ликарня", 'institution')), {self.exact.id, self.kyiv.id})
+        self.assertEqual(search_index.search("клін льв", 'institution'), [self.lviv.id])
+        response = self.client.get('/api/search/', {'q': 'Львівськ'})
+        self.assertEqual([row['id'] for row in response.data['institutions']], [self.lviv.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.lviv.name = "Клініка Одеська"
+        self.lviv.save()
+        self.assertEqual(search_index.search("одеська", 'institution'), [self.lviv.id])
+        self.assertEqual(search_index.search("львів", 'institution'), [])
+        self.lviv.delete()
+        self.assertEqual(search_index.search("одеська", 'institution'), [])
+        # Повторна синхронізація без змін тексту нічого не пише
+        with self.assertNumQueries(1):
+            search_index.sync('institution', self.kyiv)
+
+    def test_frequency_cache_expires(self):
+        value = search_index.gram_hash(' од')
+        self.assertEqual(search_index._frequencies('institution', {value})[value], 0)
+        Institution.objects.create(name="Одеса", type='Лікарня')
+        self.assertEqual(search_index._frequencies('institution', {value})[value], 0)
+        search_index._frequency_expires[0] = 0
+        self.assertEqual(search_index._frequencies('institution', {value})[value], 1)
+
+
+class RoomMembershipCacheTests(TestCase):
+    def setUp(self):
+        # Кеш живе на рівні процесу, а ID після відкату транзакції тесту можуть повторюватись
+        membership.invalidate()
+        self.institution = Institution.objects.create(name="Лікарня №2", type='Лікарня')
+        self.user = User.objects.create_user('doctor', password='pass', role='Лікар', institution=self.institution)
+        self.room = ChatRoom.objects.create(name="Грип")
+        self.room.participants.add(self.institution)
+        Message.objects.create(room=self.room, sender=self.user, content="Привіт")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_checks_do_not_query_membership(self):
+        self.client.get('/api/messages/', {'room': self.room.id})
+        # Лише запит повідомлень: членство і його версія беруться з пам'яті
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/messages/', {'room': self.room.id})
+        self.assertEqual(len(response.data), 1)
+
+    def test_revocation_takes_effect_immediately(self):
+        self.assertEqual(len(self.client.get('/api/messages/', {'room': self.room.id}).data), 1)
+
+        self.room.participants.remove(self.institution)
+        self.assertEqual(self.client.get('/api/messages/', {'room': self.room.id}).data, [])
+        response = self.client.post('/api/messages/', {'room': self.room.id, 'content': "Ще тут?"})
+        self.assertEqual(response.status_code, 403)
+
+        self.institution.chatroom_set.add(self.room)
+        response = self.client.post('/api/messages/', {'room': self.room.id, 'content': "Повернулись"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_revocation_in_another_process_takes_effect(self):
+        self.assertEqual(len(self.client.get('/api/messages/', {'room': self.room.id}).data), 1)
+
+        # Інший процес: зв'язок видалено, кеш цього процесу не скидався, після коміту зросла версія в БД
+        ChatRoom.participants.through.objects.filter(chatroom=self.room).delete()
+        data_version._increment(membership.VERSION_NAME)
+        # Записи кешу позначені старою версією і відкидаються, щойно минув інтервал звірки
+        self.assertEqual(len(self.client.get('/api/messages/', {'room': self.room.id}).data), 1)
+        membership._version.expire()
+
+        self.assertEqual(self.client.get('/api/messages/', {'room': self.room.id}).data, [])
+        response = self.client.post('/api/messages/', {'room': self.room.id, 'content': "Ще тут?"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalidation_bumps_shared_version_on_commit(self):
+        version = data_version.current(membership.VERSION_NAME)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.participants.remove(self.institution)
+        self.assertEqual(data_version.current(membership.VERSION_NAME), version + 1)
+
+
+class ReferenceDataCacheTests(TestCase):
+    def setUp(self):
+        reference.invalidate()
+        self.institution = Institution.objects.create(name="Лікарня №3", type='Лікарня')
+        self.user = User.objects.create_user('doctor', password='pass', role='Лікар', institution=self.institution)
+        self.patient = Patient.objects.create(patient_code='P-001')
+        self.fever = Symptom.objects.create(name="Температура", category='Грип')
+        self.client = APIClient()
+
+    def test_lists_are_served_from_memory_until_changed(self):
+        self.client.get('/api/symptoms/')
+        self.client.get('/api/institutions/')
+        # Довідники й версія кешу — з пам'яті, без запитів до БД
+        with self.assertNumQueries(0):
+            self.assertEqual([row['name'] for row in self.client.get('/api/symptoms/').data], ["Температура"])
+            self.assertEqual(self.client.get(f'/api/institutions/{self.institution.id}/').data['name'], "Лікарня №3")
+        self.assertEqual(self.client.get('/api/symptoms/999999/').status_code, 404)
+
+        Symptom.objects.create(name="Висип", category='Вітрянка')
+        self.assertEqual([row['name'] for row in self.client.get('/api/symptoms/').data], ["Температура", "Висип"])
+
+    def test_change_in_another_process_is_picked_up(self):
+        self.assertEqual(self.client.get(f'/api/symptoms/{self.fever.id}/').data['category'], 'Грип')
+        # Інший процес: update() без сигналів, після коміту зросла версія в БД
+        Symptom.objects.filter(pk=self.fever.pk).update(category='Вітрянка')
+        data_version._increment(reference.VERSION_NAME)
+        reference._version.expire()
+        self.assertEqual(self.client.get(f'/api/symptoms/{self.fever.id}/').data['category'], 'Вітрянка')
+
+    def test_visit_symptoms_are_validated_against_cache(self):
+        self.client.force_authenticate(self.user)
+        symptoms = [self.fever.id] + [Symptom.objects.create(name=f"Симптом {n}", category='Грип').id
+                                      for n in range(9)]
+        serializer = VisitSerializer(data={'patient': self.patient.id, 'symptoms': symptoms})
+        reference.by_id(Symptom)
+        # Лише пацієнт: десять ID симптомів перевіряються за кешем без жодного запиту
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        response = self.client.post('/api/visits/', {'patient': self.patient.id, 'symptoms': [self.fever.id]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Visit.objects.get().symptoms.get(), self.fever)
+
+        fever_id = self.fever.id
+        self.fever.delete()
+        response = self.client.post('/api/visits/', {'patient': self.patient.id, 'symptoms': [fever_id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/visits/', {'patient': self.patient.id, 'symptoms': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        metrics._flag['enabled'] = None
+        self.addCleanup(metrics.registry.reset)
+        self.addCleanup(metrics._flag.update, enabled=None)
+        self.addCleanup(cache.delete, metrics.ENABLED_KEY)
+        self.admin = User.objects.create_user('admin', password='pass', role='Адмін', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def exposition(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_requests_are_counted_per_view(self):
+        self.client.get('/api/visits/')
+        self.client.get('/api/visits/')
+        lines = self.exposition()
+        self.assertIn('api_metrics_enabled 1', lines)
+        self.assertIn('http_request_duration_seconds_count{view="VisitViewSet.list",method="GET"} 2', lines)
+        self.assertIn('http_request_sql_queries_count{view="VisitViewSet.list",method="GET"} 2', lines)
+        self.assertIn('http_responses_total{view="VisitViewSet.list",method="GET",status="200"} 2', lines)
+
+    def test_switch_and_permissions(self):
+        response = self.client.post('/api/metrics/', {'enabled': False, 'reset': True}, format='json')
+        self.assertEqual(response.data, {'enabled': False})
+        self.client.get('/api/visits/')
+        lines = self.exposition()
+        self.assertIn('api_metrics_enabled 0', lines)
+        self.assertFalse([line for line in lines if 'VisitViewSet' in line])
+
+        anonymous = APIClient()
+        self.assertIn(anonymous.get('/api/metrics/').status_code, (401, 403))
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(anonymous.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            scraper = anonymous.post('/api/metrics/', {'enabled': True}, HTTP_AUTHORIZATION='Bearer secret')
+            self.assertIn(scraper.status_code, (401, 403))
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_keep_slowest_sql(self):
+        with self.assertLogs('api.metrics', 'WARNING'):
+            self.client.get('/api/visits/', {'page_size': 5})
+            slow = self.client.get('/api/metrics/slow/').data
+        self.assertEqual(slow[0]['view'], 'VisitViewSet.list')
+        self.assertEqual(slow[0]['sql_queries'], len(slow[0]['slowest_sql']))
+        self.assertIn('api_visit', slow[0]['slowest_sql'][0]['sql'])
+
+
+class SyntheticDataTests(TestCase):
+    OPTIONS = {'seed': 7, 'institutions': 3, 'doctors_per_institution': 2, 'patients': 40, 'visits': 400,
+               'start': '2024-01-01', 'days': 60, 'outbreaks': 2, 'chat_rooms': 2, 'messages': 30, 'batch_size': 50}
+
+    def test_intensity_is_seeded_and_scaled(self):
+        config = synthetic.load_config(**self.OPTIONS)
+        rate, categories = synthetic.intensity(config, np.random.default_rng(config['seed']), 3)
+        again, _ = synthetic.intensity(config, np.random.default_rng(config['seed']), 3)
+        self.assertEqual(rate.shape, (60, 3, len(categories)))
+        self.assertAlmostEqual(rate.sum(), 400)
+        np.testing.assert_array_equal(rate, again)
+
+    def test_command_generates_consistent_data(self):
+        output = io.StringIO()
+        call_command('generate_synthetic_data', stdout=output, **self.OPTIONS)
+        self.assertIn("Готово", output.getvalue())
+        visits = Visit.objects.count()
+        self.assertEqual((Institution.objects.count(), User.objects.count(), Patient.objects.count()), (3, 6, 40))
+        self.assertAlmostEqual(visits, 400, delta=100)
+
+        # Лікар візиту працює в закладі візиту, симптоми візиту — з однієї категорії
+        self.assertFalse(Visit.objects.exclude(doctor__institution=F('institution')).exists())
+        categories = {}
+        for visit_id, category in Visit.symptoms.through.objects.values_list('visit_id', 'symptom__category'):
+            categories.setdefault(visit_id, set()).add(category)
+        self.assertEqual(len(categories), visits)
+        self.assertTrue(all(len(found) == 1 for found in categories.values()))
+        # Агрегати й пошуковий індекс перебудовано після вставок в обхід ORM
+        totals = DailyVisitRollup.objects.filter(category=rollups.TOTAL).aggregate(total=Sum('count'))['total']
+        self.assertEqual(totals, visits)
+        patient = Patient.objects.order_by('id').last()
+        self.assertEqual(search_index.search(patient.patient_code, 'patient')[0], patient.id)
+
+        for message in Message.objects.select_related('sender', 'room'):
+            self.assertTrue(message.room.participants.filter(id=message.sender.institution_id).exists())
+
+    def test_command_rejects_empty_dimensions(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', institutions=0, stdout=io.StringIO())
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_every_route_has_a_benchmark_case(self):
+        self.assertEqual(benchmarks.uncovered_routes(), [])
+
+    def test_compare_flags_slowdown_and_extra_queries(self):
+        baseline = {'calibration_ms': 50, 'cases': {
+            'statistics': {'p50_ms': 10.0, 'queries': 2},
+            'search:patient': {'p50_ms': 40.0, 'queries': 30},
+            'api-root': {'p50_ms': 0.5, 'queries': 0},
+        }}
+        current = {'calibration_ms': 50, 'cases': {
+            'statistics': {'p50_ms': 20.5, 'queries': 2},
+            'search:patient': {'p50_ms': 45.0, 'queries': 31},
+            # Утричі повільніше, але на частки мілісекунди — шум
+            'api-root': {'p50_ms': 1.5, 'queries': 0},
+        }}
+        regressions = benchmarks.compare(current, baseline)
+        self.assertEqual(
+            sorted((item['case'], item['metric']) for item in regressions),
+            [('search:patient', 'queries'), ('statistics', 'p50_ms')],
+        )
+
+    def test_all_cases_succeed_on_small_dataset(self):
+        seed = benchmarks.seed_config('10k', visits=300, patients=50, institutions=3, doctors_per_institution=2,
+                                      days=120, chat_rooms=2, messages=40, outbreaks=1)
+        synthetic.SyntheticDataGenerator(synthetic.load_config(**seed), log=lambda message: None).run()
+        use_temp_media(self)
+        with override_settings(REPORT_RENDER_WORKERS=1):
+            suite = benchmarks.Suite('10k', seed=seed, repeat=1, warmup=0)
+            result = suite.run(log=lambda message: None)
+        failed = {name: case['status'] for name, case in result['cases'].items() if not case['ok']}
+        self.assertEqual(failed, {})
@@ -0,0 +1,167 @@
+# api/timeseries.py
+"""
+Часові ряди візитів з довільним зрізом: гранулярність (день/тиждень/місяць),
+період, заклади, тип закладу, категорії, симптоми й групування.
+
+Запит, який можна відповісти з денного куба DailyVisitRollup, читає лише його:
+час не залежить від кількості візитів. Фільтр за окремими симптомами і фільтр
+за кількома категоріями без групування за категорією куб не виражає (візит
+з кількома категоріями порахувався б кілька разів) — такі запити рахуються
+SQL-агрегацією по Visit плюс рядками архівів (api/archive.py).
+
+Ряд — це візити (distinct): візит з симптомами двох категорій при групуванні
+за категорією потрапляє в обидві групи, як і в кубі.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db.models import Count, DateField, Exists, OuterRef, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from . import archive, exports, rollups
+from .models import DailyVisitRollup, Institution, Visit
+
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('institution', 'institution_type', 'category')
+
+TRUNC = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+# Поля вимірів у кубі та в таблиці візитів
+ROLLUP_FIELDS = {'institution': 'institution_id', 'institution_type': 'institution__type', 'category': 'category'}
+VISIT_FIELDS = {
+    'institution': 'institution_id', 'institution_type': 'institution__type', 'category': 'symptoms__category',
+}
+
+
+def period_start(day, granularity):
+    """Початок періоду, в який потрапляє день (тиждень починається з понеділка, як у TruncWeek)."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def uses_rollups(categories=(), symptoms=(), group_by=()):
+    return not symptoms and (len(categories) <= 1 or 'category' in group_by)
+
+
+def _from_rollups(granularity, date_from, date_to, institutions, institution_types, categories, group_by):
+    cube = DailyVisitRollup.objects.all()
+    if date_from:
+        cube = cube.filter(day__gte=date_from)
+    if date_to:
+        cube = cube.filter(day__lte=date_to)
+    if institutions:
+        cube = cube.filter(institution_id__in=institutions)
+    if institution_types:
+        cube = cube.filter(institution__type__in=institution_types)
+    if categories:
+        cube = cube.filter(category__in=categories)
+    elif 'category' in group_by:
+        cube = cube.exclude(category=rollups.TOTAL)
+    else:
+        cube = cube.filter(category=rollups.TOTAL)
+    fields = [ROLLUP_FIELDS[dimension] for dimension in group_by]
+    # Куб уже денний: тижні й місяці складаємо в Python, без функцій усічення в БД
+    rows = cube.values_list('day', *fields).annotate(n=Sum('count')).order_by()
+    counts = Counter()
+    for day, *group, n in rows:
+        if n:
+            counts[(period_start(day, granularity), *group)] += n
+    return counts
+
+
+def _from_visits(granularity, date_from, date_to, institutions, institution_types, categories, symptoms, group_by):
+    visits = exports.filter_visits(Visit.objects.all(), date_from, date_to)
+    if institutions:
+        visits = visits.filter(institution_id__in=institutions)
+    if institution_types:
+        visits = visits.filter(institution__type__in=institution_types)
+    links = Visit.symptoms.through.objects.filter(visit_id=OuterRef('pk'))
+    if symptoms:
+        visits = visits.filter(Exists(links.filter(symptom_id__in=symptoms)))
+    if 'category' in group_by:
+        # Групи — категорії симптомів візиту (з урахуванням фільтра категорій)
+        visits = visits.filter(symptoms__category__in=categories) if categories else visits.filter(
+            symptoms__isnull=False
+        )
+    elif categories:
+        visits = visits.filter(Exists(links.filter(symptom__category__in=categories)))
+    fields = [VISIT_FIELDS[dimension] for dimension in group_by]
+    rows = (
+        visits.annotate(period=TRUNC[granularity]('visit_date', output_field=DateField()))
+        .values_list('period', *fields)
+        .annotate(n=Count('id', distinct=True))
+        .order_by()
+    )
+    counts = Counter({tuple(row[:-1]): row[-1] for row in rows})
+    counts.update(_from_archives(granularity, date_from, date_to, institutions, institution_types,
+                                 categories, symptoms, group_by))
+    return counts
+
+
+def _from_archives(granularity, date_from, date_to, institutions, institution_types, categories, symptoms, group_by):
+    counts = Counter()
+    types = None
+    if institution_types or 'institution_type' in group_by:
+        types = dict(Institution.objects.values_list('id', 'type'))
+    symptoms = set(symptoms)
+    for row in archive.read_archives(date_from, date_to):
+        day = rollups.visit_day(datetime.fromisoformat(row['visit_date']))
+        if date_from and day < date_from or date_to and day > date_to:
+            continue
+        if institutions and row['institution_id'] not in institutions:
+            continue
+        if institution_types and types.get(row['institution_id']) not in institution_types:
+            continue
+        if symptoms and symptoms.isdisjoint(row['symptoms']):
+            continue
+        row_categories = [category for category in row['categories'] if not categories or category in categories]
+        if categories and not row_categories:
+            continue
+        values = {
+            'institution': [row['institution_id']],
+            'institution_type': [types.get(row['institution_id']) if types else None],
+            'category': row_categories,
+        }
+        keys = [(period_start(day, granularity),)]
+        for dimension in group_by:
+            keys = [key + (value,) for key in keys for value in values[dimension]]
+        counts.update(keys)
+    return counts
+
+
+def query(granularity='day', date_from=None, date_to=None, institutions=(), institution_types=(),
+          categories=(), symptoms=(), group_by=()):
+    """
+    Повертає {'granularity', 'group_by', 'source', 'series'}, де series — список
+    {'group': {вимір: значення}, 'points': [{'period': 'YYYY-MM-DD', 'count': n}]}
+    у порядку груп; точки — лише непорожні періоди за зростанням.
+    source: 'rollup' (денний куб) або 'visits' (SQL по візитах і архівах).
+    """
+    if uses_rollups(categories, symptoms, group_by):
+        source = 'rollup'
+        counts = _from_rollups(granularity, date_from, date_to, institutions, institution_types,
+                               categories, group_by)
+    else:
+        source = 'visits'
+        counts = _from_visits(granularity, date_from, date_to, institutions, institution_types,
+                              categories, symptoms, group_by)
+
+    series = {}
+    ordered = sorted(counts.items(), key=lambda item: (tuple((v is None, v) for v in item[0][1:]), item[0][0]))
+    for (period, *group), n in ordered:
+        if isinstance(period, datetime):
+            period = period.date()
+        points = series.setdefault(tuple(group), [])
+        points.append({'period': period.isoformat(), 'count': n})
+    return {
+        'granularity': granularity,
+        'group_by': list(group_by),
+        'source': source,
+        'series': [
+            {'group': dict(zip(group_by, group)), 'points': points}
+            for group, points in series.items()
+        ],
+    }
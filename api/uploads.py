@@ -0,0 +1,239 @@
+# api/uploads.py
+"""
+Докачувані завантаження файлів звітів частинами і зберігання вмісту за контрольною сумою.
+
+Протокол: створення сесії (ім'я, розмір, необов'язково sha256) → PUT частин за
+зсувом (кожна частина дописується в тимчасовий файл) → фіналізація. Якщо клієнт
+одразу вказав sha256 вмісту, який він сам уже завантажував, завантаження не
+потрібне — звіт створюється з наявного FileBlob. Чужий вміст за самою лише сумою
+не видається: знання хешу не доводить володіння файлом, тож такий клієнт
+завантажує файл повністю, а спільний blob знаходиться за сумою, порахованою сервером.
+
+Тіло частини читається блоками по READ_BLOCK байт і одразу пишеться на диск, тож
+пам'ять на завантаження не залежить від розміру файлу. Повільний клієнт не тримає
+блокування сесії: частина спершу повністю читається в окремий тимчасовий файл,
+а select_for_update береться лише на дописування її до файлу завантаження й
+зсув лічильника. Контрольна сума рахується інкрементально під час дописування;
+стан хешу тримається в пам'яті процесу, і якщо частини прийшли в інший процес
+(або процес перезапустився), сума дораховується читанням тимчасового файлу при
+фіналізації.
+
+Тимчасові файли лежать в UPLOAD_TEMP_DIR, а вміст — у приватному сховищі
+(api/storage.py) як FileBlob (blobs/<2 символи суми>/<sha256><розширення>):
+обидва поза публічним MEDIA_ROOT, файл звіту віддається лише його власнику
+(/api/reports/<id>/download/). Однакові файли — один blob, на який посилаються всі звіти.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import ingest
+from .models import FileBlob, Report, UploadSession
+from .storage import private_dir
+
+READ_BLOCK = 1 << 16
+# Скільки незавершених хешів тримати в пам'яті процесу (решта дораховується при фіналізації)
+MAX_HASHERS = 1024
+
+_lock = threading.Lock()
+_hashers = OrderedDict()
+
+
+class OffsetMismatch(ValueError):
+    """Частина надіслана не з того зсуву; offset — скільки байтів сервер уже має."""
+
+    def __init__(self, offset):
+        super().__init__(f"Очікується частина зі зсуву {offset}.")
+        self.offset = offset
+
+
+def temp_dir():
+    # Каталог обов'язковий і не може бути в MEDIA_ROOT: незавершені файли за ID сесії були б публічними
+    return private_dir(getattr(settings, 'UPLOAD_TEMP_DIR', None), 'UPLOAD_TEMP_DIR')
+
+
+def part_path(session):
+    return os.path.join(temp_dir(), f'{session.pk}.part')
+
+
+def hash_file(fileobj):
+    """(sha256, розмір) вмісту файлу, прочитаного блоками з поточної позиції."""
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: fileobj.read(READ_BLOCK), b''):
+        digest.update(block)
+        size += len(block)
+    return digest.hexdigest(), size
+
+
+def find_blob(sha256, user=None):
+    """FileBlob із такою сумою; з user — лише серед вмісту, який цей користувач уже завантажував."""
+    blobs = FileBlob.objects.filter(sha256=sha256)
+    if user is not None:
+        blobs = blobs.filter(reports__user=user).distinct()
+    return blobs.first()
+
+
+def store_blob(fileobj, sha256, size, name=''):
+    """FileBlob із вмістом fileobj; якщо такий вміст уже збережено — наявний blob (файл не пишеться)."""
+    blob = find_blob(sha256)
+    if blob is not None:
+        return blob
+    extension = os.path.splitext(name)[1].lower()[:16]
+    blob = FileBlob(sha256=sha256, size=size)
+    blob.file.save(f'{sha256[:2]}/{sha256}{extension}', File(fileobj), save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # Той самий вміст паралельно зберіг інший запит
+        blob.file.storage.delete(blob.file.name)
+        return FileBlob.objects.get(sha256=sha256)
+    return blob
+
+
+def create_report(user, blob, name):
+    # Табличні звіти стають у чергу імпорту у візити (api/ingest.py)
+    return Report.objects.create(user=user, blob=blob, file=blob.file.name, name=name,
+                                 ingest_status=ingest.initial_status(name))
+
+
+def start(user, name, size, sha256=''):
+    """
+    Починає завантаження. Повертає (сесія, None) або (None, звіт), якщо користувач
+    уже завантажував вміст із заявленою sha256 і передавати його знову не потрібно.
+    """
+    if sha256:
+        blob = find_blob(sha256, user)
+        if blob is not None and blob.size == size:
+            return None, create_report(user, blob, name)
+    return UploadSession.objects.create(user=user, name=name, size=size, sha256=sha256), None
+
+
+def _take_hasher(session_id, offset):
+    """Хеш, що покриває рівно перші offset байтів, або None (тоді сума дорахується з файлу)."""
+    with _lock:
+        entry = _hashers.pop(session_id, None)
+    if entry is not None and entry[0] == offset:
+        return entry[1]
+    return hashlib.sha256() if offset == 0 else None
+
+
+def _keep_hasher(session_id, offset, hasher):
+    if hasher is None:
+        return
+    with _lock:
+        _hashers[session_id] = (offset, hasher)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _copy(source, target, length, hasher=None):
+    """Копіює до length байтів блоками; повертає кількість скопійованих."""
+    copied = 0
+    while copied < length:
+        block = source.read(min(READ_BLOCK, length - copied))
+        if not block:
+            break
+        target.write(block)
+        if hasher is not None:
+            hasher.update(block)
+        copied += len(block)
+    return copied
+
+
+def _check_chunk(session, offset, length):
+    if session.status != UploadSession.ACTIVE:
+        raise ValueError("Завантаження вже завершено.")
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise ValueError("Частина виходить за заявлений розмір файлу.")
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Дописує length байтів зі stream з позиції offset. Частини приймаються лише
+    послідовно (offset == session.received), інакше — OffsetMismatch з актуальним зсувом.
+    """
+    # Швидка перевірка до читання тіла; остаточна — під блокуванням
+    _check_chunk(session, offset, length)
+    os.makedirs(temp_dir(), exist_ok=True)
+    with tempfile.TemporaryFile(dir=temp_dir()) as chunk:
+        if _copy(stream, chunk, length) != length:
+            raise ValueError("Тіло частини коротше за Content-Length.")
+        chunk.seek(0)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            _check_chunk(session, offset, length)
+            path = part_path(session)
+            hasher = _take_hasher(session.pk, offset)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+                part.seek(offset)
+                _copy(chunk, part, length, hasher)
+                # Хвіст від обірваної раніше спроби відкидається
+                part.truncate()
+            session.received = offset + length
+            session.save(update_fields=['received', 'updated_at'])
+    _keep_hasher(session.pk, session.received, hasher)
+    return session
+
+
+def finalize(session):
+    """
+    Перевіряє суму, зберігає вміст як FileBlob (або знаходить наявний) і створює звіт.
+    Повторна фіналізація завершеної сесії повертає той самий звіт.
+    """
+    path = part_path(session)
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == UploadSession.COMPLETE:
+            return session
+        if session.received != session.size:
+            raise ValueError(f"Отримано {session.received} з {session.size} байт.")
+        hasher = _take_hasher(session.pk, session.size)
+        with open(path, 'rb') as part:
+            if hasher is not None:
+                sha256 = hasher.hexdigest()
+            else:
+                sha256, _ = hash_file(part)
+                part.seek(0)
+            if session.sha256 and sha256 != session.sha256:
+                # Пошкоджений вміст: завантаження починається спочатку
+                session.received = 0
+                session.save(update_fields=['received', 'updated_at'])
+                mismatch = True
+            else:
+                blob = store_blob(part, sha256, session.size, session.name)
+                session.report = create_report(session.user, blob, session.name)
+                session.status = UploadSession.COMPLETE
+                session.save(update_fields=['report', 'status', 'updated_at'])
+                mismatch = False
+    os.remove(path)
+    if mismatch:
+        raise ValueError("Контрольна сума не збігається із заявленою — завантажте файл повторно.")
+    return session
+
+
+def expire_sessions(older_than_hours=None):
+    """Видаляє незавершені сесії без активності довше за горизонт разом із тимчасовими файлами."""
+    if older_than_hours is None:
+        older_than_hours = settings.UPLOAD_SESSION_TTL_HOURS
+    cutoff = timezone.now() - timedelta(hours=older_than_hours)
+    stale = list(UploadSession.objects.filter(status=UploadSession.ACTIVE, updated_at__lt=cutoff))
+    for session in stale:
+        if os.path.exists(part_path(session)):
+            os.remove(part_path(session))
+        with _lock:
+            _hashers.pop(session.pk, None)
+    UploadSession.objects.filter(pk__in=[session.pk for session in stale]).delete()
+    return len(stale)
@@ -14,6 +14,9 @@ router.register(r'symptoms', views.SymptomViewSet, basename='symptom')
 router.register(r'chatrooms', views.ChatRoomViewSet, basename='chatroom')
 router.register(r'messages', views.MessageViewSet, basename='message')
 router.register(r'reports', views.ReportViewSet, basename='report') # Для завантаження файлів
+router.register(r'uploads', views.UploadSessionViewSet, basename='upload')
+router.register(r'report-jobs', views.ReportJobViewSet, basename='report-job')
+router.register(r'alerts', views.OutbreakAlertViewSet, basename='outbreak-alert')
 
 # --- 2. Головний список URL-адрес ---
 urlpatterns = [
@@ -28,8 +31,17 @@ urlpatterns = [
     # --- Спеціальні URL-и ---
     # (Для ваших кастомних APIView)
     path('statistics/', views.StatisticsView.as_view(), name='statistics'),
+    path('statistics/timeseries/', views.TimeSeriesView.as_view(), name='statistics-timeseries'),
+    path('rt/', views.RtView.as_view(), name='rt'),
     path('sir_modeling/', views.SIRModelingView.as_view(), name='sir_modeling'),
+    path('sir_modeling/sweep/', views.SIRSweepView.as_view(), name='sir_modeling-sweep'),
+    path('sir_modeling/cache/', views.SIRCacheStatsView.as_view(), name='sir_modeling-cache'),
+    path('sir_modeling/fit/', views.SIRFitView.as_view(), name='sir_modeling-fit'),
+    path('sir_modeling/stochastic/', views.SIRStochasticView.as_view(), name='sir_modeling-stochastic'),
     path('quick-report/', views.QuickReportView.as_view(), name='quick-report'), # Для PDF-звіту
+    path('period-report/', views.PeriodReportView.as_view(), name='period-report'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('metrics/slow/', views.SlowRequestsView.as_view(), name='metrics-slow'),
     path('search/', views.SearchView.as_view(), name='search'),
     
     
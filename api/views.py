@@ -1,15 +1,20 @@
 # api/views.py
 
+import hashlib
+import math
+import os
+from datetime import date, timedelta
+
 # --- Імпорти Django ---
-from django.db.models import Count
-from django.db.models import Q
-from django.db.models.functions import TruncDay
-from django.http import HttpResponse  # <-- ДОДАЙТЕ ЦЕЙ ІМПОРТ
+from django.db.models import Sum
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse  # <-- ДОДАЙТЕ ЦЕЙ ІМПОРТ
 from django.contrib.auth import get_user_model
+from django.conf import settings
 
 # --- Імпорти Rest Framework ---
 # api/views.py
-from rest_framework import viewsets, serializers, permissions, parsers
+from rest_framework import mixins, viewsets, serializers, permissions, parsers, status
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -22,35 +27,44 @@ from dj_rest_auth.registration.views import RegisterView as RestAuthRegisterView
 
 # --- Імпорти сторонніх бібліотек ---
 import numpy as np
-# --- ДОДАЙТЕ ІМПОРТИ ДЛЯ PDF ---
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
 
 # --- Локальні імпорти (моделі та серіалізатори) ---
 from .models import (
-    Institution, Visit, Symptom, ChatRoom, Message, Patient, Report
+    Institution, Visit, Symptom, ChatRoom, Message, Patient, Report,
+    DailyVisitRollup, ReportJob, OutbreakAlert, UploadSession
 )
 from .serializers import (
     InstitutionSerializer, VisitSerializer, SymptomSerializer,
     ChatRoomSerializer, MessageSerializer, PatientSerializer,
-    ReportSerializer, UserDetailSerializer
+    ReportSerializer, UserDetailSerializer, ReportJobSerializer, OutbreakAlertSerializer,
+    UploadSessionSerializer,
 )
-
-# --- ДОДАЙТЕ РЕЄСТРАЦІЮ ШРИФТУ ---
-# (Це потрібно для кирилиці у PDF)
-try:
-    pdfmetrics.registerFont(TTFont('FreeSans', '/usr/share/fonts/truetype/freefont/FreeSans.ttf'))
-except IOError:
-    # Це може бути інший шлях у вашому Docker-контейнері
-    print("ПОПЕРЕДЖЖЕННЯ: Шрифт FreeSans не знайдено. PDF може мати проблеми з кирилицею.")
+from . import (
+    archive, calibration, chat_sync, data_version, epidemic, exports, ingest, membership, metrics, period_report, reference,
+    reports, rollups, rt, search_index, stochastic, timeseries, uploads,
+)
+from .bulk import VisitBulkWriter, iter_ndjson
+from .pagination import VisitKeysetPagination
+from .sir_cache import result_cache
 
 
 # --- ViewSets для простого отримання даних (GET) ---
 
-class InstitutionViewSet(viewsets.ReadOnlyModelViewSet):
+class ReferenceDataMixin:
+    """Список і деталі довідника з кешу процесу (api/reference.py): лише звірка версії замість вибірки."""
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_serializer(reference.objects(self.queryset.model), many=True).data)
+
+    def get_object(self):
+        obj = reference.get(self.queryset.model, self.kwargs['pk'])
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class InstitutionViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Institution.objects.all()
     serializer_class = InstitutionSerializer
     permission_classes = [AllowAny]
@@ -63,16 +77,32 @@ class PatientViewSet(viewsets.ReadOnlyModelViewSet):
 class VisitViewSet(viewsets.ModelViewSet):
     serializer_class = VisitSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = VisitKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
+        # Серіалізатор читає заклад, лікаря, пацієнта й симптоми кожного візиту —
+        # підтягуємо їх наперед, щоб сторінка коштувала сталу кількість запитів
+        visits = (
+            Visit.objects
+            .select_related('institution', 'doctor', 'patient')
+            .prefetch_related('symptoms')
+            .order_by('-visit_date', '-id')
+        )
         if user.is_authenticated:
             if hasattr(user, 'role') and user.role in ['Аналітик', 'Адмін']:
-                return Visit.objects.all().order_by('-visit_date')
+                return visits
             elif hasattr(user, 'institution') and user.institution:
-                return Visit.objects.filter(institution=user.institution).order_by('-visit_date')
+                return visits.filter(institution=user.institution)
         return Visit.objects.none()
 
+    def visible_institution_id(self):
+        """ID закладу, яким обмежена видимість візитів (None — усі заклади, 0 — жоден)."""
+        user = self.request.user
+        if getattr(user, 'role', None) in ['Аналітик', 'Адмін']:
+            return None
+        return getattr(user, 'institution_id', None) or 0
+
     def perform_create(self, serializer):
         if hasattr(self.request.user, 'institution') and self.request.user.institution:
             serializer.save(
@@ -82,7 +112,66 @@ class VisitViewSet(viewsets.ModelViewSet):
         else:
             raise serializers.ValidationError("Користувач не прив'язаний до закладу.")
 
-class SymptomViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Пакетне створення візитів: JSON-масив або NDJSON (application/x-ndjson)
+        об'єктів {"patient": id, "symptoms": [id, ...], "visit_date": ISO-дата?}
+        (без visit_date — час запиту). Некоректні рядки пропускаються й повертаються
+        у списку errors.
+        """
+        institution = getattr(request.user, 'institution', None)
+        if not institution:
+            raise serializers.ValidationError("Користувач не прив'язаний до закладу.")
+
+        if 'ndjson' in (request.content_type or ''):
+            # Без Content-Length (chunked) тіло недоступне — це помилка клієнта, а не порожній пакет
+            if request.stream is None:
+                raise serializers.ValidationError("Порожнє тіло запиту: надішліть NDJSON із заголовком Content-Length.")
+            rows = iter_ndjson(request.stream)
+        else:
+            rows = request.data
+            if not isinstance(rows, list):
+                raise serializers.ValidationError("Очікується JSON-масив візитів або NDJSON.")
+
+        summary = VisitBulkWriter(doctor=request.user, institution=institution).write(rows)
+        status_code = status.HTTP_201_CREATED if summary['created'] else status.HTTP_400_BAD_REQUEST
+        if not summary['created'] and not summary['failed']:
+            status_code = status.HTTP_200_OK
+        return Response(summary, status=status_code)
+
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        renderer_classes=[exports.CSVExportRenderer, exports.NDJSONExportRenderer],
+    )
+    def export(self, request, *args, **kwargs):
+        """
+        Потоковий експорт візитів (?format=csv або ?format=ndjson) з фільтрами
+        date_from, date_to (YYYY-MM-DD), institution і category. Видимість — як у списку.
+        Архівовані місяці (api/archive.py) читаються з файлів архіву.
+        """
+        params = request.query_params
+        try:
+            date_from = date.fromisoformat(params['date_from']) if params.get('date_from') else None
+            date_to = date.fromisoformat(params['date_to']) if params.get('date_to') else None
+            institution_id = int(params['institution']) if params.get('institution') else None
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри фільтра.")
+
+        rows = archive.iter_visit_rows(
+            self.get_queryset(), date_from, date_to, institution_id, params.get('category') or None,
+            scope=self.visible_institution_id(),
+        )
+        if request.accepted_renderer.format == 'ndjson':
+            response = StreamingHttpResponse(exports.stream_ndjson(rows), content_type='application/x-ndjson')
+            filename = 'visits.ndjson'
+        else:
+            response = StreamingHttpResponse(exports.stream_csv(rows), content_type='text/csv; charset=utf-8')
+            filename = 'visits.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class SymptomViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Symptom.objects.all()
     serializer_class = SymptomSerializer
     permission_classes = [AllowAny]
@@ -92,54 +181,526 @@ class SymptomViewSet(viewsets.ReadOnlyModelViewSet):
 class StatisticsView(APIView):
     permission_classes = [AllowAny]
     def get(self, request, *args, **kwargs):
+        # Читаємо лише попередньо агреговані денні лічильники (DailyVisitRollup),
+        # тож час відповіді залежить від кількості днів, а не візитів
         disease_dynamics = (
-            Visit.objects
-            .annotate(day=TruncDay('visit_date'))
+            DailyVisitRollup.objects
+            .filter(category=rollups.TOTAL)
             .values('day')
-            .annotate(count=Count('id'))
+            .annotate(count=Sum('count'))
+            .filter(count__gt=0)
             .order_by('day')
         )
         disease_distribution = (
-            Visit.objects
-            .values('symptoms__category')
-            .annotate(count=Count('id'))
+            DailyVisitRollup.objects
+            .exclude(category=rollups.TOTAL)
+            .values('category')
+            .annotate(count=Sum('count'))
+            .filter(count__gt=0)
             .order_by('-count')
         )
         data = {
             'disease_dynamics': list(disease_dynamics),
-            'disease_distribution': list(disease_distribution)
+            'disease_distribution': [
+                {'symptoms__category': row['category'], 'count': row['count']}
+                for row in disease_distribution
+            ]
         }
         return Response(data)
 
+class TimeSeriesView(APIView):
+    """
+    Часові ряди візитів (api/timeseries.py). Параметри: granularity (day/week/month),
+    date_from, date_to (YYYY-MM-DD), фільтри institution, institution_type, category,
+    symptom (кожен можна кілька разів) і group_by (institution, institution_type, category).
+    """
+    permission_classes = [AllowAny]
+    MAX_POINTS = 100_000
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params
+        granularity = query.get('granularity', 'day')
+        group_by = list(dict.fromkeys(query.getlist('group_by')))
+        if granularity not in timeseries.GRANULARITIES:
+            raise serializers.ValidationError(
+                f"Невідома гранулярність '{granularity}'. Доступні: {', '.join(timeseries.GRANULARITIES)}."
+            )
+        unknown = set(group_by) - set(timeseries.DIMENSIONS)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Невідомі виміри групування: {', '.join(sorted(unknown))}. "
+                f"Доступні: {', '.join(timeseries.DIMENSIONS)}."
+            )
+        try:
+            date_from = date.fromisoformat(query['date_from']) if query.get('date_from') else None
+            date_to = date.fromisoformat(query['date_to']) if query.get('date_to') else None
+            institutions = sorted({int(value) for value in query.getlist('institution')})
+            symptoms = sorted({int(value) for value in query.getlist('symptom')})
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри фільтра.")
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError("date_from не може бути пізніше за date_to.")
+
+        data = timeseries.query(
+            granularity, date_from, date_to, institutions,
+            institution_types=sorted(set(query.getlist('institution_type'))),
+            categories=sorted(set(query.getlist('category'))),
+            symptoms=symptoms, group_by=group_by,
+        )
+        if sum(len(item['points']) for item in data['series']) > self.MAX_POINTS:
+            raise serializers.ValidationError("Забагато точок — звузьте період або збільште гранулярність.")
+        return Response(data)
+
+class RtView(APIView):
+    """
+    Ефективне репродуктивне число Rt (api/rt.py). Параметри: category (без неї — усі візити),
+    institution, window (днів), si_mean і si_sd (серійний інтервал, днів), date_from, date_to.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params
+        category = query.get('category') or None
+        if category and category not in dict(Symptom.SYMPTOM_CATEGORIES):
+            raise serializers.ValidationError("Невідома категорія симптомів.")
+        try:
+            institution_id = int(query['institution']) if query.get('institution') else None
+            window = int(query.get('window', rt.DEFAULT_WINDOW))
+            si_mean = float(query['si_mean']) if query.get('si_mean') else None
+            si_sd = float(query['si_sd']) if query.get('si_sd') else None
+            date_from = date.fromisoformat(query['date_from']) if query.get('date_from') else None
+            date_to = date.fromisoformat(query['date_to']) if query.get('date_to') else None
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри оцінки.")
+        if not 1 <= window <= rt.MAX_WINDOW:
+            raise serializers.ValidationError(f"Вікно має містити від 1 до {rt.MAX_WINDOW} днів.")
+        if (si_mean is None) != (si_sd is None):
+            raise serializers.ValidationError("si_mean і si_sd задаються разом.")
+        if si_mean is not None and not (0 < si_mean <= rt.MAX_SERIAL_INTERVAL_DAYS / 2 and 0 < si_sd <= si_mean):
+            raise serializers.ValidationError(
+                f"Серійний інтервал: 0 < si_sd <= si_mean <= {rt.MAX_SERIAL_INTERVAL_DAYS // 2} днів."
+            )
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError("date_from не може бути пізніше за date_to.")
+        return Response(rt.estimate(category, institution_id, window, si_mean, si_sd, date_from, date_to))
+
+class OutbreakAlertViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Сигнали можливих спалахів (api/detection.py, команда detect_outbreaks), новіші першими.
+    Фільтри: date_from, date_to (YYYY-MM-DD), institution, category, method; limit — розмір списку.
+    Лікарі бачать сигнали свого закладу, аналітики й адміністратори — усі.
+    """
+    serializer_class = OutbreakAlertSerializer
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+
+    def get_queryset(self):
+        user = self.request.user
+        alerts = OutbreakAlert.objects.select_related('institution').order_by('-day', 'institution_id', 'category')
+        if getattr(user, 'role', None) in ['Аналітик', 'Адмін']:
+            return alerts
+        if getattr(user, 'institution_id', None):
+            return alerts.filter(institution_id=user.institution_id)
+        return OutbreakAlert.objects.none()
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        alerts = self.get_queryset()
+        try:
+            if params.get('date_from'):
+                alerts = alerts.filter(day__gte=date.fromisoformat(params['date_from']))
+            if params.get('date_to'):
+                alerts = alerts.filter(day__lte=date.fromisoformat(params['date_to']))
+            if params.get('institution'):
+                alerts = alerts.filter(institution_id=int(params['institution']))
+            limit = min(int(params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри фільтра.")
+        if limit < 1:
+            raise serializers.ValidationError(f"limit має бути від 1 до {self.MAX_LIMIT}.")
+        if params.get('category'):
+            alerts = alerts.filter(category=params['category'])
+        if params.get('method'):
+            alerts = alerts.filter(method=params['method'])
+        return Response(self.get_serializer(alerts[:limit], many=True).data)
+
 # --- API для SIR-моделювання (POST) ---
 
+def parse_model_params(data):
+    """
+    Зчитує й перевіряє параметри епідемічної моделі із запиту.
+    Повертає словник з ключами model, integrator, dt, days, population, initial, params.
+    """
+    model = data.get('model', 'sir')
+    integrator = data.get('integrator', 'euler')
+    if model not in epidemic.MODELS:
+        raise serializers.ValidationError(f"Невідома модель '{model}'. Доступні: {', '.join(epidemic.MODELS)}.")
+    if integrator not in epidemic.INTEGRATORS:
+        raise serializers.ValidationError(
+            f"Невідомий інтегратор '{integrator}'. Доступні: {', '.join(epidemic.INTEGRATORS)}."
+        )
+    spec = epidemic.MODELS[model]
+    try:
+        parsed = {
+            'model': model,
+            'integrator': integrator,
+            'dt': float(data.get('dt', 1.0)),
+            'days': int(data.get('days', 160)),
+            'population': int(data.get('population', 1000)),
+            'initial': {
+                'infected': int(data.get('initial_infected', 1)),
+                'recovered': int(data.get('initial_recovered', 0)),
+                'exposed': int(data.get('initial_exposed', 0)),
+                'deceased': int(data.get('initial_deceased', 0)),
+            },
+            'params': {name: float(data.get(name, default)) for name, default in spec.params.items()},
+        }
+    except (TypeError, ValueError):
+        raise serializers.ValidationError("Некоректні параметри моделювання.")
+
+    if parsed['population'] <= 0:
+        raise serializers.ValidationError("Популяція має бути додатною.")
+    if any(value < 0 for value in parsed['initial'].values()):
+        raise serializers.ValidationError("Початкові значення компартментів мають бути невід'ємними.")
+    for name, value in parsed['params'].items():
+        # nan/inf пройшли б порівняння нижче і зламали б інтегрування та серіалізацію відповіді
+        if not math.isfinite(value) or not 0 <= value <= SIRModelingView.MAX_RATE:
+            raise serializers.ValidationError(f"Параметр {name} має бути від 0 до {SIRModelingView.MAX_RATE}.")
+    # Кожен день результату зберігається й серіалізується, тож горизонт обмежено тим самим бюджетом
+    if not 1 <= parsed['days'] <= SIRModelingView.MAX_STEPS:
+        raise serializers.ValidationError(f"Кількість днів має бути від 1 до {SIRModelingView.MAX_STEPS}.")
+    if not (math.isfinite(parsed['dt']) and SIRModelingView.MIN_DT <= parsed['dt'] <= 1):
+        raise serializers.ValidationError(f"Крок dt має бути від {SIRModelingView.MIN_DT} до 1.")
+    return parsed
+
+
 class SIRModelingView(APIView):
+    """
+    Детерміноване моделювання епідемії (SIR, SEIR, SIRS, SIRD) рушієм api/epidemic.py.
+    Параметр model обирає модель, integrator — euler, rk4 або rk45, dt — крок у частках доби.
+    """
     permission_classes = [AllowAny]
+    # Обмеження для публічного ендпоінта
+    MIN_DT = 0.01
+    # Бюджет фактично виконаних кроків інтегратора на запит. Дні після виходу на
+    # стаціонарний стан його не витрачають, тож довгі горизонти обмежує лише робота.
+    MAX_STEPS = 200_000
+    # Крок rk45 — сім обчислень правої частини на масивах NumPy, приблизно в 20 разів дорожчий
+    MAX_ADAPTIVE_STEPS = 10_000
+    # Верхня межа інтенсивностей переходів (на добу)
+    MAX_RATE = 1000
+
+    @classmethod
+    def step_budget(cls, run):
+        return cls.MAX_ADAPTIVE_STEPS if run['integrator'] == 'rk45' else cls.MAX_STEPS
+
     def post(self, request, *args, **kwargs):
-        N = int(request.data.get('population', 1000))
-        I0 = int(request.data.get('initial_infected', 1))
-        R0 = int(request.data.get('initial_recovered', 0))
-        beta = float(request.data.get('beta', 0.2))
-        gamma = float(request.data.get('gamma', 0.1))
-        days = int(request.data.get('days', 160))
-        S0 = N - I0 - R0
-        S, I, R = [S0], [I0], [R0]
-        for t in range(days - 1):
-            new_infections = (beta * S[-1] * I[-1]) / N if N > 0 else 0
-            new_recoveries = gamma * I[-1]
-            S_next = S[-1] - new_infections
-            I_next = I[-1] + new_infections - new_recoveries
-            R_next = R[-1] + new_recoveries
-            S.append(max(0, S_next))
-            I.append(max(0, I_next))
-            R.append(max(0, R_next))
+        run = parse_model_params(request.data)
+        # Однакові параметри дають однаковий результат — спершу дивимось у кеш
+        trajectory = result_cache.get(run)
+        cache_status = 'HIT'
+        if trajectory is None:
+            cache_status = 'MISS'
+            try:
+                trajectory = epidemic.simulate(
+                    run['model'],
+                    initial=run['initial'],
+                    params=dict(run['params'], population=run['population']),
+                    days=run['days'],
+                    integrator=run['integrator'],
+                    dt=run['dt'],
+                    max_steps=self.step_budget(run),
+                )
+            except ValueError as exc:
+                raise serializers.ValidationError(str(exc))
+            result_cache.put(run, trajectory)
+
         results = {
-            'days': list(range(days)),
-            'susceptible': S,
-            'infected': I,
-            'recovered': R
+            'model': run['model'],
+            'days': trajectory['t'].tolist(),
+        }
+        for name in epidemic.MODELS[run['model']].compartments:
+            results[name] = trajectory[name].tolist()
+        return Response(results, headers={'X-Cache': cache_status})
+
+
+class MetricsPermission(permissions.BasePermission):
+    """Адміністратор або скрейпер із заголовком Authorization: Bearer <METRICS_TOKEN>."""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        if token and request.headers.get('Authorization') == f'Bearer {token}':
+            return request.method in permissions.SAFE_METHODS
+        return bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    """
+    GET — метрики запитів і кешів у текстовому форматі Prometheus.
+    POST {"enabled": true|false} — вмикає/вимикає збір, {"reset": true} — скидає лічильники.
+    Лічильники й перемикач — на рівні процесу (див. api/metrics.py).
+    """
+    permission_classes = [MetricsPermission]
+
+    def get(self, request, *args, **kwargs):
+        lines = metrics.gauge_lines('api_metrics_enabled', "Чи ввімкнено збір метрик", int(metrics.is_enabled()))
+        lines += metrics.registry.render()
+        sir_stats = result_cache.stats()
+        for name in ('hits', 'sliced_hits', 'shared_hits', 'misses'):
+            lines += metrics.gauge_lines(f'sir_cache_{name}_total', "Кеш SIR-моделювання", sir_stats[name], 'counter')
+        lines += metrics.gauge_lines('sir_cache_entries', "Записів у кеші SIR-моделювання", sir_stats['entries'])
+        membership_stats = membership.stats()
+        for name in ('hits', 'misses', 'invalidations'):
+            lines += metrics.gauge_lines(
+                f'chat_membership_cache_{name}_total', "Кеш членства в чат-кімнатах", membership_stats[name], 'counter',
+            )
+        reference_stats = reference.stats()
+        for name in ('hits', 'misses', 'invalidations'):
+            lines += metrics.gauge_lines(
+                f'reference_cache_{name}_total', "Кеш довідників", reference_stats[name], 'counter',
+            )
+        return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def post(self, request, *args, **kwargs):
+        if 'enabled' in request.data:
+            metrics.set_enabled(str(request.data['enabled']).lower() in ('1', 'true', 'yes'))
+        if str(request.data.get('reset', '')).lower() in ('1', 'true', 'yes'):
+            metrics.registry.reset()
+        return Response({'enabled': metrics.is_enabled()})
+
+
+class SlowRequestsView(APIView):
+    """Останні повільні запити (довші за METRICS_SLOW_REQUEST_SECONDS) з найповільнішими SQL."""
+    permission_classes = [MetricsPermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response(list(reversed(metrics.registry.slow_requests)))
+
+
+class SIRCacheStatsView(APIView):
+    """Статистика кешу результатів моделювання (влучання, промахи, розмір)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(result_cache.stats())
+
+def parse_sweep_axis(value, name, max_size):
+    """
+    Значення осі перебору: число, список чисел або діапазон
+    {"start": .., "stop": .., "step": ..} / {"start": .., "stop": .., "num": ..} (stop включно).
+    Довжина осі перевіряється до побудови масиву (не більше max_size значень).
+    """
+    try:
+        if isinstance(value, dict):
+            start, stop = float(value['start']), float(value['stop'])
+            if not (math.isfinite(start) and math.isfinite(stop)):
+                raise ValueError
+            if 'num' in value:
+                size = int(value['num'])
+            else:
+                step = float(value['step'])
+                if not (math.isfinite(step) and step > 0):
+                    raise ValueError
+                size = max(math.floor((stop - start) / step + 1e-9) + 1, 0)
+            if size > max_size:
+                raise serializers.ValidationError(f"Забагато значень для '{name}' (максимум {max_size}).")
+            axis = np.linspace(start, stop, size) if 'num' in value else start + step * np.arange(size)
+        else:
+            if isinstance(value, (list, tuple)) and len(value) > max_size:
+                raise serializers.ValidationError(f"Забагато значень для '{name}' (максимум {max_size}).")
+            axis = np.atleast_1d(np.asarray(value, dtype=float))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise serializers.ValidationError(f"Некоректні значення для '{name}'.")
+    if axis.ndim != 1 or axis.size == 0 or not np.all(np.isfinite(axis)):
+        raise serializers.ValidationError(f"Некоректні значення для '{name}'.")
+    return axis
+
+
+class SIRSweepView(APIView):
+    """
+    Перебір сценаріїв: beta, gamma, initial_infected і population можуть бути
+    списками або діапазонами; усі комбінації інтегруються одним пакетом NumPy.
+    Повертає метрики кожного сценарію, повні траєкторії — з include_trajectories=true.
+    """
+    permission_classes = [AllowAny]
+    MAX_SCENARIOS = 20_000
+    # Обмеження розміру масиву траєкторій (сценарії × дні)
+    MAX_CELLS = 20_000_000
+    MAX_TRAJECTORY_CELLS = 2_000_000
+    AXES = ('beta', 'gamma', 'initial_infected', 'population')
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        run = parse_model_params({key: value for key, value in data.items() if key not in self.AXES})
+        defaults = {
+            'beta': run['params'].get('beta', 0.2),
+            'gamma': run['params'].get('gamma', 0.1),
+            'initial_infected': run['initial']['infected'],
+            'population': run['population'],
         }
-        return Response(results)
+        axes = [parse_sweep_axis(data.get(name, defaults[name]), name, self.MAX_SCENARIOS) for name in self.AXES]
+        scenarios = int(np.prod([axis.size for axis in axes]))
+        if scenarios > self.MAX_SCENARIOS:
+            raise serializers.ValidationError(f"Забагато сценаріїв: {scenarios} (максимум {self.MAX_SCENARIOS}).")
+        # Пам'ять траєкторій — сценарії × дні; робота інтегратора — сценарії × виконані кроки
+        if scenarios * run['days'] > self.MAX_CELLS:
+            raise serializers.ValidationError("Забагато сценаріїв для такої кількості днів.")
+        max_steps = min(SIRModelingView.step_budget(run), self.MAX_CELLS // scenarios)
+
+        include_trajectories = str(data.get('include_trajectories', '')).lower() in ('1', 'true', 'yes')
+        if include_trajectories and scenarios * run['days'] > self.MAX_TRAJECTORY_CELLS:
+            raise serializers.ValidationError("Траєкторії можна повернути лише для меншого перебору.")
+
+        beta, gamma, infected, population = (grid.ravel() for grid in np.meshgrid(*axes, indexing='ij'))
+        # gamma = 0 дало б R0 = inf, який не серіалізується в JSON
+        if np.any(beta < 0) or np.any(beta > SIRModelingView.MAX_RATE) or np.any(gamma <= 0) \
+                or np.any(gamma > SIRModelingView.MAX_RATE) or np.any(population <= 0):
+            raise serializers.ValidationError(
+                f"beta має бути від 0, gamma — більше 0 (до {SIRModelingView.MAX_RATE}), популяція — додатною."
+            )
+        if np.any(infected < 0) or np.any(infected > population):
+            raise serializers.ValidationError("initial_infected має бути в межах від 0 до популяції.")
+
+        params = dict(run['params'], beta=beta, gamma=gamma, population=population)
+        initial = dict(run['initial'], infected=infected)
+        try:
+            trajectory = epidemic.simulate(
+                run['model'], initial=initial, params=params,
+                days=run['days'], integrator=run['integrator'], dt=run['dt'], max_steps=max_steps,
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        metrics = epidemic.summarize(trajectory, params)
+
+        columns = {
+            'beta': beta.tolist(),
+            'gamma': gamma.tolist(),
+            'initial_infected': infected.tolist(),
+            'population': population.tolist(),
+            'r0': metrics['r0'].tolist(),
+            'peak_day': metrics['peak_day'].tolist(),
+            'peak_infected': metrics['peak_infected'].tolist(),
+            'final_attack_rate': metrics['final_attack_rate'].tolist(),
+        }
+        if include_trajectories:
+            for name in epidemic.MODELS[run['model']].compartments:
+                columns[name] = trajectory[name].T.tolist()
+        results = [dict(zip(columns, row)) for row in zip(*columns.values())]
+        return Response({
+            'model': run['model'],
+            'days': run['days'],
+            'count': scenarios,
+            'scenarios': results,
+        })
+
+class SIRFitView(APIView):
+    """
+    Калібрування SIR-моделі за спостережуваними візитами.
+    Приймає category, date_from, date_to (YYYY-MM-DD), необов'язково institution,
+    population, fit_initial і horizon (днів проєкції після вікна).
+    """
+    permission_classes = [IsAuthenticated]
+    MIN_WINDOW_DAYS = 7
+    MAX_WINDOW_DAYS = 3 * 366
+    MAX_HORIZON_DAYS = 365
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        category = data.get('category')
+        if category not in dict(Symptom.SYMPTOM_CATEGORIES):
+            raise serializers.ValidationError("Потрібно вказати коректну категорію симптомів.")
+        try:
+            date_from = date.fromisoformat(data.get('date_from', ''))
+            date_to = date.fromisoformat(data.get('date_to', ''))
+            population = int(data.get('population', 1000))
+            horizon = int(data.get('horizon', 30))
+            institution_id = int(data['institution']) if data.get('institution') else None
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Некоректні параметри калібрування.")
+        fit_initial = str(data.get('fit_initial', '')).lower() in ('1', 'true', 'yes')
+
+        window = (date_to - date_from).days + 1
+        if not self.MIN_WINDOW_DAYS <= window <= self.MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(
+                f"Вікно має містити від {self.MIN_WINDOW_DAYS} до {self.MAX_WINDOW_DAYS} днів."
+            )
+        if population <= 0 or not 0 <= horizon <= self.MAX_HORIZON_DAYS:
+            raise serializers.ValidationError("Некоректна популяція або горизонт проєкції.")
+
+        observed = calibration.observed_series(category, date_from, date_to, institution_id)
+        if not observed.any():
+            raise serializers.ValidationError("За обраний період немає випадків цієї категорії.")
+        if observed.max() > population:
+            raise serializers.ValidationError("Популяція менша за денну кількість випадків.")
+
+        fitted = calibration.fit(observed, population, fit_initial=fit_initial)
+        return Response({
+            'category': category,
+            'population': population,
+            'fitted': fitted,
+            'observed': [
+                {'day': date_from + timedelta(days=i), 'cases': int(value)}
+                for i, value in enumerate(observed)
+            ],
+            'projection': calibration.project(fitted, population, date_from, window + horizon),
+        })
+
+class SIRStochasticView(APIView):
+    """
+    Ансамбль стохастичних SIR-реалізацій (ланцюгова біноміальна модель).
+    Повертає смуги квантилів 5/50/95%, середні та ймовірність згасання епідемії.
+    Однакове зерно seed дає однаковий результат.
+    """
+    permission_classes = [AllowAny]
+    MAX_RUNS = 20_000
+    MAX_DAYS = 3650
+    MAX_CELLS = 5_000_000
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        try:
+            population = int(data.get('population', 1000))
+            initial_infected = int(data.get('initial_infected', 1))
+            initial_recovered = int(data.get('initial_recovered', 0))
+            beta = float(data.get('beta', 0.2))
+            gamma = float(data.get('gamma', 0.1))
+            days = int(data.get('days', 160))
+            runs = int(data.get('runs', 1000))
+            seed = int(data.get('seed', 0))
+            threshold = float(data.get('major_outbreak_threshold', 0.1))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Некоректні параметри моделювання.")
+
+        if population <= 0 or initial_infected < 0 or initial_recovered < 0 \
+                or initial_infected + initial_recovered > population:
+            raise serializers.ValidationError("Некоректні початкові умови.")
+        # nan проходить будь-яке порівняння, а rng.binomial на ньому падає
+        if not all(math.isfinite(value) for value in (beta, gamma, threshold)) \
+                or not 0 <= beta <= SIRModelingView.MAX_RATE or not 0 <= gamma <= SIRModelingView.MAX_RATE \
+                or not 0 < threshold <= 1 or seed < 0:
+            raise serializers.ValidationError("Некоректні параметри моделі.")
+        if not 1 <= days <= self.MAX_DAYS or not 1 <= runs <= self.MAX_RUNS or days * runs > self.MAX_CELLS:
+            raise serializers.ValidationError(
+                f"Допустимо до {self.MAX_DAYS} днів і {self.MAX_RUNS} реалізацій (не більше {self.MAX_CELLS} клітинок)."
+            )
+
+        result = stochastic.ensemble(
+            population, initial_infected, initial_recovered, beta, gamma, days, runs,
+            seed=seed, major_outbreak_threshold=threshold,
+            workers=getattr(settings, 'SIR_ENSEMBLE_WORKERS', None),
+        )
+        return Response({
+            'days': list(range(days)),
+            'runs': runs,
+            'seed': seed,
+            'extinction_probability': result['extinction_probability'],
+            'quantiles': {
+                level: {name: values.tolist() for name, values in series.items()}
+                for level, series in result['quantiles'].items()
+            },
+            'mean': {name: values.tolist() for name, values in result['mean'].items()},
+        })
 
 # --- API для Чату (GET та POST) ---
 
@@ -156,18 +717,62 @@ class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
 
+    # Обмеження для інкрементальної синхронізації та long-poll
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 500
+    MAX_WAIT_SECONDS = 25
+
     def get_queryset(self):
         room_id = self.request.query_params.get('room')
         if room_id:
-            user_institution = getattr(self.request.user, 'institution', None)
-            if user_institution and ChatRoom.objects.filter(id=room_id, participants=user_institution).exists():
-                return Message.objects.filter(room_id=room_id)
+            # Членство перевіряється за кешем у пам'яті (api/membership.py)
+            if membership.is_member(getattr(self.request.user, 'institution_id', None), room_id):
+                return Message.objects.filter(room_id=room_id).select_related('sender')
         return Message.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        """
+        Історія кімнати. Параметри:
+        after_id — лише новіші повідомлення (інкрементальна синхронізація),
+        before_id — попередня сторінка історії, limit — розмір сторінки (без курсора —
+        останні limit повідомлень),
+        wait — long-poll: чекати до wait секунд, поки з'явиться повідомлення після after_id.
+        Відповідь має ETag; якщо If-None-Match збігається, повертається 304.
+        """
+        params = request.query_params
+        try:
+            after_id = int(params['after_id']) if params.get('after_id') else None
+            before_id = int(params['before_id']) if params.get('before_id') else None
+            limit = min(int(params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            wait = min(float(params.get('wait', 0)), self.MAX_WAIT_SECONDS)
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри синхронізації.")
+        if limit < 1:
+            raise serializers.ValidationError(f"limit має бути від 1 до {self.MAX_LIMIT}.")
+
+        messages = self.get_queryset()
+        if after_id is not None and wait > 0 and not messages.query.is_empty():
+            chat_sync.wait_for_message(int(params['room']), after_id, wait)
+
+        if after_id is not None:
+            page = list(messages.filter(id__gt=after_id).order_by('id')[:limit])
+        else:
+            if before_id is not None:
+                messages = messages.filter(id__lt=before_id)
+            page = list(messages.order_by('-id')[:limit])[::-1]
+
+        # ETag залежить від параметрів запиту та id повідомлень сторінки: клієнт, що вже
+        # має актуальні дані, отримує 304 без серіалізації історії
+        query = '&'.join(f'{key}={params[key]}' for key in sorted(params) if key != 'wait')
+        fingerprint = query + ':' + ','.join(str(message.id) for message in page)
+        etag = f'W/"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(self.get_serializer(page, many=True).data, headers={'ETag': etag})
+
     def perform_create(self, serializer):
         room = serializer.validated_data.get('room')
-        user_institution = getattr(self.request.user, 'institution', None)
-        if user_institution and room.participants.filter(id=user_institution.id).exists():
+        if membership.is_member(getattr(self.request.user, 'institution_id', None), room.id):
             serializer.save(sender=self.request.user)
         else:
             raise PermissionDenied("Ви не є учасником цієї чат-кімнати.")
@@ -180,127 +785,208 @@ class ReportViewSet(viewsets.ModelViewSet):
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
 
     def get_queryset(self):
-        return self.request.user.reports.all().order_by('-uploaded_at')
+        # sha256 у відповіді читається з blob — підтягуємо його тим самим запитом
+        return (self.request.user.reports.filter(source=Report.UPLOADED).select_related('blob')
+                .order_by('-uploaded_at'))
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-        
-# --- ДОДАЙТЕ ВІДСУТНІЙ КЛАС ДЛЯ PDF-ЗВІТУ ---
+        # Вміст зберігається за контрольною сумою: повторне завантаження того ж файлу не дублює його
+        upload = serializer.validated_data['file']
+        sha256, size = uploads.hash_file(upload)
+        upload.seek(0)
+        blob = uploads.store_blob(upload, sha256, size, upload.name)
+        serializer.save(user=self.request.user, blob=blob, file=blob.file.name, name=upload.name,
+                        ingest_status=ingest.initial_status(upload.name))
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, *args, **kwargs):
+        # Файли звітів приватні (api/storage.py): віддаються лише власнику звіту
+        report = self.get_object()
+        return FileResponse(report.file.open('rb'), as_attachment=True,
+                            filename=report.name or os.path.basename(report.file.name))
+
+class UploadSessionViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Докачуване завантаження звіту частинами (api/uploads.py):
+    POST uploads/ {name, size, sha256?} — нова сесія (або одразу звіт, якщо користувач уже завантажував вміст із такою sha256);
+    PUT uploads/{id}/ з заголовком Upload-Offset і сирим тілом — частина;
+    GET uploads/{id}/ — скільки байтів отримано (звідки продовжувати);
+    POST uploads/{id}/finalize/ — перевірка суми і створення звіту.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.request.user.upload_sessions.all()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session, report = uploads.start(request.user, **serializer.validated_data)
+        if report is not None:
+            return Response({
+                'status': UploadSession.COMPLETE,
+                'report': ReportSerializer(report, context=self.get_serializer_context()).data,
+            }, status=status.HTTP_201_CREATED)
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            raise serializers.ValidationError("Потрібні заголовки Upload-Offset і Content-Length.")
+        if not 0 < length <= settings.UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f"Розмір частини має бути від 1 до {settings.UPLOAD_MAX_CHUNK_SIZE} байт."
+            )
+        try:
+            # Тіло читається потоком, без request.data: у пам'яті лише поточний блок
+            session = uploads.write_chunk(session, offset, request.stream, length)
+        except uploads.OffsetMismatch as exc:
+            return Response({'detail': str(exc), 'received': exc.offset}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, *args, **kwargs):
+        try:
+            session = uploads.finalize(self.get_object())
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return Response({
+            'status': session.status,
+            'report': ReportSerializer(session.report, context=self.get_serializer_context()).data,
+        })
+
+# --- Швидкий PDF-звіт (генерується воркером, див. api/reports.py) ---
 class QuickReportView(APIView):
+    """
+    Віддає збережений PDF для поточної версії даних, а якщо його ще немає —
+    ставить генерацію в чергу і відповідає 202 з ID завдання для опитування.
+    """
     permission_classes = [IsAuthenticated]
+    kind = reports.QUICK
+
+    def get_params(self, request):
+        return {}
 
     def get(self, request, *args, **kwargs):
-        # 1. Створюємо відповідь типу PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="quick_report.pdf"'
-
-        # 2. Створюємо "полотно" PDF
-        p = canvas.Canvas(response, pagesize=A4)
-        width, height = A4
-        p.setFont('FreeSans', 12)
-
-        # --- 3. ЗБИРАЄМО ДАНІ ---
-        total_visits = Visit.objects.count()
-        total_patients = Patient.objects.count()
-        
-        most_common_symptom_data = Visit.objects.values('symptoms__category') \
-                                              .annotate(count=Count('symptoms__category')) \
-                                              .order_by('-count') \
-                                              .first()
-        
-        if most_common_symptom_data and most_common_symptom_data['symptoms__category']:
-            most_common_symptom = f"{most_common_symptom_data['symptoms__category']} ({most_common_symptom_data['count']} випадків)"
-        else:
-            most_common_symptom = "Немає даних"
-
-        latest_visits = Visit.objects.all().order_by('-visit_date')[:5]
-
-        
-        # --- 4. МАЛЮЄМО ДАНІ НА PDF ---
-        y = height - 100 
-
-        p.setFont('FreeSans', 16)
-        p.drawString(100, y, "Швидкий звіт: Епідеміологічна ситуація")
-        y -= 20
-        p.drawString(100, y, "---------------------------------------------")
-        y -= 30
-
-        p.setFont('FreeSans', 12)
-        p.drawString(100, y, f"Загальна кількість візитів: {total_visits}")
-        y -= 20
-        p.drawString(100, y, f"Загальна кількість пацієнтів: {total_patients}")
-        y -= 20
-        p.drawString(100, y, f"Найпоширеніша категорія симптомів: {most_common_symptom}")
-        y -= 40
-
-        p.setFont('FreeSans', 14)
-        p.drawString(100, y, "Останні 5 візитів:")
-        y -= 25
-        
-        p.setFont('FreeSans', 10)
-        for visit in latest_visits:
-            #
-            # --- ОСЬ ТУТ БУЛА ПОМИЛКА ВІДСТУПУ ---
-            #
-            visit_date = visit.visit_date.strftime('%Y-%m-%d')
-            # Цей рядок тепер має правильний відступ (він всередині циклу for)
-            patient_name = str(visit.patient) if visit.patient else "Невідомий пацієнт"
-            
-            p.drawString(120, y, f"• Дата: {visit_date} - Пацієнт: {patient_name}")
-            y -= 15
-
-        # 5. Закриваємо та зберігаємо PDF
-        p.showPage()
-        p.save()
+        params = self.get_params(request)
+        version = data_version.current()
+        report = reports.cached_report(self.kind, params, version)
+        if report is not None:
+            return FileResponse(
+                report.file.open('rb'), as_attachment=True,
+                filename=reports.filename_for(self.kind), content_type='application/pdf',
+            )
+        job = reports.enqueue(self.kind, params, request.user, version)
+        return Response(
+            ReportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED
+        )
 
-        return response
+
+class PeriodReportView(QuickReportView):
+    """
+    Багатосторінковий аналітичний звіт за період: огляд, таблиці й графіки по
+    закладах, SIR-проєкції за категоріями (api/period_report.py).
+    Приймає date_from, date_to (YYYY-MM-DD), необов'язково institution (кілька),
+    population і horizon (днів проєкції).
+    """
+    kind = period_report.PERIOD
+    MAX_WINDOW_DAYS = 3 * 366
+    MAX_HORIZON_DAYS = 365
+
+    def get_params(self, request):
+        query = request.query_params
+        try:
+            date_from = date.fromisoformat(query.get('date_from', ''))
+            date_to = date.fromisoformat(query.get('date_to', ''))
+            institutions = sorted({int(value) for value in query.getlist('institution')})
+            population = int(query.get('population', 1000))
+            horizon = int(query.get('horizon', 30))
+        except ValueError:
+            raise serializers.ValidationError("Некоректні параметри звіту.")
+        if not 0 <= (date_to - date_from).days < self.MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(f"Період має містити від 1 до {self.MAX_WINDOW_DAYS} днів.")
+        if population <= 0 or not 0 <= horizon <= self.MAX_HORIZON_DAYS:
+            raise serializers.ValidationError("Некоректна популяція або горизонт проєкції.")
+        # Канонічний вигляд параметрів — однакові звіти мають однаковий ключ кешу
+        return {
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'institutions': institutions,
+            'population': population,
+            'horizon': horizon,
+        }
+
+
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Статус завдань генерації звітів: GET /api/report-jobs/<id>/, готовий файл —
+    GET /api/report-jobs/<id>/download/. Користувач бачить лише власні завдання.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        jobs = ReportJob.objects.select_related('report').order_by('-id')
+        # Помилки завдань містять трасування — чужі завдання бачать лише адміністратори
+        return jobs if self.request.user.is_staff else jobs.filter(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, *args, **kwargs):
+        """Готовий PDF завдання (файли звітів приватні, див. api/storage.py)."""
+        job = self.get_object()
+        if job.report is None:
+            raise Http404("Звіт ще не готовий або застарів.")
+        return FileResponse(job.report.file.open('rb'), as_attachment=True,
+                            filename=reports.filename_for(job.kind), content_type='application/pdf')
 
 
 class SearchView(APIView):
     """
     API для глобального пошуку.
     Приймає GET-запит з параметром ?q=...
+    Пошук іде по триграмному індексу (api/search_index.py): з ранжуванням,
+    збігом за префіксом і стійкістю до описок.
     """
     permission_classes = [IsAuthenticated]
+    RESULT_LIMIT = 10
+
+    @staticmethod
+    def _in_order(queryset, ids):
+        objects = queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
 
     def get(self, request, *args, **kwargs):
         query = request.query_params.get('q', '').strip()
-        print(f"--- [SEARCH] Отримано запит: {query} ---") # <-- ДЛЯ ДІАГНОСТИКИ
-
         if not query:
             return Response({
                 'patients': [],
-                'institutions': []
+                'institutions': [],
+                'patient_records': [],
             })
-            
+
         User = get_user_model()
+        users = self._in_order(
+            User.objects.select_related('institution'), search_index.search(query, 'user', self.RESULT_LIMIT)
+        )
+        institutions = self._in_order(
+            Institution.objects.all(), search_index.search(query, 'institution', self.RESULT_LIMIT)
+        )
+        patients = self._in_order(
+            Patient.objects.all(), search_index.search(query, 'patient', self.RESULT_LIMIT)
+        )
 
-        # --- 1. Шукаємо Користувачів (User) ---
-        user_results = User.objects.filter(
-            Q(username__icontains=query) | 
-            Q(email__icontains=query)      
-        ).distinct()[:10]
-        
-        print(f"--- [SEARCH] Знайдено користувачів: {user_results.count()} ---")
-
-        # --- 2. Шукаємо заклади ---
-        institution_results = Institution.objects.filter(
-            Q(name__icontains=query)
-        ).distinct()[:10]
-        
-        print(f"--- [SEARCH] Знайдено закладів: {institution_results.count()} ---")
-
-        # --- 3. Серіалізуємо дані ---
-        patient_data = UserDetailSerializer(user_results, many=True).data 
-        institution_data = InstitutionSerializer(institution_results, many=True).data
-
-        # --- 4. Повертаємо відповідь ---
-        response_data = {
-            'patients': patient_data, 
-            'institutions': institution_data
-        }
-        print(f"--- [SEARCH] Повертаємо дані ---")
-        return Response(response_data)
+        # Ключ 'patients' історично містить користувачів — залишено для сумісності з фронтендом
+        return Response({
+            'patients': UserDetailSerializer(users, many=True).data,
+            'institutions': InstitutionSerializer(institutions, many=True).data,
+            'patient_records': PatientSerializer(patients, many=True).data,
+        })
     
 # --- Кастомні види для автентифікації ---
 # (Рекомендація: приберіть їх і використовуйте імпорти 
@@ -3,14 +3,33 @@ ASGI config for monitoring_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+ASGI обслуговує лише WebSocket-маршрути (daphne monitoring_system.asgi:application).
+HTTP лишається на WSGI (runserver, gunicorn): Django 4.2 під ASGI повністю читає
+синхронні ітератори StreamingHttpResponse у пам'ять, тож потоковий експорт візитів
+і метрики втратили б сталу пам'ять.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monitoring_system.settings')
 
-application = get_asgi_application()
+# Ініціалізуємо Django до імпорту маршрутів, що використовують моделі
+django.setup()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from api.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    # WebSocket-чат: та сама сесія, що й у REST API
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+    ),
+})
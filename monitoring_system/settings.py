@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Першим, щоб час і SQL рахувались для всього ланцюжка (api/metrics.py)
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +59,19 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'monitoring_system.wsgi.application'
+ASGI_APPLICATION = 'monitoring_system.asgi.application'
+
+# Шар каналів для WebSocket-чату: у пам'яті — лише для тестів і одного процесу.
+# HTTP (WSGI) і WebSocket (ASGI, daphne) працюють окремими процесами, тож повідомлення,
+# створені через REST API, доходять до чату тільки через спільний шар: задайте REDIS_URL.
+CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [os.environ['REDIS_URL']]},
+    }
 
 DATABASES = {
     'default': {
@@ -128,8 +143,50 @@ REST_AUTH = {
     'USER_DETAILS_SERIALIZER': 'api.serializers.UserDetailSerializer',
 }
 
+# Розмір сторінки списку візитів за замовчуванням (клієнт може змінити через ?page_size=)
+VISIT_PAGE_SIZE = 50
+
+# Кеш результатів SIR-моделювання (api/sir_cache.py).
+# SIR_CACHE_BACKEND — псевдонім із CACHES для спільного рівня між процесами (None — лише пам'ять процесу)
+SIR_CACHE_MAX_ENTRIES = 256
+SIR_CACHE_MAX_CELLS = 5_000_000
+SIR_CACHE_BACKEND = None
+SIR_CACHE_TIMEOUT = 3600
+# Кількість рядів (категорія × заклад × серійний інтервал), що тримає кеш оцінок Rt (api/rt.py)
+RT_CACHE_MAX_SERIES = 512
+# Кількість процесів для стохастичних ансамблів (None — кількість ядер)
+SIR_ENSEMBLE_WORKERS = None
+# Кількість процесів для рендерингу розділів PDF-звітів (None — кількість ядер)
+REPORT_RENDER_WORKERS = None
+
+# Метрики запитів (api/metrics.py): збір можна перемикати під час роботи через POST /api/metrics/
+# (перемикання діє на процес, що обробив запит, або на всі — за спільного бекенду CACHES)
+METRICS_ENABLED = True
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+# Токен для скрейпера Prometheus (Authorization: Bearer ...); без нього — лише адміністратори
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Візити місяців, старших за стільки днів, переносяться в архів (api/archive.py, команда archive_visits)
+VISIT_ARCHIVE_AFTER_DAYS = 365
+
+# Сигнали спалахів (api/detection.py, команда detect_outbreaks): від імені цього користувача
+# сигнали останніх OUTBREAK_ALERT_POST_DAYS днів надсилаються в чат-кімнати закладу (None — не надсилати)
+OUTBREAK_ALERT_SENDER = os.environ.get('OUTBREAK_ALERT_SENDER')
+OUTBREAK_ALERT_POST_DAYS = 7
+
+# Докачувані завантаження звітів частинами (api/uploads.py).
+UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 ** 2
+# Незавершені сесії без активності довше за стільки годин видаляє команда expire_uploads
+UPLOAD_SESSION_TTL_HOURS = 48
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файли з даними пацієнтів (вміст звітів, архіви візитів) — поза публічним MEDIA_ROOT,
+# віддаються лише через API (api/storage.py)
+PRIVATE_MEDIA_ROOT = os.path.join(BASE_DIR, 'private_media')
+# Тимчасові файли незавершених завантажень (api/uploads.py); теж не в MEDIA_ROOT
+UPLOAD_TEMP_DIR = os.path.join(PRIVATE_MEDIA_ROOT, 'uploads')
 # SESSION_COOKIE_SAMESITE = 'Lax' # Не потрібно при вимкненому CSRF
 # CSRF_COOKIE_SAMESITE = 'Lax'
 # CSRF_USE_SESSIONS = False
@@ -0,0 +1,29 @@
+# monitoring_system/settings_benchmark.py
+#
+# Налаштування для набору бенчмарків (python manage.py run_benchmarks): локальна SQLite
+# без зовнішніх сервісів. Базу для кожного масштабу команда створює сама в BENCHMARK_DIR.
+#
+#   DJANGO_SETTINGS_MODULE=monitoring_system.settings_benchmark python manage.py run_benchmarks --scale 10k
+
+from .settings import *  # noqa: F401,F403
+
+BENCHMARK_DIR = os.path.join(BASE_DIR, 'benchmarks')
+
+DEBUG = False
+# Тестовий клієнт Django звертається до хоста 'testserver'
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BENCHMARK_DIR, 'data', 'default.sqlite3'),
+    }
+}
+
+# Згенеровані звіти не змішуються з файлами робочого середовища
+MEDIA_ROOT = os.path.join(BENCHMARK_DIR, 'data', 'media')
+PRIVATE_MEDIA_ROOT = os.path.join(BENCHMARK_DIR, 'data', 'private_media')
+UPLOAD_TEMP_DIR = os.path.join(PRIVATE_MEDIA_ROOT, 'uploads')
+
+# Повільні запити вимірюються бенчмарком, а не журналом middleware
+METRICS_SLOW_REQUEST_SECONDS = 3600